@@ -0,0 +1,77 @@
+"""add schedule.lesson_start_utc with (status, lesson_start_utc) index
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 09:00:00
+
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+import pytz
+from config import Config
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+schedule = sa.table(
+    'schedule',
+    sa.column('id', sa.Integer),
+    sa.column('lesson_date', sa.Date),
+    sa.column('lesson_time', sa.Time),
+    sa.column('lesson_start_utc', sa.DateTime),
+)
+
+
+def backfill_lesson_start_utc(connection) -> None:
+    """Заполнение lesson_start_utc из lesson_date и lesson_time в часовом поясе расписания"""
+    tz = pytz.timezone(Config.TIMEZONE)
+    update = (
+        sa.update(schedule)
+        .where(schedule.c.id == sa.bindparam('row_id'))
+        .values(lesson_start_utc=sa.bindparam('start_utc'))
+    )
+    rows = connection.execute(
+        sa.select(schedule.c.id, schedule.c.lesson_date, schedule.c.lesson_time)
+        .where(schedule.c.lesson_start_utc.is_(None))
+    )
+    
+    while True:
+        batch = rows.fetchmany(BATCH_SIZE)
+        if not batch:
+            break
+        connection.execute(update, [
+            {
+                'row_id': row_id,
+                'start_utc': tz.localize(datetime.combine(lesson_date, lesson_time))
+                .astimezone(timezone.utc).replace(tzinfo=None)
+            }
+            for row_id, lesson_date, lesson_time in batch
+        ])
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+    
+    columns = {column['name'] for column in inspector.get_columns('schedule')}
+    if 'lesson_start_utc' not in columns:
+        op.add_column('schedule', sa.Column('lesson_start_utc', sa.DateTime(), nullable=True))
+    
+    backfill_lesson_start_utc(connection)
+    
+    indexes = {index['name'] for index in inspector.get_indexes('schedule')}
+    if 'ix_schedule_status_start' not in indexes:
+        op.create_index('ix_schedule_status_start', 'schedule', ['status', 'lesson_start_utc'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_schedule_status_start', table_name='schedule')
+    with op.batch_alter_table('schedule') as batch_op:
+        batch_op.drop_column('lesson_start_utc')
@@ -0,0 +1,33 @@
+"""add per-user (date, time) indexes on schedule
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_schedule_teacher_date_time': ['teacher_id', 'lesson_date', 'lesson_time'],
+    'ix_schedule_student_date_time': ['student_id', 'lesson_date', 'lesson_time'],
+}
+
+
+def upgrade() -> None:
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('schedule')}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'schedule', columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name='schedule')
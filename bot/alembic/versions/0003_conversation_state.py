@@ -0,0 +1,32 @@
+"""add conversation_state table for bot persistence
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if 'conversation_state' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'conversation_state',
+        sa.Column('scope', sa.String(64), primary_key=True),
+        sa.Column('key', sa.String(64), primary_key=True),
+        sa.Column('data', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('conversation_state')
@@ -0,0 +1,32 @@
+"""add scheduler_leases table for leader election
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if 'scheduler_leases' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(64), primary_key=True),
+        sa.Column('holder', sa.String(128), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('renewed_at', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scheduler_leases')
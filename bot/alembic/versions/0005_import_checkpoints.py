@@ -0,0 +1,35 @@
+"""add import_checkpoints table for resumable schedule imports
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if 'import_checkpoints' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'import_checkpoints',
+        sa.Column('source', sa.String(64), primary_key=True),
+        sa.Column('filename', sa.String(255), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('imported', sa.Integer(), nullable=False),
+        sa.Column('rejected', sa.Integer(), nullable=False),
+        sa.Column('finished', sa.Boolean(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('import_checkpoints')
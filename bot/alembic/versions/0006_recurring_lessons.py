@@ -0,0 +1,72 @@
+"""add recurring_lessons, their exceptions and schedule.recurring_lesson_id
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if 'recurring_lessons' not in tables:
+        op.create_table(
+            'recurring_lessons',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('teacher_id', sa.Integer(), sa.ForeignKey('teachers.id'), nullable=False),
+            sa.Column('student_id', sa.Integer(), sa.ForeignKey('students.id'), nullable=False),
+            sa.Column('weekdays', sa.Integer(), nullable=False),
+            sa.Column('interval_weeks', sa.Integer(), nullable=False),
+            sa.Column('lesson_time', sa.Time(), nullable=False),
+            sa.Column('subject', sa.String(100), nullable=True),
+            sa.Column('duration_minutes', sa.Integer(), nullable=True),
+            sa.Column('start_date', sa.Date(), nullable=False),
+            sa.Column('end_date', sa.Date(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_recurring_lessons_teacher_id', 'recurring_lessons', ['teacher_id'])
+        op.create_index('ix_recurring_lessons_student_id', 'recurring_lessons', ['student_id'])
+
+    if 'recurring_lesson_exceptions' not in tables:
+        op.create_table(
+            'recurring_lesson_exceptions',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('recurring_lesson_id', sa.Integer(), sa.ForeignKey('recurring_lessons.id'), nullable=False),
+            sa.Column('lesson_date', sa.Date(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.UniqueConstraint('recurring_lesson_id', 'lesson_date', name='uq_recurring_lesson_exceptions'),
+        )
+
+    columns = {column['name'] for column in inspector.get_columns('schedule')}
+    if 'recurring_lesson_id' not in columns:
+        with op.batch_alter_table('schedule') as batch_op:
+            batch_op.add_column(sa.Column('recurring_lesson_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(
+                'fk_schedule_recurring_lesson_id', 'recurring_lessons', ['recurring_lesson_id'], ['id']
+            )
+
+    indexes = {index['name'] for index in inspector.get_indexes('schedule')}
+    if 'ux_schedule_recurring_date' not in indexes:
+        op.create_index(
+            'ux_schedule_recurring_date', 'schedule', ['recurring_lesson_id', 'lesson_date'], unique=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ux_schedule_recurring_date', table_name='schedule')
+    with op.batch_alter_table('schedule') as batch_op:
+        batch_op.drop_constraint('fk_schedule_recurring_lesson_id', type_='foreignkey')
+        batch_op.drop_column('recurring_lesson_id')
+    op.drop_table('recurring_lesson_exceptions')
+    op.drop_table('recurring_lessons')
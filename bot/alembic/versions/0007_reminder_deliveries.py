@@ -0,0 +1,36 @@
+"""add reminder_deliveries ledger
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 08:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'reminder_deliveries' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'reminder_deliveries',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('lesson_id', sa.Integer(), sa.ForeignKey('schedule.id'), nullable=False),
+        sa.Column('recipient', sa.String(10), nullable=False),
+        sa.Column('offset_minutes', sa.Integer(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('lesson_id', 'recipient', 'offset_minutes', name='uq_reminder_deliveries'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reminder_deliveries')
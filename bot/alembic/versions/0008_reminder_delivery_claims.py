@@ -0,0 +1,29 @@
+"""add reminder_deliveries.claimed_at for re-claiming stale deliveries
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 20:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('reminder_deliveries')}
+    if 'claimed_at' not in columns:
+        with op.batch_alter_table('reminder_deliveries') as batch_op:
+            batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('reminder_deliveries') as batch_op:
+        batch_op.drop_column('claimed_at')
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import re
+import shutil
+import time
+from typing import List, NamedTuple, Optional, Tuple
+from transcription import AudioSource
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2
+
+SILENCE_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+
+Segment = Tuple[float, float]
+
+class AudioPreprocessingError(Exception):
+    pass
+
+class AudioChunk(NamedTuple):
+    index: int
+    duration: float
+    data: bytes
+
+class AudioPreprocessor:
+    """
+    Подготовка записи к распознаванию через ffmpeg: 16 кГц моно, удаление пауз
+    и нарезка по паузам на куски Opus, которые распознаются параллельно
+    """
+
+    def __init__(self, ffmpeg: str = 'ffmpeg', silence_db: float = -35, min_silence: float = 0.7,
+                 padding: float = 0.25, max_chunk_seconds: float = 120, bitrate: str = '24k',
+                 concurrency: int = 4):
+        self.ffmpeg = ffmpeg
+        self.silence_db = silence_db
+        self.min_silence = min_silence
+        self.padding = padding
+        self.max_chunk_seconds = max_chunk_seconds
+        self.bitrate = bitrate
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    @staticmethod
+    def find_ffmpeg() -> Optional[str]:
+        return shutil.which('ffmpeg')
+
+    async def run_ffmpeg(self, args: List[str], input_data: Optional[bytes] = None) -> Tuple[bytes, str]:
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                self.ffmpeg, '-hide_banner', '-nostdin', *args,
+                stdin=asyncio.subprocess.PIPE if input_data is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await process.communicate(input_data)
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.kill()
+                raise
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise AudioPreprocessingError(message[-1] if message else f"ffmpeg exited with {process.returncode}")
+        return stdout, stderr.decode('utf-8', 'replace')
+
+    async def decode(self, audio: AudioSource) -> Tuple[bytes, List[Segment]]:
+        """Декодирование в 16 кГц моно PCM с поиском пауз за один проход"""
+        if isinstance(audio, str):
+            source, input_data = audio, None
+        else:
+            source, input_data = 'pipe:0', audio[1].getvalue()
+
+        pcm, log = await self.run_ffmpeg([
+            '-i', source, '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE),
+            '-af', f"silencedetect=noise={self.silence_db}dB:d={self.min_silence}",
+            '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1'
+        ], input_data)
+        return pcm, self.parse_silences(log, len(pcm) / BYTES_PER_SECOND)
+
+    @staticmethod
+    def parse_silences(log: str, duration: float) -> List[Segment]:
+        silences = []
+        start = None
+        for line in log.splitlines():
+            match = SILENCE_START_RE.search(line)
+            if match:
+                start = max(float(match.group(1)), 0.0)
+                continue
+            match = SILENCE_END_RE.search(line)
+            if match and start is not None:
+                silences.append((start, min(float(match.group(1)), duration)))
+                start = None
+        if start is not None:
+            silences.append((start, duration))
+        return silences
+
+    def speech_segments(self, silences: List[Segment], duration: float) -> List[Segment]:
+        """Участки речи между паузами с небольшим запасом по краям"""
+        segments = []
+        position = 0.0
+        for silence_start, silence_end in silences + [(duration, duration)]:
+            if silence_start > position:
+                start = max(position - self.padding, 0.0)
+                end = min(silence_start + self.padding, duration)
+                if segments and start <= segments[-1][1]:
+                    segments[-1] = (segments[-1][0], end)
+                else:
+                    segments.append((start, end))
+            position = max(position, silence_end)
+        return segments
+
+    def plan_chunks(self, segments: List[Segment]) -> List[List[Segment]]:
+        """Группировка участков речи в куски не длиннее max_chunk_seconds"""
+        chunks: List[List[Segment]] = []
+        current: List[Segment] = []
+        current_duration = 0.0
+
+        for start, end in segments:
+            while end - start > self.max_chunk_seconds:
+                if current:
+                    chunks.append(current)
+                    current, current_duration = [], 0.0
+                chunks.append([(start, start + self.max_chunk_seconds)])
+                start += self.max_chunk_seconds
+
+            if current and current_duration + (end - start) > self.max_chunk_seconds:
+                chunks.append(current)
+                current, current_duration = [], 0.0
+            current.append((start, end))
+            current_duration += end - start
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def slice_pcm(pcm: bytes, segments: List[Segment]) -> bytes:
+        return b"".join(
+            pcm[int(start * SAMPLE_RATE) * 2:int(end * SAMPLE_RATE) * 2] for start, end in segments
+        )
+
+    async def encode(self, pcm: bytes) -> bytes:
+        opus, _ = await self.run_ffmpeg([
+            '-loglevel', 'error', '-f', 's16le', '-ar', str(SAMPLE_RATE), '-ac', '1', '-i', 'pipe:0',
+            '-c:a', 'libopus', '-b:a', self.bitrate, '-application', 'voip', '-f', 'ogg', 'pipe:1'
+        ], pcm)
+        return opus
+
+    async def prepare(self, audio: AudioSource) -> List[AudioChunk]:
+        """Полный цикл подготовки с записью времени каждого этапа в лог"""
+        started = time.perf_counter()
+        pcm, silences = await self.decode(audio)
+        decoded = time.perf_counter()
+
+        duration = len(pcm) / BYTES_PER_SECOND
+        plan = self.plan_chunks(self.speech_segments(silences, duration))
+        pieces = [self.slice_pcm(pcm, segments) for segments in plan]
+        planned = time.perf_counter()
+
+        encoded = await asyncio.gather(*(self.encode(piece) for piece in pieces))
+        finished = time.perf_counter()
+
+        chunks = [
+            AudioChunk(index, len(piece) / BYTES_PER_SECOND, data)
+            for index, (piece, data) in enumerate(zip(pieces, encoded))
+        ]
+        speech = sum(chunk.duration for chunk in chunks)
+        logger.info(
+            f"Preprocessed {duration:.1f}s of audio into {len(chunks)} chunks, {speech:.1f}s of speech, "
+            f"{sum(len(chunk.data) for chunk in chunks)} bytes; "
+            f"decode {(decoded - started) * 1000:.0f}ms, segment {(planned - decoded) * 1000:.0f}ms, "
+            f"encode {(finished - planned) * 1000:.0f}ms"
+        )
+        return chunks
@@ -2,17 +2,20 @@ import logging
 from typing import Optional, Dict, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from models import User, DatabaseManager
+from models import AsyncUser, AsyncDatabaseManager
+from cache import TTLCache
+from tracing import TRACER, traced_update
 
 logger = logging.getLogger(__name__)
 
 class AuthenticationManager:
-    def __init__(self, db_manager: DatabaseManager):
-        self.user_model = User(db_manager)
+    def __init__(self, db_manager: AsyncDatabaseManager, identity_cache: Optional[TTLCache] = None):
+        self.user_model = AsyncUser(db_manager, identity_cache)
         self.pending_auth = {}
     
     async def is_authenticated(self, telegram_id: int) -> Optional[Dict[str, Any]]:
-        return self.user_model.get_user_by_telegram_id(telegram_id)
+        with TRACER.span('auth.is_authenticated'):
+            return await self.user_model.get_user_by_telegram_id(telegram_id)
     
     async def start_authentication(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         telegram_id = update.effective_user.id
@@ -38,7 +41,7 @@ class AuthenticationManager:
         
         login = update.message.text.strip()
         telegram_id = update.effective_user.id
-        user_info = self.user_model.authenticate_user(login)
+        user_info = await self.user_model.authenticate_user(login)
         
         if user_info:
             if user_info['telegram_id'] and user_info['telegram_id'] != telegram_id:
@@ -49,7 +52,7 @@ class AuthenticationManager:
                 return
 
             if not user_info['telegram_id']:
-                success = self.user_model.bind_telegram_id(
+                success = await self.user_model.bind_telegram_id(
                     login, telegram_id, user_info['user_type']
                 )
                 if not success:
@@ -108,9 +111,11 @@ class AuthenticationManager:
             "❌ Аутентификация отменена.\n\nДля начала работы нажмите /start"
         )
     
+    @traced_update('command.logout')
     async def logout(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        telegram_id = update.effective_user.id  # noqa: F841
+        telegram_id = update.effective_user.id
 
+        self.user_model.invalidate_identity(telegram_id)
         context.user_data.clear()
         
         await update.message.reply_text(
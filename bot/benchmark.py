@@ -0,0 +1,759 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone, time as dtime
+from typing import Awaitable, Callable, Dict, List, Optional
+from io import BytesIO
+from types import SimpleNamespace
+from sqlalchemy import event, func, select, text
+from telegram import Chat, Message, Update, User
+from sqlalchemy.engine import Engine
+from config import Config
+from models import (
+    DatabaseManager, AsyncDatabaseManager, AsyncScheduleManager, AsyncUser, ENGINE_PROFILES,
+    Teacher, Student, Schedule, UserSession, RecurringLesson,
+    lesson_start_utc, recurring_dates, weekdays_mask
+)
+from populate_test_data import SyntheticDataGenerator
+from audio_processing import AudioPreprocessor
+from transcription import StubBackend
+from update_processor import PerChatUpdateProcessor
+from leader import LeaderElector
+from rate_limiter import TelegramRateLimiter
+from scheduler import (
+    ReminderScheduler, create_job_store, create_job_scheduler, send_custom_reminder_job
+)
+from apscheduler.job import Job
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+import pytz
+from voice_handler import VoiceHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCHEDULE_USER_INDEXES = ('ix_schedule_teacher_date_time', 'ix_schedule_student_date_time')
+def set_schedule_indexes(db_manager: DatabaseManager, names, enabled: bool):
+    for index in Schedule.__table__.indexes:
+        if index.name in names:
+            if enabled:
+                index.create(bind=db_manager.engine, checkfirst=True)
+            else:
+                index.drop(bind=db_manager.engine, checkfirst=True)
+
+class QueryCounter:
+    """Подсчет SQL запросов, выполненных через движок"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.count = 0
+
+    def on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self.on_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self.on_execute)
+
+async def measure(call: Callable[[], Awaitable], repeats: int, engine: Engine = None) -> Dict[str, float]:
+    timings: List[float] = []
+    queries = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        if engine is not None:
+            with QueryCounter(engine) as counter:
+                await call()
+            queries += counter.count
+        else:
+            await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings, queries / repeats)
+
+def summarize(timings: List[float], queries: float = 0.0) -> Dict[str, float]:
+    timings = sorted(timings)
+    return {
+        'mean_ms': statistics.mean(timings),
+        'p50_ms': timings[len(timings) // 2],
+        'p95_ms': timings[max(int(len(timings) * 0.95) - 1, 0)],
+        'queries': queries
+    }
+
+def print_results(title: str, results: Dict[str, Dict[str, float]]):
+    print(f"\n{title}")
+    print(f"{'case':<40}{'mean ms':>12}{'p50 ms':>12}{'p95 ms':>12}{'queries':>10}")
+    for case, timing in results.items():
+        print(f"{case:<40}{timing['mean_ms']:>12.2f}{timing['p50_ms']:>12.2f}{timing['p95_ms']:>12.2f}"
+              f"{timing['queries']:>10.1f}")
+
+async def bench_schedule_view(args):
+    """Задержка просмотра расписания без индексов по пользователю и с ними"""
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    db_manager = DatabaseManager(database_url)
+    SyntheticDataGenerator(db_manager).generate(args.teachers, args.students, args.rows)
+
+    async_db = AsyncDatabaseManager(database_url)
+    schedule_manager = AsyncScheduleManager(async_db)
+    engine = async_db.engine.sync_engine
+    rng = random.Random(7)
+    today = date.today()
+
+    for enabled in (False, True):
+        set_schedule_indexes(db_manager, SCHEDULE_USER_INDEXES, enabled)
+        results = {
+            'teacher full schedule': await measure(
+                lambda: schedule_manager.get_user_schedule(rng.randint(1, args.teachers), 'teacher'),
+                args.repeats, engine
+            ),
+            'student full schedule': await measure(
+                lambda: schedule_manager.get_user_schedule(rng.randint(1, args.students), 'student'),
+                args.repeats, engine
+            ),
+            'teacher today': await measure(
+                lambda: schedule_manager.get_user_schedule(rng.randint(1, args.teachers), 'teacher', today),
+                args.repeats, engine
+            ),
+            'student today': await measure(
+                lambda: schedule_manager.get_user_schedule(rng.randint(1, args.students), 'student', today),
+                args.repeats, engine
+            ),
+        }
+        print_results(f"{args.rows} lessons, user indexes {'ON' if enabled else 'OFF'}", results)
+
+    await async_db.dispose()
+
+async def bench_queries(args):
+    """Задержка основных запросов бота на синтетических базах разного размера"""
+    summary: Dict[str, Dict[int, float]] = {}
+    for size in args.sizes:
+        teachers = max(size // 200, 5)
+        students = max(size // 20, 20)
+        if args.database_url:
+            database_url = args.database_url
+        else:
+            database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), f'bench_{size}.db')}"
+        db_manager = DatabaseManager(database_url)
+        SyntheticDataGenerator(db_manager).generate(teachers, students, size)
+
+        with db_manager.engine.connect() as connection:
+            teacher_ids = list(connection.scalars(select(Teacher.id)))
+            student_logins = list(connection.scalars(select(Student.login)))
+            telegram_ids = list(connection.scalars(select(UserSession.telegram_id)))
+        db_manager.engine.dispose()
+
+        async_db = AsyncDatabaseManager(database_url)
+        schedule_manager = AsyncScheduleManager(async_db)
+        user_manager = AsyncUser(async_db)
+        engine = async_db.engine.sync_engine
+        rng = random.Random(7)
+        today = date.today()
+
+        results = {
+            'get_user_schedule teacher': await measure(
+                lambda: schedule_manager.get_user_schedule(rng.choice(teacher_ids), 'teacher'),
+                args.repeats, engine
+            ),
+            'get_user_schedule teacher today': await measure(
+                lambda: schedule_manager.get_user_schedule(rng.choice(teacher_ids), 'teacher', today),
+                args.repeats, engine
+            ),
+            'get_upcoming_lessons': await measure(
+                lambda: schedule_manager.get_upcoming_lessons(Config.REMINDER_MINUTES_BEFORE),
+                args.repeats, engine
+            ),
+            'authenticate_user student': await measure(
+                lambda: user_manager.authenticate_user(rng.choice(student_logins)),
+                args.repeats, engine
+            ),
+            'get_user_by_telegram_id': await measure(
+                lambda: user_manager.get_user_by_telegram_id(rng.choice(telegram_ids)),
+                args.repeats, engine
+            ),
+        }
+        print_results(f"{size} lessons, {teachers} teachers, {students} students", results)
+        for case, timing in results.items():
+            summary.setdefault(case, {})[size] = timing['p95_ms']
+        await async_db.dispose()
+
+    print("\np95 ms by number of lessons")
+    print(f"{'case':<40}" + "".join(f"{size:>12}" for size in args.sizes))
+    for case, timings in summary.items():
+        print(f"{case:<40}" + "".join(f"{timings[size]:>12.2f}" for size in args.sizes))
+
+class FakeMessage:
+    """Сообщение Telegram без сети: ответы и правки только запоминаются"""
+
+    def __init__(self, voice=None):
+        self.voice = voice
+        self.text = None
+        self.reply = None
+
+    async def reply_text(self, text: str, **kwargs) -> "FakeMessage":
+        self.reply = FakeMessage()
+        self.reply.text = text
+        return self.reply
+
+    async def edit_text(self, text: str, **kwargs):
+        self.text = text
+
+class FakeFile:
+    def __init__(self, payload: bytes):
+        self.payload = payload
+        self.file_size = len(payload)
+
+    async def download_to_memory(self, out):
+        out.write(self.payload)
+
+    async def download_to_drive(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.payload)
+
+async def bench_voice_pipeline(args):
+    """Задержка и пропускная способность голосового конвейера на заглушке распознавания"""
+    Config.TRANSCRIPTION_CACHE_PATH = os.path.join(tempfile.mkdtemp(), 'transcriptions.db')
+    handler = VoiceHandler(StubBackend(delay=args.delay_ms / 1000))
+    rng = random.Random(42)
+    files = {}
+
+    async def get_file(file_id: str) -> FakeFile:
+        return files[file_id]
+
+    context = SimpleNamespace(bot=SimpleNamespace(get_file=get_file))
+    updates = []
+    for i in range(args.messages):
+        unique_id = f"voice{rng.randrange(args.unique)}" if args.unique else f"voice{i}"
+        files.setdefault(unique_id, FakeFile(rng.randbytes(args.size_kb * 1024)))
+        voice = SimpleNamespace(file_id=unique_id, file_unique_id=unique_id, file_size=args.size_kb * 1024)
+        updates.append(SimpleNamespace(message=FakeMessage(voice)))
+
+    timings: List[float] = []
+
+    async def process(update):
+        started = time.perf_counter()
+        await handler.handle_voice_message(update, context)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(process(update) for update in updates))
+    elapsed = time.perf_counter() - started
+
+    print_results(f"{args.messages} voice notes, {args.size_kb} KB, stub delay {args.delay_ms} ms, "
+                  f"concurrency {Config.TRANSCRIPTION_CONCURRENCY}",
+                  {'voice note end to end': summarize(timings)})
+    transcribed = sum(1 for update in updates if update.message.reply.text.startswith("📝"))
+    print(f"throughput: {args.messages / elapsed:.1f} notes/s, transcribed {transcribed}, "
+          f"rejected or failed {args.messages - transcribed}")
+    print(f"transcription cache: {handler.transcription_cache.stats()}")
+    handler.close()
+
+async def synthesize_recording(ffmpeg: str, minutes: int) -> bytes:
+    """Запись урока: 9 секунд тона, 3 секунды тишины, стерео 44.1 кГц MP3 128 кбит/с"""
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, '-hide_banner', '-nostdin', '-loglevel', 'error', '-f', 'lavfi',
+        '-i', f"aevalsrc=0.5*sin(440*2*PI*t)*lt(mod(t\\,12)\\,9):s=44100:d={minutes * 60}",
+        '-ac', '2', '-c:a', 'libmp3lame', '-b:a', '128k', '-f', 'mp3', 'pipe:1',
+        stdout=asyncio.subprocess.PIPE
+    )
+    data, _ = await process.communicate()
+    return data
+
+async def bench_audio_preprocess(args):
+    """Объем загрузки и время распознавания длинной записи целиком и после подготовки"""
+    ffmpeg = AudioPreprocessor.find_ffmpeg()
+    if not ffmpeg:
+        print("ffmpeg not found")
+        return
+
+    recording = await synthesize_recording(ffmpeg, args.minutes)
+    source = ("lesson.mp3", BytesIO(recording))
+    backend = StubBackend(delay_per_mb=args.delay_per_mb_ms / 1000)
+    Config.TRANSCRIPTION_CACHE_PATH = os.path.join(tempfile.mkdtemp(), 'transcriptions.db')
+    handler = VoiceHandler(backend)
+    handler.preprocessor = AudioPreprocessor(ffmpeg=ffmpeg, max_chunk_seconds=args.chunk_seconds)
+
+    started = time.perf_counter()
+    await backend.transcribe(source, 'ru')
+    whole = time.perf_counter() - started
+
+    started = time.perf_counter()
+    chunks = await handler.preprocessor.prepare(source)
+    prepared = time.perf_counter()
+    await handler.transcribe_chunks(chunks)
+    finished = time.perf_counter()
+    handler.close()
+
+    uploaded = sum(len(chunk.data) for chunk in chunks)
+    print(f"\n{args.minutes} min recording, stub {args.delay_per_mb_ms} ms per MB")
+    print(f"{'case':<40}{'bytes':>14}{'chunks':>8}{'wall ms':>12}")
+    print(f"{'whole file':<40}{len(recording):>14}{1:>8}{whole * 1000:>12.0f}")
+    print(f"{'preprocessed':<40}{uploaded:>14}{len(chunks):>8}{(finished - started) * 1000:>12.0f}")
+    print(f"preprocessing {(prepared - started) * 1000:.0f} ms, upload reduced {len(recording) / max(uploaded, 1):.1f}x")
+
+def make_updates(count: int, chats: int, seed: int = 42) -> List[Update]:
+    rng = random.Random(seed)
+    now = datetime.now()
+    updates = []
+    for update_id in range(count):
+        chat_id = rng.randint(1, chats)
+        user = User(id=chat_id, first_name="Bench", is_bot=False)
+        message = Message(message_id=update_id, date=now, chat=Chat(id=chat_id, type=Chat.PRIVATE),
+                          from_user=user, text="/start")
+        updates.append(Update(update_id=update_id, message=message))
+    return updates
+
+async def bench_update_processing(args):
+    """
+    Пропускная способность обработки обновлений: последовательная обработка
+    (CONCURRENT_UPDATES=1) и PerChatUpdateProcessor, параллельный по чатам.
+    Процессор одинаков для polling и webhook, сетевой транспорт не моделируется
+    """
+    updates = make_updates(args.updates, args.chats)
+    rng = random.Random(7)
+    delays = [
+        (args.slow_ms if rng.random() < args.slow_ratio else args.fast_ms) / 1000
+        for _ in updates
+    ]
+
+    async def run_case(processor: Optional[PerChatUpdateProcessor]):
+        latencies: List[float] = []
+        order: Dict[int, List[int]] = {}
+
+        async def handle(update: Update, arrived: float):
+            await asyncio.sleep(delays[update.update_id])
+            order.setdefault(update.effective_chat.id, []).append(update.update_id)
+            latencies.append((time.perf_counter() - arrived) * 1000)
+
+        started = time.perf_counter()
+        if processor is None:
+            for update in updates:
+                await handle(update, started)
+        else:
+            await processor.initialize()
+            await asyncio.gather(*(
+                processor.process_update(update, handle(update, started)) for update in updates
+            ))
+            await processor.shutdown()
+        elapsed = time.perf_counter() - started
+
+        in_order = all(ids == sorted(ids) for ids in order.values())
+        return summarize(latencies), args.updates / elapsed, in_order
+
+    results = {}
+    throughput = {}
+    for case, processor in (
+        ('sequential', None),
+        ('per-chat processor', PerChatUpdateProcessor(
+            max_concurrent=args.concurrency, max_pending=args.updates
+        )),
+    ):
+        results[case], throughput[case], in_order = await run_case(processor)
+        if not in_order:
+            print(f"{case}: updates of one chat processed out of order")
+
+    print_results(f"{args.updates} updates from {args.chats} chats, {args.slow_ratio:.0%} slow "
+                  f"({args.slow_ms} ms), others {args.fast_ms} ms", results)
+    for case, rate in throughput.items():
+        print(f"{case:<40}{rate:>12.1f} updates/s")
+
+def run_replica(database_url: str, holder: str, ttl: float, events):
+    """Реплика для замера переключения лидера: сообщает о смене роли в очередь"""
+    async def replica():
+        db = AsyncDatabaseManager(database_url)
+        await db.init_database()
+        stopped = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+        elector = LeaderElector(
+            db, 'benchmark', holder=holder, ttl=ttl,
+            on_elected=lambda: events.put((holder, 'elected', time.time())),
+            on_demoted=lambda: events.put((holder, 'demoted', time.time()))
+        )
+        elector.start()
+        await stopped.wait()
+        await elector.stop()
+        await db.dispose()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(replica())
+
+async def bench_leader_failover(args):
+    """
+    Время переключения лидера между двумя процессами с общей базой:
+    при падении лидера (SIGKILL) и при штатной остановке (SIGTERM)
+    """
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'leases.db')}"
+    DatabaseManager(database_url)
+    context = multiprocessing.get_context('spawn')
+    events = context.Queue()
+    replicas = {}
+
+    def spawn(holder: str):
+        process = context.Process(target=run_replica, args=(database_url, holder, args.ttl, events))
+        process.start()
+        replicas[holder] = process
+
+    async def next_event(timeout: float):
+        return await asyncio.to_thread(events.get, True, timeout)
+
+    spawn('replica-a')
+    leader, _, _ = await next_event(30)
+    spawn('replica-b')
+    await asyncio.sleep(args.ttl)
+
+    results = {}
+    for case, sig in (('leader killed (SIGKILL)', signal.SIGKILL), ('leader stopped (SIGTERM)', signal.SIGTERM)):
+        stopped_at = time.time()
+        os.kill(replicas[leader].pid, sig)
+        holder, event_name, at = await next_event(args.ttl * 3)
+        if event_name == 'demoted':
+            holder, event_name, at = await next_event(args.ttl * 3)
+        results[case] = (at - stopped_at) * 1000
+        replicas.pop(leader).join()
+        leader = holder
+        spawn(f"replica-{len(results) + 2}")
+        await asyncio.sleep(1)
+
+    for process in replicas.values():
+        process.terminate()
+        process.join()
+
+    print(f"\nLeader failover, lease {args.ttl}s, renew every {args.ttl / 3:.1f}s")
+    for case, failover_ms in results.items():
+        print(f"{case:<40}{failover_ms:>12.0f} ms")
+
+async def fill_job_store(database_url: str, count: int, due: int, chunk_size: int = 10000):
+    """Запись задач напоминаний напрямую в таблицу хранилища пачками"""
+    jobstore = create_job_store(database_url)
+    scheduler = create_job_scheduler(jobstore)
+    scheduler.start(paused=True)
+    rng = random.Random(42)
+    now = datetime.now(pytz.timezone(Config.TIMEZONE))
+
+    for offset in range(0, count, chunk_size):
+        rows = []
+        for i in range(offset, min(offset + chunk_size, count)):
+            run_at = now - timedelta(minutes=rng.randint(1, 30)) if i < due else now + timedelta(minutes=rng.randint(1, 43200))
+            job = Job(
+                scheduler, id=f"custom_reminder_{i}", func=send_custom_reminder_job,
+                trigger=DateTrigger(run_date=run_at), executor='default', args=(i, "Benchmark reminder"),
+                kwargs={}, name='send_custom_reminder_job', misfire_grace_time=Config.CUSTOM_REMINDER_MISFIRE_GRACE_SECONDS,
+                coalesce=True, max_instances=1, next_run_time=run_at
+            )
+            rows.append({
+                'id': job.id,
+                'next_run_time': datetime_to_utc_timestamp(run_at),
+                'job_state': pickle.dumps(job.__getstate__(), jobstore.pickle_protocol)
+            })
+        with jobstore.engine.begin() as connection:
+            connection.execute(jobstore.jobs_t.insert(), rows)
+
+    scheduler.shutdown()
+    jobstore.engine.dispose()
+
+async def bench_job_store(args):
+    """Подъем сохраненных индивидуальных напоминаний после перезапуска"""
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}"
+    DatabaseManager(database_url)
+    await fill_job_store(database_url, args.jobs, args.due)
+    for name in ('apscheduler', 'scheduler'):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    async def send_message(chat_id: int, text: str, **kwargs):
+        sent.append(chat_id)
+        if len(sent) >= args.due:
+            all_sent.set()
+
+    sent: List[int] = []
+    all_sent = asyncio.Event()
+    async_db = AsyncDatabaseManager(database_url)
+    bot_application = SimpleNamespace(bot=SimpleNamespace(send_message=send_message))
+    rate_limiter = TelegramRateLimiter(global_rate=1_000_000, per_chat_rate=1_000_000)
+    results = {}
+
+    started = time.perf_counter()
+    reminder_scheduler = ReminderScheduler(bot_application, async_db, rate_limiter, database_url=database_url)
+    await reminder_scheduler.open()
+    results['open job store (paused)'] = (time.perf_counter() - started) * 1000
+
+    try:
+        started = time.perf_counter()
+        await reminder_scheduler.start()
+        if args.due:
+            try:
+                await asyncio.wait_for(all_sent.wait(), timeout=args.timeout)
+            except asyncio.TimeoutError:
+                pass
+        results[f'start and run {args.due} missed jobs'] = (time.perf_counter() - started) * 1000
+        if len(sent) != args.due:
+            raise RuntimeError(f"Expected {args.due} missed reminders to be sent, got {len(sent)}")
+
+        started = time.perf_counter()
+        job_ids = await reminder_scheduler.get_scheduled_jobs()
+        results[f'get_scheduled_jobs ({len(job_ids)} ids)'] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        await reminder_scheduler.cancel_reminder(job_ids[len(job_ids) // 2])
+        results['cancel_reminder'] = (time.perf_counter() - started) * 1000
+    finally:
+        await reminder_scheduler.close()
+        await async_db.dispose()
+
+    print(f"\n{args.jobs} stored custom reminders, {args.due} came due while stopped, {len(sent)} sent")
+    for case, elapsed_ms in results.items():
+        print(f"{case:<40}{elapsed_ms:>12.1f} ms")
+
+async def bench_recurring(args):
+    """Объем базы и задержка запросов при хранении еженедельных уроков строками и правилами"""
+    teachers = max(args.students // 20, 1)
+    term_start = date.today() - timedelta(weeks=args.weeks // 2)
+    term_end = term_start + timedelta(weeks=args.weeks)
+    rng = random.Random(42)
+    plans = [
+        (rng.randint(1, teachers), student_id, weekdays_mask(rng.sample(range(5), args.per_week)),
+         dtime(rng.randint(9, 19), rng.choice((0, 30))))
+        for student_id in range(1, args.students + 1)
+    ]
+    tmp_dir = tempfile.mkdtemp()
+    
+    for mode in ('rows', 'rules'):
+        path = os.path.join(tmp_dir, f"{mode}.db")
+        database_url = f"sqlite:///{path}"
+        db_manager = DatabaseManager(database_url)
+        generator = SyntheticDataGenerator(db_manager)
+        generator.generate(teachers, args.students, 0)
+        
+        if mode == 'rows':
+            rows = (
+                {
+                    'teacher_id': teacher_id, 'student_id': student_id,
+                    'lesson_date': lesson_date, 'lesson_time': lesson_time,
+                    'lesson_start_utc': lesson_start_utc(lesson_date, lesson_time),
+                    'subject': "Математика", 'duration_minutes': 60, 'status': 'scheduled'
+                }
+                for teacher_id, student_id, mask, lesson_time in plans
+                for lesson_date in recurring_dates(
+                    SimpleNamespace(weekdays=mask, interval_weeks=1, start_date=term_start, end_date=term_end),
+                    term_start, term_end
+                )
+            )
+            generator.insert_chunks(Schedule, rows)
+        else:
+            generator.insert_chunks(RecurringLesson, (
+                {
+                    'teacher_id': teacher_id, 'student_id': student_id, 'weekdays': mask, 'interval_weeks': 1,
+                    'lesson_time': lesson_time, 'subject': "Математика", 'duration_minutes': 60,
+                    'start_date': term_start, 'end_date': term_end
+                }
+                for teacher_id, student_id, mask, lesson_time in plans
+            ))
+        with db_manager.engine.connect() as connection:
+            stored = connection.scalar(select(func.count()).select_from(Schedule.__table__))
+            rules = connection.scalar(select(func.count()).select_from(RecurringLesson.__table__))
+        db_manager.engine.dispose()
+        
+        async_db = AsyncDatabaseManager(database_url)
+        schedule_manager = AsyncScheduleManager(async_db)
+        engine = async_db.engine.sync_engine
+        now = datetime.now(timezone.utc)
+        window_end = now + timedelta(hours=Config.REMINDER_WINDOW_HOURS)
+        
+        async def load_reminder_window():
+            await schedule_manager.materialize_window(now, window_end)
+            return await schedule_manager.get_reminder_window(now, window_end)
+        
+        results = {
+            'student day view': await measure(
+                lambda: schedule_manager.get_user_schedule(
+                    rng.randint(1, args.students), 'student',
+                    term_start + timedelta(days=rng.randint(0, args.weeks * 7))
+                ),
+                args.repeats, engine
+            ),
+            'teacher day view': await measure(
+                lambda: schedule_manager.get_user_schedule(rng.randint(1, teachers), 'teacher', date.today()),
+                args.repeats, engine
+            ),
+            'student schedule page': await measure(
+                lambda: schedule_manager.get_user_schedule_page(rng.randint(1, args.students), 'student'),
+                args.repeats, engine
+            ),
+            'reminder window': await measure(load_reminder_window, args.repeats, engine),
+        }
+        await async_db.dispose()
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print_results(f"{mode}: {stored} schedule rows, {rules} rules, database {size_mb:.1f} MB", results)
+
+async def mixed_workload(schedule_manager: AsyncScheduleManager, args, lesson_ids: int) -> Dict[str, Dict[str, float]]:
+    """Читатели смотрят расписание, писатели добавляют уроки и отмечают доставку напоминаний"""
+    deadline = time.perf_counter() + args.seconds
+    timings: Dict[str, List[float]] = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    today = date.today()
+
+    async def reader(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if rng.random() < 0.5:
+                    await schedule_manager.get_user_schedule(rng.randint(1, args.teachers), 'teacher', today)
+                else:
+                    await schedule_manager.get_user_schedule_page(rng.randint(1, args.students), 'student')
+            except Exception as e:
+                errors['read'] += 1
+                logger.debug(f"Read failed: {e}")
+                continue
+            timings['read'].append((time.perf_counter() - started) * 1000)
+
+    async def writer(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if rng.random() < 0.5:
+                    await schedule_manager.add_lesson(
+                        rng.randint(1, args.teachers), rng.randint(1, args.students),
+                        today + timedelta(days=rng.randint(0, 30)), dtime(rng.randint(8, 20), rng.choice((0, 30))),
+                        "Математика"
+                    )
+                else:
+                    await schedule_manager.claim_reminder_delivery(
+                        rng.randint(1, lesson_ids), rng.choice(('teacher', 'student')), rng.randint(1, 10_000)
+                    )
+            except Exception as e:
+                errors['write'] += 1
+                logger.debug(f"Write failed: {e}")
+                continue
+            timings['write'].append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(
+        *(reader(seed) for seed in range(args.readers)),
+        *(writer(1000 + seed) for seed in range(args.writers))
+    )
+    return {
+        kind: {
+            'ops_per_sec': len(values) / args.seconds,
+            'errors': errors[kind],
+            **(summarize(values) if values else {'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'queries': 0.0})
+        }
+        for kind, values in timings.items()
+    }
+
+async def bench_engine_profiles(args):
+    """Пропускная способность смешанной нагрузки чтения и записи для каждого профиля движка"""
+    tmp_dir = tempfile.mkdtemp()
+    print(f"{'profile':<12}{'journal':>10}{'reads/s':>10}{'read p95':>10}{'writes/s':>10}"
+          f"{'write p95':>11}{'errors':>8}")
+    for profile in args.profiles:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp_dir, f'{profile}.db')}"
+        db_manager = DatabaseManager(database_url, profile)
+        SyntheticDataGenerator(db_manager).generate(args.teachers, args.students, args.lessons)
+        db_manager.engine.dispose()
+
+        async_db = AsyncDatabaseManager(database_url, profile)
+        journal = '-'
+        if async_db.engine.dialect.name == 'sqlite':
+            async with async_db.engine.connect() as connection:
+                journal = await connection.scalar(text("PRAGMA journal_mode"))
+        results = await mixed_workload(AsyncScheduleManager(async_db), args, args.lessons)
+        await async_db.dispose()
+
+        read, write = results['read'], results['write']
+        print(f"{profile:<12}{journal:>10}{read['ops_per_sec']:>10.0f}{read['p95_ms']:>10.1f}"
+              f"{write['ops_per_sec']:>10.0f}{write['p95_ms']:>11.1f}{read['errors'] + write['errors']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram Bot - performance benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    schedule_view = subparsers.add_parser('schedule-view', help="schedule view latency with and without indexes")
+    schedule_view.add_argument('--rows', type=int, default=1_000_000)
+    schedule_view.add_argument('--teachers', type=int, default=500)
+    schedule_view.add_argument('--students', type=int, default=5000)
+    schedule_view.add_argument('--repeats', type=int, default=50)
+    schedule_view.add_argument('--database-url', default=None,
+                               help="empty database to fill (default: temporary SQLite file)")
+    schedule_view.set_defaults(handler=bench_schedule_view)
+
+    queries = subparsers.add_parser('queries', help="core query latency on synthetic databases of growing size")
+    queries.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                         default=[10_000, 100_000, 1_000_000], help="comma separated numbers of lessons")
+    queries.add_argument('--repeats', type=int, default=100)
+    queries.add_argument('--database-url', default=None,
+                         help="database to fill, its data is replaced (default: temporary SQLite file per size)")
+    queries.set_defaults(handler=bench_queries)
+
+    recurring = subparsers.add_parser('recurring', help="weekly lessons stored as rows versus recurring rules")
+    recurring.add_argument('--students', type=int, default=5000)
+    recurring.add_argument('--weeks', type=int, default=36)
+    recurring.add_argument('--per-week', type=int, default=2)
+    recurring.add_argument('--repeats', type=int, default=50)
+    recurring.set_defaults(handler=bench_recurring)
+
+    voice_pipeline = subparsers.add_parser('voice-pipeline', help="voice pipeline with the stub transcription backend")
+    voice_pipeline.add_argument('--messages', type=int, default=200)
+    voice_pipeline.add_argument('--size-kb', type=int, default=64)
+    voice_pipeline.add_argument('--delay-ms', type=int, default=200,
+                                help="simulated transcription time per note")
+    voice_pipeline.add_argument('--unique', type=int, default=0,
+                                help="number of distinct notes (0 - all distinct)")
+    voice_pipeline.set_defaults(handler=bench_voice_pipeline)
+
+    audio_preprocess = subparsers.add_parser('audio-preprocess', help="long recording upload size and wall time with preprocessing")
+    audio_preprocess.add_argument('--minutes', type=int, default=20)
+    audio_preprocess.add_argument('--chunk-seconds', type=int, default=120)
+    audio_preprocess.add_argument('--delay-per-mb-ms', type=int, default=2000,
+                                  help="simulated upload and transcription time per MB")
+    audio_preprocess.set_defaults(handler=bench_audio_preprocess)
+
+    update_processing = subparsers.add_parser('update-processing', help="updates/sec with sequential and per-chat processor handling")
+    update_processing.add_argument('--updates', type=int, default=2000)
+    update_processing.add_argument('--chats', type=int, default=200)
+    update_processing.add_argument('--concurrency', type=int, default=Config.CONCURRENT_UPDATES)
+    update_processing.add_argument('--fast-ms', type=int, default=5)
+    update_processing.add_argument('--slow-ms', type=int, default=1000)
+    update_processing.add_argument('--slow-ratio', type=float, default=0.02)
+    update_processing.set_defaults(handler=bench_update_processing)
+
+    leader_failover = subparsers.add_parser('leader-failover', help="leader failover time between two replica processes")
+    leader_failover.add_argument('--ttl', type=float, default=Config.LEADER_LEASE_SECONDS)
+    leader_failover.add_argument('--database-url', default=None,
+                                 help="shared database (default: temporary SQLite file)")
+    leader_failover.set_defaults(handler=bench_leader_failover)
+
+    job_store = subparsers.add_parser('job-store', help="custom reminder job store rehydration after restart")
+    job_store.add_argument('--jobs', type=int, default=100_000)
+    job_store.add_argument('--due', type=int, default=100)
+    job_store.add_argument('--timeout', type=float, default=60,
+                           help="seconds to wait for the missed reminders to be sent")
+    job_store.add_argument('--database-url', default=None,
+                           help="empty database to fill (default: temporary SQLite file)")
+    job_store.set_defaults(handler=bench_job_store)
+
+    engine_profiles = subparsers.add_parser('engine-profiles', help="mixed read/write throughput per database engine profile")
+    engine_profiles.add_argument('--profiles', type=lambda value: value.split(','), default=list(ENGINE_PROFILES),
+                                 help="comma separated profiles to compare")
+    engine_profiles.add_argument('--lessons', type=int, default=100_000)
+    engine_profiles.add_argument('--teachers', type=int, default=200)
+    engine_profiles.add_argument('--students', type=int, default=2000)
+    engine_profiles.add_argument('--readers', type=int, default=8)
+    engine_profiles.add_argument('--writers', type=int, default=2)
+    engine_profiles.add_argument('--seconds', type=float, default=10)
+    engine_profiles.add_argument('--database-url', default=None,
+                                 help="database to fill for every profile, its data is replaced (default: temporary SQLite file per profile)")
+    engine_profiles.set_defaults(handler=bench_engine_profiles)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+if __name__ == "__main__":
+    main()
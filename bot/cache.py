@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+class TTLCache:
+    """Ограниченный LRU кэш с временем жизни записей"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self._evicted(key, value)
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        previous = self._data.pop(key, None)
+        if previous is not None:
+            self._evicted(key, previous[0])
+        self._data[key] = (value, expires_at)
+        while len(self._data) > self.maxsize:
+            evicted_key, (evicted_value, _) = self._data.popitem(last=False)
+            self._evicted(evicted_key, evicted_value)
+
+    def invalidate(self, key: Hashable):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._evicted(key, item[0])
+
+    def clear(self):
+        for key, (value, _) in list(self._data.items()):
+            self._evicted(key, value)
+        self._data.clear()
+
+    def _evicted(self, key: Hashable, value: Any):
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+
+class RenderCache:
+    """
+    Кэш отрисованных экранов расписания с ключом (user_type, user_id, view).
+    Записи пользователя сбрасываются при изменении его уроков
+    """
+
+    def __init__(self, maxsize: int = 5000, ttl: Optional[float] = 600):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=self._forget)
+        self.user_keys: Dict[Tuple[str, int], Set[Hashable]] = {}
+        self.size_bytes = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _entry_size(value: Tuple[str, Any]) -> int:
+        text, markup = value
+        size = len(text.encode('utf-8'))
+        if markup is not None:
+            for row in markup.inline_keyboard:
+                for button in row:
+                    size += len(button.text.encode('utf-8')) + len((button.callback_data or button.url or '').encode('utf-8'))
+        return size
+
+    def _forget(self, key: Hashable, value: Any):
+        self.size_bytes -= self._entry_size(value)
+        keys = self.user_keys.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.user_keys[key[:2]]
+
+    def get(self, user_type: str, user_id: int, view: str) -> Optional[Tuple[str, Any]]:
+        return self.cache.get((user_type, user_id, view))
+
+    def set(self, user_type: str, user_id: int, view: str, text: str, markup: Any):
+        key = (user_type, user_id, view)
+        value = (text, markup)
+        self.cache.set(key, value)
+        self.size_bytes += self._entry_size(value)
+        self.user_keys.setdefault((user_type, user_id), set()).add(key)
+
+    def invalidate_user(self, user_type: str, user_id: int):
+        for key in list(self.user_keys.get((user_type, user_id), ())):
+            self.cache.invalidate(key)
+            self.invalidations += 1
+
+    def on_schedule_change(self, change):
+        """Сброс экранов учителя и ученика, чьи уроки изменились"""
+        self.invalidate_user('teacher', change.teacher_id)
+        self.invalidate_user('student', change.student_id)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.cache.stats()
+        stats.update({
+            'size_bytes': self.size_bytes,
+            'users': len(self.user_keys),
+            'invalidations': self.invalidations
+        })
+        return stats
@@ -7,12 +7,81 @@ class Config:
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', 'YOUR_BOT_TOKEN_HERE')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'YOUR_OPENAI_API_KEY_HERE')
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///telegram_bot.db')
+    DB_ENGINE_PROFILE = os.getenv('DB_ENGINE_PROFILE', 'tuned')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+    SQLITE_MMAP_SIZE_MB = int(os.getenv('SQLITE_MMAP_SIZE_MB', '256'))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv('DB_POOL_RECYCLE_SECONDS', '1800'))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv('DB_POOL_TIMEOUT_SECONDS', '30'))
     REMINDER_MINUTES_BEFORE = 15
+    REMINDER_WINDOW_HOURS = float(os.getenv('REMINDER_WINDOW_HOURS', '6'))
+    REMINDER_RETRY_SECONDS = float(os.getenv('REMINDER_RETRY_SECONDS', '30'))
+    REMINDER_MAX_RETRIES = int(os.getenv('REMINDER_MAX_RETRIES', '5'))
+    REMINDER_CLAIM_TIMEOUT_SECONDS = float(os.getenv('REMINDER_CLAIM_TIMEOUT_SECONDS', '300'))
+    RECURRING_HORIZON_DAYS = int(os.getenv('RECURRING_HORIZON_DAYS', '90'))
+    CUSTOM_REMINDER_MISFIRE_GRACE_SECONDS = int(os.getenv('CUSTOM_REMINDER_MISFIRE_GRACE_SECONDS', '3600'))
+    CUSTOM_REMINDER_POLL_SECONDS = float(os.getenv('CUSTOM_REMINDER_POLL_SECONDS', '5'))
+    REMINDER_SEND_CONCURRENCY = int(os.getenv('REMINDER_SEND_CONCURRENCY', '20'))
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+    TELEGRAM_PER_CHAT_RATE = float(os.getenv('TELEGRAM_PER_CHAT_RATE', '1'))
     TIMEZONE = 'Europe/Moscow'
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+    CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+    MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', '1024'))
+    LEADER_ELECTION = os.getenv('LEADER_ELECTION', 'true').lower() == 'true'
+    LEADER_LEASE_SECONDS = float(os.getenv('LEADER_LEASE_SECONDS', '15'))
+    REPLICA_ID = os.getenv('REPLICA_ID', '')
+    PERSISTENCE_FLUSH_SECONDS = float(os.getenv('PERSISTENCE_FLUSH_SECONDS', '10'))
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '5000'))
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+    TRACE_SINK = os.getenv('TRACE_SINK', 'jsonl')
+    TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    ADMIN_TELEGRAM_IDS = {int(value) for value in os.getenv('ADMIN_TELEGRAM_IDS', '').split(',') if value.strip()}
     AUDIO_TEMP_DIR = 'temp_audio'
     MAX_AUDIO_SIZE_MB = 20
+    AUDIO_MEMORY_THRESHOLD_MB = int(os.getenv('AUDIO_MEMORY_THRESHOLD_MB', '10'))
+    AUDIO_PREPROCESSING = os.getenv('AUDIO_PREPROCESSING', 'true').lower() == 'true'
+    AUDIO_PREPROCESS_MIN_KB = int(os.getenv('AUDIO_PREPROCESS_MIN_KB', '256'))
+    AUDIO_PREPROCESS_CONCURRENCY = int(os.getenv('AUDIO_PREPROCESS_CONCURRENCY', '4'))
+    AUDIO_CHUNK_SECONDS = int(os.getenv('AUDIO_CHUNK_SECONDS', '120'))
+    TRANSCRIPTION_CHUNK_CONCURRENCY = int(os.getenv('TRANSCRIPTION_CHUNK_CONCURRENCY', '4'))
     SUPPORTED_AUDIO_FORMATS = ['.ogg', '.mp3', '.wav', '.m4a']
+    TRANSCRIPTION_CONCURRENCY = int(os.getenv('TRANSCRIPTION_CONCURRENCY', '2'))
+    TRANSCRIPTION_QUEUE_SIZE = int(os.getenv('TRANSCRIPTION_QUEUE_SIZE', '20'))
+    TRANSCRIPTION_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'auto')
+    TRANSCRIPTION_MODEL = os.getenv('TRANSCRIPTION_MODEL', 'whisper-1')
+    TRANSCRIPTION_LANGUAGE = os.getenv('TRANSCRIPTION_LANGUAGE', 'ru')
+    LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'small')
+    LOCAL_WHISPER_WORKERS = int(os.getenv('LOCAL_WHISPER_WORKERS', '2'))
+    LOCAL_WHISPER_COMPUTE_TYPE = os.getenv('LOCAL_WHISPER_COMPUTE_TYPE', 'int8')
+    LOCAL_WHISPER_CPU_THREADS = int(os.getenv('LOCAL_WHISPER_CPU_THREADS', '2'))
+    STUB_TRANSCRIPTION_DELAY_MS = int(os.getenv('STUB_TRANSCRIPTION_DELAY_MS', '0'))
+    STUB_TRANSCRIPTION_DELAY_PER_MB_MS = int(os.getenv('STUB_TRANSCRIPTION_DELAY_PER_MB_MS', '0'))
+    TRANSCRIPTION_CACHE_PATH = os.getenv('TRANSCRIPTION_CACHE_PATH', 'transcription_cache.db')
+    TRANSCRIPTION_CACHE_MEMORY_SIZE = int(os.getenv('TRANSCRIPTION_CACHE_MEMORY_SIZE', '1000'))
+    TRANSCRIPTION_CACHE_MAX_MB = int(os.getenv('TRANSCRIPTION_CACHE_MAX_MB', '50'))
     AI_CHAT_URL = "https://chat.openai.com"
+    SCHEDULE_PAGE_SIZE = int(os.getenv('SCHEDULE_PAGE_SIZE', '10'))
+    RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', '5000'))
+    RENDER_CACHE_TTL_SECONDS = int(os.getenv('RENDER_CACHE_TTL_SECONDS', '600'))
+    IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', '10000'))
+    IDENTITY_CACHE_TTL_SECONDS = int(os.getenv('IDENTITY_CACHE_TTL_SECONDS', '300'))
     
     @classmethod
     def validate_config(cls):
@@ -20,6 +89,21 @@ class Config:
         if cls.TELEGRAM_BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
             raise ValueError("TELEGRAM_BOT_TOKEN must be set")
         
+        if cls.BOT_MODE not in ('polling', 'webhook'):
+            raise ValueError("BOT_MODE must be 'polling' or 'webhook'")
+        
+        if cls.DB_ENGINE_PROFILE not in ('default', 'tuned'):
+            raise ValueError("DB_ENGINE_PROFILE must be 'default' or 'tuned'")
+        
+        if cls.SQLITE_SYNCHRONOUS.upper() not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError("SQLITE_SYNCHRONOUS must be OFF, NORMAL, FULL or EXTRA")
+        
+        if cls.TRACE_SINK not in ('jsonl', 'otlp'):
+            raise ValueError("TRACE_SINK must be 'jsonl' or 'otlp'")
+        
+        if cls.BOT_MODE == 'webhook' and not cls.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL must be set in webhook mode")
+        
         if cls.OPENAI_API_KEY == 'YOUR_OPENAI_API_KEY_HERE':
             print("Warning: OPENAI_API_KEY not set, voice recognition will not work")
         
@@ -1,67 +1,153 @@
 import logging
-from datetime import datetime, date
-from typing import Dict, Any
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from models import ScheduleManager, User, DatabaseManager
+from models import AsyncScheduleManager, AsyncUser, AsyncDatabaseManager
+from cache import TTLCache, RenderCache
 from config import Config
+from tracing import TRACER
 
 logger = logging.getLogger(__name__)
 
+SCHEDULE_PAGE_PREFIX = "sched"
+
+def encode_schedule_cursor(direction: str, lesson: Dict[str, Any]) -> str:
+    """Курсор страницы расписания для callback_data (не длиннее 64 байт)"""
+    lesson_date = lesson['lesson_date'].replace('-', '')
+    lesson_time = lesson['lesson_time'].replace(':', '')[:6]
+    return f"{SCHEDULE_PAGE_PREFIX}:{direction[0]}:{lesson_date}:{lesson_time}:{lesson['id']}"
+
+def decode_schedule_cursor(data: Optional[str]) -> Tuple[Optional[tuple], str]:
+    if not data:
+        return None, 'next'
+    try:
+        prefix, direction, lesson_date, lesson_time, lesson_id = data.split(':')
+        if prefix != SCHEDULE_PAGE_PREFIX or direction not in ('n', 'p'):
+            raise ValueError("unexpected prefix or direction")
+        cursor = (
+            datetime.strptime(lesson_date, "%Y%m%d").date(),
+            datetime.strptime(lesson_time, "%H%M%S").time(),
+            int(lesson_id)
+        )
+        return cursor, 'prev' if direction == 'p' else 'next'
+    except ValueError:
+        logger.warning(f"Invalid schedule cursor: {data}")
+        return None, 'next'
+
+def format_lesson(lesson: Dict[str, Any], user_type: str) -> str:
+    subject = lesson['subject'] or 'Урок'
+    
+    if user_type == 'teacher':
+        partner_name = f"{lesson['student_first_name']} {lesson['student_last_name']}"
+        icon = "👨‍🎓"
+    else:
+        partner_name = f"{lesson['teacher_first_name']} {lesson['teacher_last_name']}"
+        icon = "👨‍🏫"
+    
+    return (
+        f"🕐 {lesson['lesson_time']} - {subject}\n"
+        f"{icon} {partner_name}\n"
+        f"⏱ {lesson['duration_minutes']} мин\n\n"
+    )
+
 class BotHandlers:
-    def __init__(self, db_manager: DatabaseManager):
-        self.schedule_manager = ScheduleManager(db_manager)
-        self.user_model = User(db_manager)
+    def __init__(self, db_manager: AsyncDatabaseManager, identity_cache: Optional[TTLCache] = None,
+                 render_cache: Optional[RenderCache] = None):
+        self.schedule_manager = AsyncScheduleManager(db_manager)
+        self.user_model = AsyncUser(db_manager, identity_cache)
+        self.render_cache = render_cache
     
-    async def handle_view_schedule(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: Dict[str, Any]):
-        try:
-            schedule = self.schedule_manager.get_user_schedule(
-                user['id'], 
-                user['user_type']
-            )
+    async def render_cached(self, user: Dict[str, Any], view: str,
+                            render: Callable[[], Awaitable[Tuple[str, InlineKeyboardMarkup]]]):
+        """Готовый экран из кэша или отрисовка с сохранением в кэш"""
+        with TRACER.span('render', view=view) as span:
+            if self.render_cache is None:
+                return await render()
             
-            if not schedule:
-                await update.callback_query.edit_message_text(
-                    "📅 **Ваше расписание пусто**\n\nУ вас пока нет запланированных уроков.",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")
-                    ]])
-                )
-                return
+            cached = self.render_cache.get(user['user_type'], user['id'], view)
+            span.set('cached', cached is not None)
+            if cached is not None:
+                return cached
+            
+            message, reply_markup = await render()
+            self.render_cache.set(user['user_type'], user['id'], view, message, reply_markup)
+            return message, reply_markup
+    
+    async def render_schedule_page(self, user: Dict[str, Any],
+                                   page_data: Optional[str]) -> Tuple[str, InlineKeyboardMarkup]:
+        cursor, direction = decode_schedule_cursor(page_data)
+        with TRACER.span('schedule.get_user_schedule_page'):
+            page = await self.schedule_manager.get_user_schedule_page(
+                user['id'],
+                user['user_type'],
+                cursor,
+                direction,
+                Config.SCHEDULE_PAGE_SIZE
+            )
+        
+        if not page['lessons'] and cursor is not None:
+            page = await self.schedule_manager.get_user_schedule_page(
+                user['id'], user['user_type'], limit=Config.SCHEDULE_PAGE_SIZE
+            )
+        
+        if not page['lessons'] and not page['has_prev']:
+            return (
+                "📅 **Ваше расписание пусто**\n\nУ вас пока нет запланированных уроков.",
+                InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")
+                ]])
+            )
 
+        lessons = page['lessons']
+        if lessons:
             message = "📅 **Ваше расписание:**\n\n"
-            
-            current_date = None
-            for lesson in schedule:
-                lesson_date = datetime.fromisoformat(lesson['lesson_date']).date()
-                lesson_time = lesson['lesson_time']
-                subject = lesson['subject'] or 'Урок'
+        else:
+            message = "📅 **Ваше расписание:**\n\nПредстоящих уроков нет.\n"
+        
+        current_date = None
+        for lesson in lessons:
+            lesson_date = datetime.fromisoformat(lesson['lesson_date']).date()
+
+            if current_date != lesson_date:
+                current_date = lesson_date
+                date_str = lesson_date.strftime("%d.%m.%Y (%A)")
+                message += f"\n📆 **{date_str}**\n"
 
-                if current_date != lesson_date:
-                    current_date = lesson_date
-                    date_str = lesson_date.strftime("%d.%m.%Y (%A)")
-                    message += f"\n📆 **{date_str}**\n"
+            message += format_lesson(lesson, user['user_type'])
 
-                if user['user_type'] == 'teacher':
-                    partner_name = f"{lesson['student_first_name']} {lesson['student_last_name']}"
-                    icon = "👨‍🎓"
-                else:
-                    partner_name = f"{lesson['teacher_first_name']} {lesson['teacher_last_name']}"
-                    icon = "👨‍🏫"
-                
-                message += f"🕐 {lesson_time} - {subject}\n"
-                message += f"{icon} {partner_name}\n"
-                message += f"⏱ {lesson['duration_minutes']} мин\n\n"
+        navigation = []
+        if page['has_prev']:
+            navigation.append(InlineKeyboardButton(
+                "⬅️ Ранее",
+                callback_data=encode_schedule_cursor('prev', lessons[0]) if lessons else "view_schedule"
+            ))
+        if page['has_next'] and lessons:
+            navigation.append(InlineKeyboardButton(
+                "Далее ➡️", callback_data=encode_schedule_cursor('next', lessons[-1])
+            ))
 
-            keyboard = [
-                [InlineKeyboardButton("📅 Сегодня", callback_data="schedule_today")],
-                [InlineKeyboardButton("📅 Завтра", callback_data="schedule_tomorrow")],
-                [InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")]
-            ]
+        keyboard = [
+            [InlineKeyboardButton("📅 Сегодня", callback_data="schedule_today")],
+            [InlineKeyboardButton("📅 Завтра", callback_data="schedule_tomorrow")],
+            [InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")]
+        ]
+        if navigation:
+            keyboard.insert(0, navigation)
+        
+        return message, InlineKeyboardMarkup(keyboard)
+    
+    async def handle_view_schedule(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: Dict[str, Any],
+                                   page_data: Optional[str] = None):
+        try:
+            view = f"page:{page_data}" if page_data else f"page:{date.today().isoformat()}"
+            message, reply_markup = await self.render_cached(
+                user, view, lambda: self.render_schedule_page(user, page_data)
+            )
             
             await update.callback_query.edit_message_text(
                 message,
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=reply_markup
             )
         
         except Exception as e:
@@ -73,6 +159,30 @@ class BotHandlers:
                 ]])
             )
     
+    async def render_schedule_day(self, user: Dict[str, Any], target_date: date,
+                                  date_title: str) -> Tuple[str, InlineKeyboardMarkup]:
+        with TRACER.span('schedule.get_user_schedule'):
+            schedule = await self.schedule_manager.get_user_schedule(
+                user['id'], 
+                user['user_type'],
+                target_date
+            )
+        
+        if not schedule:
+            message = f"📅 **{date_title}**\n\nУроков не запланировано."
+        else:
+            message = f"📅 **{date_title} ({target_date.strftime('%d.%m.%Y')})**\n\n"
+            
+            for lesson in schedule:
+                message += format_lesson(lesson, user['user_type'])
+        
+        keyboard = [
+            [InlineKeyboardButton("📅 Все расписание", callback_data="view_schedule")],
+            [InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")]
+        ]
+        
+        return message, InlineKeyboardMarkup(keyboard)
+    
     async def handle_schedule_filter(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
                                      user: Dict[str, Any], filter_type: str):
         try:
@@ -81,44 +191,18 @@ class BotHandlers:
                 target_date = today
                 date_title = "Сегодня"
             else:
-                from datetime import timedelta
                 target_date = today + timedelta(days=1)
                 date_title = "Завтра"
             
-            schedule = self.schedule_manager.get_user_schedule(
-                user['id'], 
-                user['user_type'],
-                target_date
+            message, reply_markup = await self.render_cached(
+                user,
+                f"{filter_type}:{target_date.isoformat()}",
+                lambda: self.render_schedule_day(user, target_date, date_title)
             )
             
-            if not schedule:
-                message = f"📅 **{date_title}**\n\nУроков не запланировано."
-            else:
-                message = f"📅 **{date_title} ({target_date.strftime('%d.%m.%Y')})**\n\n"
-                
-                for lesson in schedule:
-                    lesson_time = lesson['lesson_time']
-                    subject = lesson['subject'] or 'Урок'
-                    
-                    if user['user_type'] == 'teacher':
-                        partner_name = f"{lesson['student_first_name']} {lesson['student_last_name']}"
-                        icon = "👨‍🎓"
-                    else:
-                        partner_name = f"{lesson['teacher_first_name']} {lesson['teacher_last_name']}"
-                        icon = "👨‍🏫"
-                    
-                    message += f"🕐 {lesson_time} - {subject}\n"
-                    message += f"{icon} {partner_name}\n"
-                    message += f"⏱ {lesson['duration_minutes']} мин\n\n"
-            
-            keyboard = [
-                [InlineKeyboardButton("📅 Все расписание", callback_data="view_schedule")],
-                [InlineKeyboardButton("🔙 Назад в меню", callback_data="main_menu")]
-            ]
-            
             await update.callback_query.edit_message_text(
                 message,
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=reply_markup
             )
         
         except Exception as e:
@@ -178,7 +262,7 @@ class BotHandlers:
     
     async def handle_toggle_reminders(self, update: Update, context: ContextTypes.DEFAULT_TYPE, 
                                     user: Dict[str, Any], enable: bool):
-        success = self.user_model.update_reminder_setting(user['telegram_id'], enable)
+        success = await self.user_model.update_reminder_setting(user['telegram_id'], enable)
         
         if success:
             status = "включены" if enable else "выключены"
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import itertools
+import logging
+import os
+import time
+from datetime import date, datetime
+from datetime import time as dtime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import pytz
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+from config import Config
+from models import AsyncDatabaseManager, Teacher, Student, Schedule, ImportCheckpoint, lesson_start_utc
+
+logger = logging.getLogger(__name__)
+
+Record = Dict[str, str]
+
+CSV_COLUMNS = ('teacher_login', 'student_login', 'lesson_date', 'lesson_time')
+LESSON_STATUSES = ('scheduled', 'completed', 'cancelled')
+COPY_COLUMNS = (
+    'teacher_id', 'student_id', 'lesson_date', 'lesson_time', 'lesson_start_utc',
+    'subject', 'duration_minutes', 'status', 'created_at'
+)
+ICS_DURATION_UNITS = (('W', 7 * 24 * 60), ('D', 24 * 60), ('H', 60), ('M', 1))
+
+class ImportRowError(ValueError):
+    pass
+
+def parse_lesson_time(value: str) -> dtime:
+    for pattern in ('%H:%M', '%H:%M:%S'):
+        try:
+            return datetime.strptime(value, pattern).time()
+        except ValueError:
+            continue
+    raise ValueError(f"bad time '{value}'")
+
+def file_fingerprint(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_csv(path: str) -> Iterator[Tuple[int, Record]]:
+    """
+    Построчное чтение CSV с колонками teacher_login, student_login, lesson_date (ГГГГ-ММ-ДД),
+    lesson_time (ЧЧ:ММ) и необязательными subject, duration_minutes, status
+    """
+    with open(path, newline='', encoding='utf-8-sig') as source:
+        reader = csv.DictReader(source)
+        missing = [column for column in CSV_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV file is missing columns: {', '.join(missing)}")
+        for number, record in enumerate(reader, start=1):
+            yield number, record
+
+def unfold_ics(path: str) -> Iterator[str]:
+    with open(path, encoding='utf-8-sig') as source:
+        current = None
+        for line in source:
+            line = line.rstrip('\r\n')
+            if line[:1] in (' ', '\t') and current is not None:
+                current += line[1:]
+                continue
+            if current is not None:
+                yield current
+            current = line
+        if current is not None:
+            yield current
+
+def parse_ics_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    head, _, value = line.partition(':')
+    name, *params = head.split(';')
+    parameters = {}
+    for param in params:
+        key, _, param_value = param.partition('=')
+        parameters[key.upper()] = param_value.strip('"')
+    return name.upper(), parameters, value
+
+def ics_text(value: str) -> str:
+    return value.replace('\\n', ' ').replace('\\N', ' ').replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\')
+
+def ics_login(value: str, parameters: Dict[str, str]) -> str:
+    if value.lower().startswith('mailto:'):
+        return value[7:].split('@')[0]
+    return parameters.get('CN', value)
+
+def ics_datetime(value: str, parameters: Dict[str, str]) -> datetime:
+    if parameters.get('VALUE') == 'DATE' or 'T' not in value:
+        raise ImportRowError("all-day events are not lessons")
+    moment = datetime.strptime(value.rstrip('Z')[:15], '%Y%m%dT%H%M%S')
+    local_zone = pytz.timezone(Config.TIMEZONE)
+    if value.endswith('Z'):
+        return pytz.utc.localize(moment).astimezone(local_zone).replace(tzinfo=None)
+    if 'TZID' in parameters:
+        try:
+            zone = pytz.timezone(parameters['TZID'])
+        except pytz.UnknownTimeZoneError:
+            raise ImportRowError(f"unknown time zone {parameters['TZID']}")
+        return zone.localize(moment).astimezone(local_zone).replace(tzinfo=None)
+    return moment
+
+def ics_duration_minutes(value: str) -> int:
+    value = value.lstrip('+').lstrip('P').replace('T', '')
+    minutes = 0
+    number = ''
+    for char in value:
+        if char.isdigit():
+            number += char
+            continue
+        for unit, scale in ICS_DURATION_UNITS:
+            if char == unit:
+                minutes += int(number or 0) * scale
+        number = ''
+    return minutes
+
+def ics_event_record(properties: List[Tuple[str, Dict[str, str], str]]) -> Record:
+    record: Record = {}
+    start = end = None
+    for name, parameters, value in properties:
+        if name == 'DTSTART':
+            start = ics_datetime(value, parameters)
+        elif name == 'DTEND':
+            end = ics_datetime(value, parameters)
+        elif name == 'DURATION':
+            record['duration_minutes'] = str(ics_duration_minutes(value))
+        elif name == 'SUMMARY':
+            record['subject'] = ics_text(value)
+        elif name == 'STATUS' and value.upper() == 'CANCELLED':
+            record['status'] = 'cancelled'
+        elif name == 'RRULE':
+            raise ImportRowError("recurring events are not expanded, export single occurrences")
+        elif name == 'X-TEACHER-LOGIN' or (name == 'ORGANIZER' and 'teacher_login' not in record):
+            record['teacher_login'] = ics_login(value, parameters)
+        elif name == 'X-STUDENT-LOGIN' or (name == 'ATTENDEE' and 'student_login' not in record):
+            record['student_login'] = ics_login(value, parameters)
+
+    if start is None:
+        raise ImportRowError("event has no DTSTART")
+    record['lesson_date'] = start.date().isoformat()
+    record['lesson_time'] = start.time().strftime('%H:%M')
+    if end is not None and 'duration_minutes' not in record:
+        record['duration_minutes'] = str(int((end - start).total_seconds() // 60))
+    return record
+
+def read_ics(path: str) -> Iterator[Tuple[int, Record]]:
+    """
+    Потоковое чтение VEVENT из iCalendar. Преподаватель берется из X-TEACHER-LOGIN
+    или ORGANIZER, ученик из X-STUDENT-LOGIN или первого ATTENDEE (часть адреса до @, иначе CN).
+    Ошибочные события передаются дальше как записи с ключом error
+    """
+    number = 0
+    properties = None
+    for line in unfold_ics(path):
+        if line == 'BEGIN:VEVENT':
+            properties = []
+        elif line == 'END:VEVENT' and properties is not None:
+            number += 1
+            try:
+                yield number, ics_event_record(properties)
+            except (ImportRowError, ValueError) as e:
+                yield number, {'error': str(e)}
+            properties = None
+        elif properties is not None and line:
+            properties.append(parse_ics_property(line))
+
+READERS = {'csv': read_csv, 'ics': read_ics}
+
+class ScheduleImporter:
+    """
+    Потоковый импорт уроков из CSV и iCalendar.
+
+    Логины проверяются по заранее загруженным словарям логин -> id, строки пишутся
+    пачками по chunk_size через executemany (на PostgreSQL с asyncpg через COPY).
+    Позиция в файле сохраняется в import_checkpoints в той же транзакции, что и пачка,
+    поэтому повторный запуск после сбоя продолжает с последней записанной пачки
+    """
+
+    def __init__(self, db_manager: AsyncDatabaseManager, chunk_size: int = 5000, use_copy: bool = True,
+                 max_logged_errors: int = 20):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.use_copy = use_copy
+        self.max_logged_errors = max_logged_errors
+        self.teachers: Dict[str, int] = {}
+        self.students: Dict[str, int] = {}
+        self.logged_errors = 0
+
+    async def load_logins(self):
+        async with self.db_manager.engine.connect() as connection:
+            self.teachers = dict((await connection.execute(select(Teacher.login, Teacher.id))).all())
+            self.students = dict((await connection.execute(select(Student.login, Student.id))).all())
+        logger.info(f"Loaded {len(self.teachers)} teacher and {len(self.students)} student logins")
+
+    def parse_record(self, record: Record) -> Dict[str, Any]:
+        if 'error' in record:
+            raise ImportRowError(record['error'])
+
+        teacher_login = (record.get('teacher_login') or '').strip()
+        student_login = (record.get('student_login') or '').strip()
+        teacher_id = self.teachers.get(teacher_login)
+        student_id = self.students.get(student_login)
+        if teacher_id is None:
+            raise ImportRowError(f"unknown teacher login '{teacher_login}'")
+        if student_id is None:
+            raise ImportRowError(f"unknown student login '{student_login}'")
+
+        try:
+            lesson_date = date.fromisoformat((record.get('lesson_date') or '').strip())
+            lesson_time = parse_lesson_time((record.get('lesson_time') or '').strip())
+        except ValueError:
+            raise ImportRowError(f"bad date or time '{record.get('lesson_date')} {record.get('lesson_time')}'")
+
+        duration = (record.get('duration_minutes') or '').strip() or '60'
+        if not duration.isdigit() or not 0 < int(duration) <= 24 * 60:
+            raise ImportRowError(f"bad duration '{duration}'")
+
+        status = (record.get('status') or '').strip().lower() or 'scheduled'
+        if status not in LESSON_STATUSES:
+            raise ImportRowError(f"bad status '{status}'")
+
+        subject = (record.get('subject') or '').strip() or None
+        if subject is not None and len(subject) > 100:
+            raise ImportRowError("subject is longer than 100 characters")
+
+        return {
+            'teacher_id': teacher_id,
+            'student_id': student_id,
+            'lesson_date': lesson_date,
+            'lesson_time': lesson_time,
+            'lesson_start_utc': lesson_start_utc(lesson_date, lesson_time),
+            'subject': subject,
+            'duration_minutes': int(duration),
+            'status': status
+        }
+
+    def reject(self, filename: str, number: int, error: Exception):
+        if self.logged_errors < self.max_logged_errors:
+            logger.warning(f"{filename}: record {number} rejected: {error}")
+        elif self.logged_errors == self.max_logged_errors:
+            logger.warning(f"{filename}: further rejected records are only counted")
+        self.logged_errors += 1
+
+    def can_copy(self, connection: AsyncConnection) -> bool:
+        return (self.use_copy and connection.dialect.name == 'postgresql'
+                and connection.dialect.driver == 'asyncpg')
+
+    async def copy_rows(self, connection: AsyncConnection, rows: List[Dict[str, Any]]):
+        created_at = datetime.now()
+        records = [
+            tuple(created_at if column == 'created_at' else row[column] for column in COPY_COLUMNS)
+            for row in rows
+        ]
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Schedule.__tablename__, records=records, columns=COPY_COLUMNS
+        )
+
+    async def write_chunk(self, source: str, rows: List[Dict[str, Any]], position: int,
+                          imported: int, rejected: int):
+        """
+        Запись пачки уроков вместе с позицией в файле одной транзакцией. Позиция
+        обновляется первой: asyncpg открывает транзакцию на первом запросе, и COPY
+        после него идет в ту же транзакцию
+        """
+        async with self.db_manager.engine.begin() as connection:
+            await connection.execute(
+                update(ImportCheckpoint)
+                .where(ImportCheckpoint.source == source)
+                .values(position=position, imported=imported, rejected=rejected, updated_at=datetime.now())
+            )
+            if rows:
+                if self.can_copy(connection):
+                    await self.copy_rows(connection, rows)
+                else:
+                    await connection.execute(insert(Schedule), rows)
+
+    async def open_checkpoint(self, source: str, filename: str, restart: bool) -> ImportCheckpoint:
+        async with self.db_manager.get_session() as session:
+            checkpoint = await session.get(ImportCheckpoint, source)
+            if checkpoint is None:
+                checkpoint = ImportCheckpoint(source=source, filename=filename, position=0,
+                                              imported=0, rejected=0, finished=False)
+                session.add(checkpoint)
+            elif restart:
+                checkpoint.position = checkpoint.imported = checkpoint.rejected = 0
+                checkpoint.finished = False
+            await session.flush()
+            session.expunge(checkpoint)
+            return checkpoint
+
+    async def finish(self, source: str):
+        async with self.db_manager.engine.begin() as connection:
+            await connection.execute(
+                update(ImportCheckpoint).where(ImportCheckpoint.source == source).values(finished=True)
+            )
+
+    async def run(self, path: str, file_format: Optional[str] = None, restart: bool = False) -> Dict[str, Any]:
+        """
+        Импорт файла. Файл опознается по содержимому, поэтому повторный запуск
+        с тем же файлом продолжает импорт, а уже завершенный импорт пропускается
+        """
+        file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise ValueError(f"Unsupported import format: {file_format}")
+
+        filename = os.path.basename(path)
+        source = file_fingerprint(path)
+        checkpoint = await self.open_checkpoint(source, filename, restart)
+        if checkpoint.finished:
+            logger.info(f"{filename} was already imported: {checkpoint.imported} lessons, "
+                        f"{checkpoint.rejected} rejected (use restart to import again)")
+            return {'imported': 0, 'rejected': 0, 'skipped': checkpoint.position, 'elapsed': 0.0}
+        if checkpoint.position:
+            logger.info(f"Resuming {filename} after record {checkpoint.position}")
+
+        await self.load_logins()
+        started = time.perf_counter()
+        position, imported, rejected = checkpoint.position, checkpoint.imported, checkpoint.rejected
+        processed = 0
+        records = itertools.islice(READERS[file_format](path), checkpoint.position, None)
+
+        while True:
+            batch = list(itertools.islice(records, self.chunk_size))
+            if not batch:
+                break
+            rows = []
+            for number, record in batch:
+                try:
+                    rows.append(self.parse_record(record))
+                except ImportRowError as e:
+                    rejected += 1
+                    self.reject(filename, number, e)
+            position = batch[-1][0]
+            imported += len(rows)
+            processed += len(batch)
+            await self.write_chunk(source, rows, position, imported, rejected)
+
+            elapsed = time.perf_counter() - started
+            logger.info(f"{filename}: {position} records read, {imported} lessons imported, "
+                        f"{rejected} rejected ({processed / elapsed:.0f} rows/s)")
+
+        await self.finish(source)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Import of {filename} finished in {elapsed:.1f}s: {imported} lessons imported, "
+                    f"{rejected} rejected")
+        return {
+            'imported': imported - checkpoint.imported,
+            'rejected': rejected - checkpoint.rejected,
+            'skipped': checkpoint.position,
+            'elapsed': elapsed
+        }
+
+async def run_import(args: argparse.Namespace):
+    db_manager = AsyncDatabaseManager(args.database_url)
+    await db_manager.init_database()
+    try:
+        importer = ScheduleImporter(db_manager, chunk_size=args.chunk_size, use_copy=not args.no_copy)
+        await importer.run(args.path, args.format, restart=args.restart)
+    finally:
+        await db_manager.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram Bot - schedule import from CSV or iCalendar")
+    parser.add_argument('path', help="CSV or .ics file")
+    parser.add_argument('--format', choices=sorted(READERS), default=None,
+                        help="file format (default: by extension)")
+    parser.add_argument('--chunk-size', type=int, default=Config.IMPORT_CHUNK_SIZE)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--restart', action='store_true', help="import the file again from the beginning")
+    parser.add_argument('--no-copy', action='store_true', help="use INSERT instead of COPY on PostgreSQL")
+    args = parser.parse_args()
+    asyncio.run(run_import(args))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,101 @@
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+from models import AsyncDatabaseManager, AsyncLeaseStore
+
+logger = logging.getLogger(__name__)
+
+def default_replica_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LeaderElector:
+    """
+    Выбор лидера среди реплик через аренду в общей базе.
+    Лидер продлевает аренду каждые ttl/3 секунд, остальные реплики с тем же
+    интервалом пытаются ее захватить. При падении лидера аренда истекает
+    не позже чем через ttl, при штатной остановке освобождается сразу.
+    Потеряв связь с базой, лидер слагает полномочия до истечения аренды
+    """
+
+    def __init__(self, db_manager: AsyncDatabaseManager, name: str, holder: Optional[str] = None,
+                 ttl: float = 15, on_elected: Optional[Callable[[], Any]] = None,
+                 on_demoted: Optional[Callable[[], Any]] = None):
+        self.leases = AsyncLeaseStore(db_manager)
+        self.name = name
+        self.holder = holder or default_replica_id()
+        self.ttl = ttl
+        self.renew_interval = ttl / 3
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.renewed_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self.elections = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+            logger.info(f"Leader election for '{self.name}' started as {self.holder}")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+        if self.is_leader:
+            await self.set_leader(False)
+            try:
+                await self.leases.release(self.name, self.holder)
+            except Exception as e:
+                logger.error(f"Error releasing lease '{self.name}': {e}")
+
+    async def set_leader(self, is_leader: bool):
+        self.is_leader = is_leader
+        callback = self.on_elected if is_leader else self.on_demoted
+        if is_leader:
+            self.elections += 1
+            logger.info(f"{self.holder} is now the leader for '{self.name}'")
+        else:
+            logger.warning(f"{self.holder} lost leadership for '{self.name}'")
+
+        if callback is not None:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error in leadership callback for '{self.name}': {e}")
+
+    async def run(self):
+        while True:
+            try:
+                acquired = await self.leases.try_acquire(self.name, self.holder, self.ttl)
+                if acquired:
+                    self.renewed_at = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error renewing lease '{self.name}': {e}")
+                acquired = self.is_leader and time.monotonic() - self.renewed_at < self.ttl - self.renew_interval
+
+            if acquired != self.is_leader:
+                await self.set_leader(acquired)
+
+            await asyncio.sleep(self.renew_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'holder': self.holder,
+            'is_leader': self.is_leader,
+            'elections': self.elections
+        }
@@ -1,6 +1,8 @@
 import logging
 import asyncio
+import time
 from telegram import Update
+from telegram.error import TelegramError, RetryAfter
 from telegram.ext import (
     Application, 
     CommandHandler, 
@@ -10,11 +12,17 @@ from telegram.ext import (
 )
 
 from config import Config
-from models import DatabaseManager
+from models import AsyncDatabaseManager, add_schedule_listener
 from auth import AuthenticationManager
 from voice_handler import VoiceHandler
 from scheduler import ReminderScheduler
-from handlers import BotHandlers
+from handlers import BotHandlers, SCHEDULE_PAGE_PREFIX
+from cache import TTLCache, RenderCache
+from update_processor import PerChatUpdateProcessor
+from persistence import DatabasePersistence
+from leader import LeaderElector
+from metrics import MetricsServer, CALLBACK_LATENCY, TELEGRAM_ERRORS, TELEGRAM_RETRY_AFTER, instrument_engine
+from tracing import TRACER, PROFILER, QueryTracer, TracedRequest, configure_tracing, traced_update
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -22,24 +30,78 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+CALLBACK_ROUTES = frozenset({
+    'cancel_auth', 'main_menu', 'view_schedule', SCHEDULE_PAGE_PREFIX, 'schedule_today', 'schedule_tomorrow',
+    'ai_tasks', 'reminder_settings', 'toggle_reminders_on', 'toggle_reminders_off', 'help'
+})
+
+def callback_route(data: str) -> str:
+    """Имя маршрута для метрик: известный префикс callback_data или unknown"""
+    route = (data or '').split(':', 1)[0]
+    return route if route in CALLBACK_ROUTES else 'unknown'
+
 class TelegramBot:
     def __init__(self):
         Config.validate_config()
+        configure_tracing(
+            Config.TRACING_ENABLED,
+            Config.TRACE_SINK,
+            Config.TRACE_FILE,
+            Config.TRACE_SAMPLE_RATE,
+            Config.PROFILE_DIR
+        )
 
-        self.db_manager = DatabaseManager()
-        self.auth_manager = AuthenticationManager(self.db_manager)
+        self.db_manager = AsyncDatabaseManager()
+        if Config.TRACING_ENABLED or Config.SLOW_QUERY_MS > 0:
+            QueryTracer(Config.SLOW_QUERY_MS).instrument(self.db_manager.engine)
+        self.identity_cache = TTLCache(
+            maxsize=Config.IDENTITY_CACHE_SIZE,
+            ttl=Config.IDENTITY_CACHE_TTL_SECONDS
+        )
+        self.auth_manager = AuthenticationManager(self.db_manager, self.identity_cache)
         self.voice_handler = VoiceHandler()
-        self.bot_handlers = BotHandlers(self.db_manager)
+        self.render_cache = RenderCache(
+            maxsize=Config.RENDER_CACHE_SIZE,
+            ttl=Config.RENDER_CACHE_TTL_SECONDS
+        )
+        add_schedule_listener(self.render_cache.on_schedule_change)
+        self.bot_handlers = BotHandlers(self.db_manager, self.identity_cache, self.render_cache)
         self.reminder_scheduler = None
+        self.leader_elector = None
+        self.metrics_server = None
+        if Config.METRICS_ENABLED:
+            instrument_engine(self.db_manager.engine)
+            self.metrics_server = MetricsServer(host=Config.METRICS_HOST, port=Config.METRICS_PORT)
         
-        self.application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        self.persistence = DatabasePersistence(
+            self.db_manager,
+            update_interval=Config.PERSISTENCE_FLUSH_SECONDS
+        )
+        builder = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).persistence(self.persistence)
+        if Config.TRACING_ENABLED:
+            builder = builder.request(TracedRequest())
+        self.update_processor = None
+        if Config.CONCURRENT_UPDATES > 1:
+            self.update_processor = PerChatUpdateProcessor(
+                max_concurrent=Config.CONCURRENT_UPDATES,
+                max_pending=Config.MAX_PENDING_UPDATES
+            )
+            builder = builder.concurrent_updates(self.update_processor)
+        self.application = builder.build()
 
         self.setup_handlers()
     
     def setup_handlers(self):
+        """
+        Голосовые и аудиосообщения обрабатываются с block=False: распознавание идет
+        минутами и иначе держало бы очередь чата в PerChatUpdateProcessor. Такие
+        обработчики выполняются вне блокировки чата, поэтому их ответы не упорядочены
+        с остальными сообщениями чата, и они не меняют user_data и состояние диалогов
+        """
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("logout", self.auth_manager.logout))
+        self.application.add_handler(CommandHandler("profile", self.profile_command))
 
         self.application.add_handler(CallbackQueryHandler(self.handle_callback_query))
 
@@ -49,18 +111,22 @@ class TelegramBot:
         ))
         self.application.add_handler(MessageHandler(
             filters.VOICE, 
-            self.voice_handler.handle_voice_message
+            self.voice_handler.handle_voice_message,
+            block=False
         ))
         self.application.add_handler(MessageHandler(
             filters.AUDIO, 
-            self.voice_handler.handle_audio_message
+            self.voice_handler.handle_audio_message,
+            block=False
         ))
 
         self.application.add_error_handler(self.error_handler)
     
+    @traced_update('command.start')
     async def start_command(self, update: Update, context):
         await self.auth_manager.start_authentication(update, context)
     
+    @traced_update('command.help')
     async def help_command(self, update: Update, context):
         user = await self.auth_manager.is_authenticated(update.effective_user.id)
         if user:
@@ -71,6 +137,38 @@ class TelegramBot:
                 "Для начала работы с ботом введите команду /start и пройдите аутентификацию."
             )
     
+    async def profile_command(self, update: Update, context):
+        """Выборочное профилирование обновлений: /profile on [доля], /profile off, /profile status"""
+        if update.effective_user.id not in Config.ADMIN_TELEGRAM_IDS:
+            await update.message.reply_text("❌ Команда доступна только администраторам.")
+            return
+        
+        action = context.args[0].lower() if context.args else 'status'
+        if action == 'on':
+            try:
+                sample_rate = float(context.args[1]) if len(context.args) > 1 else 0.1
+            except ValueError:
+                await update.message.reply_text("❌ Доля выборки должна быть числом от 0 до 1.")
+                return
+            PROFILER.start(sample_rate)
+            await update.message.reply_text(f"🔬 Профилирование включено, доля обновлений: {PROFILER.sample_rate}")
+        elif action == 'off':
+            samples = PROFILER.samples
+            path, summary = PROFILER.stop()
+            if path is None:
+                await update.message.reply_text("🔬 Профилирование выключено, обновлений в выборку не попало.")
+                return
+            await update.message.reply_text(
+                f"🔬 Профилирование выключено: {samples} обновлений, профиль сохранен в {path}\n\n{summary[:3500]}"
+            )
+        else:
+            status = PROFILER.status()
+            await update.message.reply_text(
+                f"🔬 Профилирование: {'включено' if status['enabled'] else 'выключено'}, "
+                f"доля {status['sample_rate']}, обновлений в выборке {status['samples']}"
+            )
+    
+    @traced_update('message.text')
     async def handle_text_message(self, update: Update, context):
         if context.user_data.get('awaiting_login'):
             await self.auth_manager.handle_login_input(update, context)
@@ -89,7 +187,15 @@ class TelegramBot:
             "Для навигации по функциям бота используйте кнопки меню или команду /start"
         )
     
+    @traced_update('callback_query')
     async def handle_callback_query(self, update: Update, context):
+        started = time.perf_counter()
+        try:
+            await self.dispatch_callback_query(update, context)
+        finally:
+            CALLBACK_LATENCY.observe(time.perf_counter() - started, callback_route(update.callback_query.data))
+    
+    async def dispatch_callback_query(self, update: Update, context):
         query = update.callback_query
         await query.answer()
 
@@ -111,6 +217,9 @@ class TelegramBot:
         elif query.data == "view_schedule":
             await self.bot_handlers.handle_view_schedule(update, context, user)
         
+        elif query.data.startswith(f"{SCHEDULE_PAGE_PREFIX}:"):
+            await self.bot_handlers.handle_view_schedule(update, context, user, query.data)
+        
         elif query.data == "schedule_today":
             await self.bot_handlers.handle_schedule_filter(update, context, user, "today")
         
@@ -140,6 +249,10 @@ class TelegramBot:
     
     async def error_handler(self, update: Update, context):
         logger.error(f"Exception while handling an update: {context.error}")
+        if isinstance(context.error, TelegramError):
+            TELEGRAM_ERRORS.inc(type(context.error).__name__)
+            if isinstance(context.error, RetryAfter):
+                TELEGRAM_RETRY_AFTER.inc()
         
         if update and update.effective_message:
             await update.effective_message.reply_text(
@@ -149,14 +262,44 @@ class TelegramBot:
     async def start_bot(self):
         logger.info("Starting Telegram bot...")
 
+        await self.db_manager.init_database()
+        if self.metrics_server:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logger.error(f"Error starting metrics endpoint: {e}")
+                self.metrics_server = None
+
         self.reminder_scheduler = ReminderScheduler(self.application, self.db_manager)
-        self.reminder_scheduler.start()
+        await self.reminder_scheduler.open()
+        if Config.LEADER_ELECTION:
+            self.leader_elector = LeaderElector(
+                self.db_manager,
+                'reminders',
+                holder=Config.REPLICA_ID or None,
+                ttl=Config.LEADER_LEASE_SECONDS,
+                on_elected=self.reminder_scheduler.start,
+                on_demoted=self.reminder_scheduler.stop
+            )
+            self.leader_elector.start()
+        else:
+            await self.reminder_scheduler.start()
 
         await self.application.initialize()
         await self.application.start()
-        await self.application.updater.start_polling()
+        if Config.BOT_MODE == 'webhook':
+            await self.application.updater.start_webhook(
+                listen=Config.WEBHOOK_LISTEN,
+                port=Config.WEBHOOK_PORT,
+                url_path=Config.WEBHOOK_PATH,
+                webhook_url=f"{Config.WEBHOOK_URL.rstrip('/')}/{Config.WEBHOOK_PATH}",
+                secret_token=Config.WEBHOOK_SECRET_TOKEN or None,
+                max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+            )
+        else:
+            await self.application.updater.start_polling()
         
-        logger.info("Bot is running...")
+        logger.info(f"Bot is running in {Config.BOT_MODE} mode...")
 
         try:
             await asyncio.Event().wait()
@@ -166,13 +309,25 @@ class TelegramBot:
             await self.stop_bot()
     
     async def stop_bot(self):
+        if self.leader_elector:
+            await self.leader_elector.stop()
         if self.reminder_scheduler:
-            self.reminder_scheduler.stop()
+            await self.reminder_scheduler.close()
         
         await self.application.updater.stop()
         await self.application.stop()
         await self.application.shutdown()
+        await self.db_manager.dispose()
+        if self.metrics_server:
+            await self.metrics_server.stop()
         
+        logger.info(f"Identity cache stats: {self.identity_cache.stats()}")
+        logger.info(f"Schedule render cache stats: {self.render_cache.stats()}")
+        if self.update_processor:
+            logger.info(f"Update processor stats: {self.update_processor.stats()}")
+        logger.info(f"Transcription cache stats: {self.voice_handler.transcription_cache.stats()}")
+        self.voice_handler.close()
+        TRACER.close()
         logger.info("Bot stopped.")
 
 def main():
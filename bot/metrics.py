@@ -0,0 +1,226 @@
+import abc
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'BEGIN', 'COMMIT', 'ROLLBACK'})
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+class Metric(abc.ABC):
+    """Метрика с фиксированным набором меток. Значения хранятся по кортежу меток"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def label_text(self, labels: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{escape_label(str(value))}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples()
+        ]
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    kind = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{self.label_text(labels)} {format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+class Histogram(Metric):
+    """
+    Гистограмма с фиксированными границами корзин. Наблюдение стоит одного
+    bisect и пары сложений, накопительные суммы считаются только при выгрузке
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{self.label_text(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self.label_text(labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{self.label_text(labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Набор метрик процесса и их выгрузка в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+CALLBACK_LATENCY = REGISTRY.histogram(
+    'bot_callback_duration_seconds', 'Callback query handling time by route.', ('route',)
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    'bot_db_query_duration_seconds', 'Database statement execution time by operation.', ('operation',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+REMINDER_LATENESS = REGISTRY.histogram(
+    'bot_reminder_lateness_seconds', 'Reminder send time minus lesson start minus reminder offset.', ('recipient',),
+    buckets=(-60.0, -10.0, 0.0, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+)
+TRANSCRIPTION_DURATION = REGISTRY.histogram(
+    'bot_transcription_duration_seconds', 'Audio transcription time by backend.', ('backend',),
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+)
+TRANSCRIPTION_BYTES = REGISTRY.histogram(
+    'bot_transcription_audio_bytes', 'Size of transcribed audio by backend.', ('backend',),
+    buckets=(16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+)
+TELEGRAM_ERRORS = REGISTRY.counter(
+    'bot_telegram_api_errors_total', 'Telegram API errors by exception class.', ('error',)
+)
+TELEGRAM_RETRY_AFTER = REGISTRY.counter(
+    'bot_telegram_retry_after_total', 'Flood control (RetryAfter) responses from Telegram.'
+)
+
+def statement_operation(statement: str) -> str:
+    head = statement[:32].split(None, 1)
+    operation = head[0].upper() if head else ''
+    return operation if operation in SQL_OPERATIONS else 'OTHER'
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None:
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, statement_operation(statement))
+
+def instrument_engine(engine):
+    """Подключение замера времени запросов к движку SQLAlchemy (синхронному или асинхронному)"""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+    if not event.contains(sync_engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(sync_engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(sync_engine, 'after_cursor_execute', after_cursor_execute)
+
+class MetricsServer:
+    """Минимальный HTTP сервер, отдающий реестр метрик по GET /metrics"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = '127.0.0.1', port: int = 9108,
+                 read_timeout: float = 5.0):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.read_timeout = read_timeout
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), self.read_timeout)
+                if header in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?', 1)[0] if len(parts) > 1 else ''
+            if parts and parts[0] == 'GET' and path == '/metrics':
+                status, content_type, body = '200 OK', CONTENT_TYPE, self.registry.render().encode('utf-8')
+            else:
+                status, content_type, body = '404 Not Found', 'text/plain; charset=utf-8', b'Not Found\n'
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Metrics request dropped: {e}")
+        except Exception as e:
+            logger.error(f"Error serving metrics: {e}")
+        finally:
+            writer.close()
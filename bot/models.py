@@ -1,13 +1,24 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Date, Time, ForeignKey, BigInteger
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Date, Time, ForeignKey, BigInteger, Text
+from sqlalchemy import select, update, delete, exists, or_, tuple_, event, Index, UniqueConstraint
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
 from sqlalchemy.sql import func
-from datetime import date, time
-from typing import Optional, List, Dict, Any
+from datetime import date, time, datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Callable, NamedTuple, Iterable, Iterator, Set
+import pytz
+import asyncio
 import logging
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 from config import Config
-from sqlalchemy import and_, text
+from cache import TTLCache
+from sqlalchemy import and_, union_all, literal, null, cast
+from itertools import islice
+from operator import itemgetter
+import heapq
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +58,12 @@ class Student(Base):
 
 class Schedule(Base):
     __tablename__ = 'schedule'
+    __table_args__ = (
+        Index('ix_schedule_status_start', 'status', 'lesson_start_utc'),
+        Index('ix_schedule_teacher_date_time', 'teacher_id', 'lesson_date', 'lesson_time'),
+        Index('ix_schedule_student_date_time', 'student_id', 'lesson_date', 'lesson_time'),
+        Index('ux_schedule_recurring_date', 'recurring_lesson_id', 'lesson_date', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     teacher_id = Column(Integer, ForeignKey('teachers.id'), nullable=False)
@@ -56,6 +73,8 @@ class Schedule(Base):
     subject = Column(String(100), nullable=True)
     duration_minutes = Column(Integer, default=60)
     status = Column(String(20), default='scheduled')
+    lesson_start_utc = Column(DateTime, nullable=True)
+    recurring_lesson_id = Column(Integer, ForeignKey('recurring_lessons.id'), nullable=True)
     created_at = Column(DateTime, default=func.now())
 
     teacher = relationship("Teacher", foreign_keys=[teacher_id], back_populates="schedule_as_teacher")
@@ -64,6 +83,99 @@ class Schedule(Base):
     def __repr__(self):
         return f"<Schedule(id={self.id}, date={self.lesson_date}, time={self.lesson_time}, subject='{self.subject}')>"
 
+def lesson_start(lesson_date: date, lesson_time: time) -> datetime:
+    """Начало урока с учетом часового пояса расписания"""
+    return pytz.timezone(Config.TIMEZONE).localize(datetime.combine(lesson_date, lesson_time))
+
+def utc_naive(moment: datetime) -> datetime:
+    """Перевод момента времени в UTC без tzinfo, как он хранится в базе"""
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def lesson_start_utc(lesson_date: date, lesson_time: time) -> datetime:
+    return utc_naive(lesson_start(lesson_date, lesson_time))
+
+@event.listens_for(Schedule, 'before_insert')
+@event.listens_for(Schedule, 'before_update')
+def fill_lesson_start_utc(mapper, connection, target: Schedule):
+    if target.lesson_date is not None and target.lesson_time is not None:
+        target.lesson_start_utc = lesson_start_utc(target.lesson_date, target.lesson_time)
+
+WEEKDAY_CODES = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+def weekdays_mask(weekdays: Iterable[int]) -> int:
+    """Битовая маска дней недели: бит 0 - понедельник, бит 6 - воскресенье"""
+    mask = 0
+    for weekday in weekdays:
+        mask |= 1 << weekday
+    return mask
+
+class RecurringLesson(Base):
+    """
+    Повторяющийся урок в виде правила (аналог RRULE FREQ=WEEKLY;INTERVAL;BYDAY).
+    Отдельные уроки по правилу в базе не хранятся, кроме попавших в окно напоминаний
+    """
+    __tablename__ = 'recurring_lessons'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    teacher_id = Column(Integer, ForeignKey('teachers.id'), nullable=False, index=True)
+    student_id = Column(Integer, ForeignKey('students.id'), nullable=False, index=True)
+    weekdays = Column(Integer, nullable=False)
+    interval_weeks = Column(Integer, nullable=False, default=1)
+    lesson_time = Column(Time, nullable=False)
+    subject = Column(String(100), nullable=True)
+    duration_minutes = Column(Integer, default=60)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+    @property
+    def rrule(self) -> str:
+        byday = ",".join(code for weekday, code in enumerate(WEEKDAY_CODES) if self.weekdays >> weekday & 1)
+        rule = f"FREQ=WEEKLY;INTERVAL={self.interval_weeks};BYDAY={byday}"
+        if self.end_date:
+            rule += f";UNTIL={self.end_date.strftime('%Y%m%d')}"
+        return rule
+
+    def __repr__(self):
+        return f"<RecurringLesson(id={self.id}, rule='{self.rrule}', time={self.lesson_time}, start={self.start_date})>"
+
+class RecurringLessonException(Base):
+    """Дата, на которую урок по правилу отменен (аналог EXDATE)"""
+    __tablename__ = 'recurring_lesson_exceptions'
+    __table_args__ = (
+        UniqueConstraint('recurring_lesson_id', 'lesson_date', name='uq_recurring_lesson_exceptions'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    recurring_lesson_id = Column(Integer, ForeignKey('recurring_lessons.id'), nullable=False)
+    lesson_date = Column(Date, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<RecurringLessonException(recurring_lesson_id={self.recurring_lesson_id}, date={self.lesson_date})>"
+
+def recurring_dates(rule, since: date, until: Optional[date] = None, reverse: bool = False) -> Iterator[date]:
+    """
+    Даты урока по правилу от since до until включительно, при reverse - в обратном порядке.
+    Без until и end_date последовательность бесконечна, поэтому читать ее нужно лениво
+    """
+    if not rule.weekdays:
+        return
+    anchor = rule.start_date - timedelta(days=rule.start_date.weekday())
+    step = timedelta(days=-1 if reverse else 1)
+    limits = [value for value in (until, rule.end_date) if value]
+    if reverse:
+        day = min(since, rule.end_date) if rule.end_date else since
+        low, high = max(until or rule.start_date, rule.start_date), None
+    else:
+        day = max(since, rule.start_date)
+        low, high = None, min(limits) if limits else None
+
+    while (low is None or day >= low) and (high is None or day <= high):
+        if rule.weekdays >> day.weekday() & 1 and ((day - anchor).days // 7) % rule.interval_weeks == 0:
+            yield day
+        day += step
+
 class UserSession(Base):
     __tablename__ = 'user_sessions'
     
@@ -77,10 +189,127 @@ class UserSession(Base):
     def __repr__(self):
         return f"<UserSession(telegram_id={self.telegram_id}, user_type='{self.user_type}', authenticated={self.is_authenticated})>"
 
+class ReminderDelivery(Base):
+    __tablename__ = 'reminder_deliveries'
+    __table_args__ = (
+        UniqueConstraint('lesson_id', 'recipient', 'offset_minutes', name='uq_reminder_deliveries'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    lesson_id = Column(Integer, ForeignKey('schedule.id'), nullable=False)
+    recipient = Column(String(10), nullable=False)
+    offset_minutes = Column(Integer, nullable=False)
+    claimed_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<ReminderDelivery(lesson_id={self.lesson_id}, recipient='{self.recipient}', offset={self.offset_minutes})>"
+
+class ConversationState(Base):
+    __tablename__ = 'conversation_state'
+    
+    scope = Column(String(64), primary_key=True)
+    key = Column(String(64), primary_key=True)
+    data = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<ConversationState(scope='{self.scope}', key='{self.key}')>"
+
+class SchedulerLease(Base):
+    __tablename__ = 'scheduler_leases'
+    
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    renewed_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<SchedulerLease(name='{self.name}', holder='{self.holder}', expires_at={self.expires_at})>"
+
+class ImportCheckpoint(Base):
+    __tablename__ = 'import_checkpoints'
+
+    source = Column(String(64), primary_key=True)
+    filename = Column(String(255), nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+    finished = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ImportCheckpoint(source='{self.source}', position={self.position}, finished={self.finished})>"
+
+ENGINE_PROFILES = ('default', 'tuned')
+
+class EngineProfile:
+    """
+    Профиль движка SQLAlchemy. tuned: для SQLite на каждом соединении включаются WAL,
+    synchronous, mmap, кэш страниц и ожидание блокировки, для PostgreSQL настраивается пул.
+    default оставляет настройки SQLAlchemy по умолчанию
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name or Config.DB_ENGINE_PROFILE
+        if self.name not in ENGINE_PROFILES:
+            raise ValueError(f"Unknown engine profile: {self.name}")
+
+    def engine_options(self, database_url: str) -> Dict[str, Any]:
+        if self.name == 'default' or make_url(database_url).get_backend_name() != 'postgresql':
+            return {}
+        return {
+            'pool_size': Config.DB_POOL_SIZE,
+            'max_overflow': Config.DB_MAX_OVERFLOW,
+            'pool_pre_ping': Config.DB_POOL_PRE_PING,
+            'pool_recycle': Config.DB_POOL_RECYCLE_SECONDS,
+            'pool_timeout': Config.DB_POOL_TIMEOUT_SECONDS
+        }
+
+    def sqlite_pragmas(self, database: Optional[str]) -> List[str]:
+        pragmas = []
+        if database not in (None, '', ':memory:'):
+            pragmas.append("PRAGMA journal_mode=WAL")
+        pragmas += [
+            f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}",
+            f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}",
+            f"PRAGMA cache_size=-{Config.SQLITE_CACHE_SIZE_KB}",
+            f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE_MB * 1024 * 1024}"
+        ]
+        return pragmas
+
+    def configure(self, engine):
+        """Подключение PRAGMA к событию connect синхронного или асинхронного движка SQLite"""
+        sync_engine = getattr(engine, 'sync_engine', engine)
+        if self.name == 'default' or sync_engine.dialect.name != 'sqlite':
+            return
+        pragmas = self.sqlite_pragmas(sync_engine.url.database)
+
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+        event.listen(sync_engine, 'connect', apply_pragmas)
+
+    def create_engine(self, database_url: str, **options):
+        engine = create_engine(database_url, echo=False, **self.engine_options(database_url), **options)
+        self.configure(engine)
+        return engine
+
+    def create_async_engine(self, database_url: str):
+        engine = create_async_engine(database_url, echo=False, **self.engine_options(database_url))
+        self.configure(engine)
+        return engine
+
 class DatabaseManager:
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None, profile: str = None):
         self.database_url = database_url or Config.DATABASE_URL
-        self.engine = create_engine(self.database_url, echo=False)
+        self.profile = EngineProfile(profile)
+        self.engine = self.profile.create_engine(self.database_url)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         self.init_database()
     
@@ -109,17 +338,411 @@ class DatabaseManager:
     def get_session_sync(self) -> Session:
         return self.SessionLocal()
 
-class User:
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+}
+ASYNC_DRIVER_NAMES = ('aiosqlite', 'asyncpg')
+
+def to_async_url(database_url: str) -> str:
+    """Замена синхронного драйвера в URL базы данных на асинхронный"""
+    url = make_url(database_url)
+    backend, _, driver = url.drivername.partition('+')
+    if backend in ASYNC_DRIVERS and driver not in ASYNC_DRIVER_NAMES:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    return url.render_as_string(hide_password=False)
+
+def to_sync_url(database_url: str) -> str:
+    """Замена асинхронного драйвера в URL базы данных на синхронный по умолчанию"""
+    url = make_url(database_url)
+    backend, _, driver = url.drivername.partition('+')
+    if driver in ASYNC_DRIVER_NAMES or backend == 'postgres':
+        url = url.set(drivername='postgresql' if backend == 'postgres' else backend)
+    return url.render_as_string(hide_password=False)
+
+class AsyncDatabaseManager:
+    def __init__(self, database_url: str = None, profile: str = None):
+        self.database_url = to_async_url(database_url or Config.DATABASE_URL)
+        self.profile = EngineProfile(profile)
+        self.engine = self.profile.create_async_engine(self.database_url)
+        self.SessionLocal = async_sessionmaker(
+            bind=self.engine, autoflush=False, expire_on_commit=False
+        )
+    
+    async def init_database(self):
+        try:
+            async with self.engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            logger.info("Database initialized successfully")
+        except Exception as e:
+            logger.error(f"Error initializing database: {e}")
+            raise
+    
+    @asynccontextmanager
+    async def get_session(self):
+        """Асинхронный менеджер контекста для сеансов базы данных"""
+        session: AsyncSession = self.SessionLocal()
+        try:
+            yield session
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Database error: {e}")
+            raise
+        finally:
+            await session.close()
+    
+    async def dispose(self):
+        await self.engine.dispose()
+
+class SyncFacade:
+    """
+    Синхронный доступ к асинхронным менеджерам для скриптов без цикла событий.
+    Запросы выполняются в собственном цикле через асинхронный движок по URL
+    и профилю DatabaseManager; внутри работающего цикла используйте Async* классы
+    """
+
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
-    
+        self.runner = asyncio.Runner()
+        self.async_db = AsyncDatabaseManager(db_manager.database_url, db_manager.profile.name)
+
+    def run(self, coroutine):
+        return self.runner.run(coroutine)
+
+    def close(self):
+        self.runner.run(self.async_db.dispose())
+        self.runner.close()
+
+class User(SyncFacade):
+    """Синхронная обертка над AsyncUser"""
+
+    def __init__(self, db_manager: DatabaseManager):
+        super().__init__(db_manager)
+        self.users = AsyncUser(self.async_db)
+
     def authenticate_user(self, login: str) -> Optional[Dict[str, Any]]:
+        return self.run(self.users.authenticate_user(login))
+
+    def bind_telegram_id(self, login: str, telegram_id: int, user_type: str) -> bool:
+        return self.run(self.users.bind_telegram_id(login, telegram_id, user_type))
+
+    def get_user_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        return self.run(self.users.get_user_by_telegram_id(telegram_id))
+
+    def update_reminder_setting(self, telegram_id: int, enabled: bool) -> bool:
+        return self.run(self.users.update_reminder_setting(telegram_id, enabled))
+
+class ScheduleManager(SyncFacade):
+    """Синхронная обертка над AsyncScheduleManager"""
+
+    def __init__(self, db_manager: DatabaseManager):
+        super().__init__(db_manager)
+        self.schedule = AsyncScheduleManager(self.async_db)
+
+    def get_user_schedule(self, user_id: int, user_type: str,
+                          date_filter: Optional[date] = None) -> List[Dict[str, Any]]:
+        return self.run(self.schedule.get_user_schedule(user_id, user_type, date_filter))
+
+    def get_upcoming_lessons(self, reminder_minutes: int = 15) -> List[Dict[str, Any]]:
+        return self.run(self.schedule.get_upcoming_lessons(reminder_minutes))
+
+    def add_lesson(self, teacher_id: int, student_id: int, lesson_date: date,
+                   lesson_time: time, subject: str, duration: int = 60) -> bool:
+        return self.run(self.schedule.add_lesson(teacher_id, student_id, lesson_date, lesson_time, subject, duration))
+
+    def update_lesson_status(self, lesson_id: int, status: str) -> bool:
+        return self.run(self.schedule.update_lesson_status(lesson_id, status))
+
+class ScheduleChange(NamedTuple):
+    lesson_id: int
+    teacher_id: int
+    student_id: int
+    lesson_date: date
+
+schedule_listeners: List[Callable[[ScheduleChange], None]] = []
+
+def add_schedule_listener(listener: Callable[[ScheduleChange], None]):
+    """Подписка на изменения расписания в текущем процессе"""
+    schedule_listeners.append(listener)
+
+def remove_schedule_listener(listener: Callable[[ScheduleChange], None]):
+    if listener in schedule_listeners:
+        schedule_listeners.remove(listener)
+
+def notify_schedule_change(change: ScheduleChange):
+    for listener in list(schedule_listeners):
+        try:
+            listener(change)
+        except Exception as e:
+            logger.error(f"Error in schedule listener: {e}")
+
+def delivered_clause(offset_minutes: int, recipient: str):
+    """Условие: напоминание получателю по уроку уже отправлено"""
+    return exists().where(
+        ReminderDelivery.lesson_id == Schedule.id,
+        ReminderDelivery.recipient == recipient,
+        ReminderDelivery.offset_minutes == offset_minutes,
+        ReminderDelivery.sent_at.isnot(None)
+    )
+
+def delivery_key(lesson_id: int, recipient: str, offset_minutes: int):
+    return and_(
+        ReminderDelivery.lesson_id == lesson_id,
+        ReminderDelivery.recipient == recipient,
+        ReminderDelivery.offset_minutes == offset_minutes
+    )
+
+def reminder_query(reminder_minutes: int):
+    """Запланированные уроки, по которым еще не все напоминания отправлены"""
+    teacher_delivered = delivered_clause(reminder_minutes, 'teacher')
+    student_delivered = delivered_clause(reminder_minutes, 'student')
+    
+    return (
+        select(
+            Schedule.id,
+            Schedule.lesson_date,
+            Schedule.lesson_time,
+            Schedule.lesson_start_utc,
+            Schedule.subject,
+            Teacher.first_name.label('teacher_first_name'),
+            Teacher.last_name.label('teacher_last_name'),
+            Teacher.telegram_id.label('teacher_telegram_id'),
+            Teacher.reminder_enabled.label('teacher_reminder_enabled'),
+            teacher_delivered.label('teacher_delivered'),
+            Student.first_name.label('student_first_name'),
+            Student.last_name.label('student_last_name'),
+            Student.telegram_id.label('student_telegram_id'),
+            Student.reminder_enabled.label('student_reminder_enabled'),
+            student_delivered.label('student_delivered')
+        )
+        .join(Teacher, Schedule.teacher_id == Teacher.id)
+        .join(Student, Schedule.student_id == Student.id)
+        .where(
+            Schedule.status == 'scheduled',
+            or_(
+                and_(Teacher.reminder_enabled, Teacher.telegram_id.isnot(None), ~teacher_delivered),
+                and_(Student.reminder_enabled, Student.telegram_id.isnot(None), ~student_delivered)
+            )
+        )
+    )
+
+def upcoming_query(reminder_minutes: int, now: datetime):
+    """Уроки, начинающиеся в ближайшие reminder_minutes минут"""
+    return reminder_query(reminder_minutes).where(
+        Schedule.lesson_start_utc > utc_naive(now),
+        Schedule.lesson_start_utc <= utc_naive(now + timedelta(minutes=reminder_minutes))
+    )
+
+def reminder_lesson(row) -> Dict[str, Any]:
+    lesson = row._asdict()
+    lesson['lesson_start'] = lesson.pop('lesson_start_utc').replace(tzinfo=timezone.utc)
+    lesson['lesson_date'] = row.lesson_date.isoformat()
+    lesson['lesson_time'] = row.lesson_time.isoformat()
+    lesson['teacher_delivered'] = bool(row.teacher_delivered)
+    lesson['student_delivered'] = bool(row.student_delivered)
+    return lesson
+
+def schedule_partner(model, user_type: str):
+    """Колонки имени второго участника урока, колонка владельца, модель партнера и условие соединения"""
+    if user_type == 'teacher':
+        partner_columns = (
+            Student.first_name.label('student_first_name'),
+            Student.last_name.label('student_last_name')
+        )
+        return partner_columns, model.teacher_id, Student, model.student_id == Student.id
+    
+    partner_columns = (
+        Teacher.first_name.label('teacher_first_name'),
+        Teacher.last_name.label('teacher_last_name')
+    )
+    return partner_columns, model.student_id, Teacher, model.teacher_id == Teacher.id
+
+def schedule_key():
+    return tuple_(Schedule.lesson_date, Schedule.lesson_time, Schedule.id)
+
+def schedule_lesson(row) -> Dict[str, Any]:
+    lesson = {key: value for key, value in row._asdict().items() if key not in VIEW_FIELDS}
+    lesson['lesson_date'] = row.lesson_date.isoformat()
+    lesson['lesson_time'] = row.lesson_time.isoformat()
+    return lesson
+
+RULE_FIELDS = ('weekdays', 'interval_weeks', 'start_date', 'end_date')
+VIEW_FIELDS = ('kind', 'recurring_lesson_id') + RULE_FIELDS
+FIRST_KEY_ID = -(2 ** 31)
+
+def schedule_view_lessons(user_id: int, user_type: str, kind: str = 'lesson'):
+    """Строки schedule пользователя в колонках общего запроса расписания"""
+    partner_columns, owner_column, partner, partner_join = schedule_partner(Schedule, user_type)
+    return (
+        select(
+            literal(kind).label('kind'),
+            Schedule.id,
+            Schedule.lesson_date,
+            Schedule.lesson_time,
+            Schedule.subject,
+            Schedule.duration_minutes,
+            Schedule.status,
+            Schedule.recurring_lesson_id,
+            cast(null(), Integer).label('weekdays'),
+            cast(null(), Integer).label('interval_weeks'),
+            cast(null(), Date).label('start_date'),
+            cast(null(), Date).label('end_date'),
+            *partner_columns
+        )
+        .join(partner, partner_join)
+        .where(owner_column == user_id)
+    )
+
+def schedule_page_lessons(user_id: int, user_type: str, cursor: tuple, direction: str, limit: int,
+                          kind: str = 'lesson'):
+    """
+    Страница строк schedule по ключу (lesson_date, lesson_time, id).
+    direction='next' - уроки после курсора, 'prev' - до курсора
+    """
+    query = schedule_view_lessons(user_id, user_type, kind).limit(limit)
+    if direction == 'prev':
+        query = query.where(schedule_key() < tuple_(*cursor)).order_by(
+            Schedule.lesson_date.desc(), Schedule.lesson_time.desc(), Schedule.id.desc()
+        )
+    else:
+        query = query.where(schedule_key() > tuple_(*cursor)).order_by(
+            Schedule.lesson_date, Schedule.lesson_time, Schedule.id
+        )
+    return select(query.subquery())
+
+def recurring_view_parts(user_id: int, user_type: str, first: Optional[date] = None,
+                         last: Optional[date] = None, materialized: bool = False) -> list:
+    """
+    Правила повторяющихся уроков в промежутке [first, last] (kind='rule') и даты,
+    на которые урок по правилу отменен или, при materialized, уже создан строкой schedule (kind='skip')
+    """
+    rule_columns, rule_owner, rule_partner, rule_join = schedule_partner(RecurringLesson, user_type)
+    padding = [null()] * (len(rule_columns) + 9)
+    
+    rules = (
+        select(
+            literal('rule'),
+            RecurringLesson.id,
+            null(),
+            RecurringLesson.lesson_time,
+            RecurringLesson.subject,
+            RecurringLesson.duration_minutes,
+            null(),
+            null(),
+            RecurringLesson.weekdays,
+            RecurringLesson.interval_weeks,
+            RecurringLesson.start_date,
+            RecurringLesson.end_date,
+            *rule_columns
+        )
+        .join(rule_partner, rule_join)
+        .where(rule_owner == user_id)
+    )
+    if first:
+        rules = rules.where(or_(RecurringLesson.end_date.is_(None), RecurringLesson.end_date >= first))
+    if last:
+        rules = rules.where(RecurringLesson.start_date <= last)
+    parts = [rules]
+    
+    sources = [(RecurringLessonException.recurring_lesson_id, RecurringLessonException.lesson_date)]
+    if materialized:
+        sources.append((Schedule.recurring_lesson_id, Schedule.lesson_date))
+    for rule_column, date_column in sources:
+        skips = (
+            select(literal('skip'), rule_column, date_column, *padding)
+            .join(RecurringLesson, rule_column == RecurringLesson.id)
+            .where(rule_owner == user_id)
+        )
+        if first:
+            skips = skips.where(date_column >= first)
+        if last:
+            skips = skips.where(date_column <= last)
+        parts.append(skips)
+    return parts
+
+def schedule_view_query(user_id: int, user_type: str, date_filter: Optional[date] = None,
+                        last: Optional[date] = None):
+    """
+    Расписание пользователя одним запросом: строки schedule (kind='lesson'),
+    правила повторяющихся уроков в промежутке (kind='rule') и отмененные даты правил (kind='skip').
+    Пустые для своего вида колонки заполняются NULL с типом первой части объединения
+    """
+    lessons = schedule_view_lessons(user_id, user_type)
+    if date_filter:
+        lessons = lessons.where(Schedule.lesson_date == date_filter)
+    
+    view = union_all(lessons, *recurring_view_parts(user_id, user_type, date_filter, last)).subquery()
+    return select(view).order_by(view.c.kind, view.c.lesson_date, view.c.lesson_time, view.c.id)
+
+def schedule_page_view_query(user_id: int, user_type: str, cursor: tuple, direction: str, limit: int,
+                             probe_prev: bool = False):
+    """
+    Страница расписания одним запросом: limit строк schedule от курсора (kind='lesson'),
+    при probe_prev одна строка до курсора (kind='prev'), а также правила и даты-исключения
+    к ним. Строки по правилам вне страницы отсекаются уже при развертывании
+    """
+    reverse = direction == 'prev'
+    first = cursor[0] if not reverse and not probe_prev else None
+    last = cursor[0] if reverse else None
+    
+    parts = [schedule_page_lessons(user_id, user_type, cursor, direction, limit)]
+    if probe_prev:
+        parts.append(schedule_page_lessons(user_id, user_type, cursor, 'prev', 1, kind='prev'))
+    parts.extend(recurring_view_parts(user_id, user_type, first, last, materialized=True))
+    
+    view = union_all(*parts).subquery()
+    key = (view.c.lesson_date, view.c.lesson_time, view.c.id)
+    return select(view).order_by(view.c.kind, *(column.desc() for column in key) if reverse else key)
+
+def occurrence_lesson(rule, lesson_date: date) -> Dict[str, Any]:
+    lesson = {key: value for key, value in rule._asdict().items() if key not in VIEW_FIELDS}
+    lesson['id'] = -rule.id
+    lesson['lesson_date'] = lesson_date.isoformat()
+    lesson['lesson_time'] = rule.lesson_time.isoformat()
+    lesson['status'] = 'scheduled'
+    return lesson
+
+def expand_recurring(rules, exclusions: Set[tuple], since: date, until: Optional[date] = None,
+                     after: Optional[tuple] = None, reverse: bool = False) -> Iterator[tuple]:
+    """
+    Ленивое слияние уроков по всем правилам в порядке ключа (дата, время, id).
+    Урок по правилу получает id = -id правила, поэтому ключ страницы остается однозначным
+    """
+    def occurrences(rule):
+        for lesson_date in recurring_dates(rule, since, until, reverse):
+            if (rule.id, lesson_date) in exclusions:
+                continue
+            key = (lesson_date, rule.lesson_time, -rule.id)
+            if after is not None and (key >= after if reverse else key <= after):
+                continue
+            yield key, occurrence_lesson(rule, lesson_date)
+    
+    return heapq.merge(*(occurrences(rule) for rule in rules), key=itemgetter(0), reverse=reverse)
+
+def merge_lessons(rows, occurrences: Iterator[tuple], reverse: bool = False) -> Iterator[Dict[str, Any]]:
+    """Слияние строк schedule с уроками по правилам в общем порядке"""
+    lessons = (((row.lesson_date, row.lesson_time, row.id), schedule_lesson(row)) for row in rows)
+    return (lesson for _, lesson in heapq.merge(lessons, occurrences, key=itemgetter(0), reverse=reverse))
+
+class AsyncUser:
+    def __init__(self, db_manager: AsyncDatabaseManager, identity_cache: Optional[TTLCache] = None):
+        self.db = db_manager
+        self.identity_cache = identity_cache
+    
+    def invalidate_identity(self, telegram_id: int):
+        """Сброс закэшированных данных пользователя"""
+        if self.identity_cache is not None:
+            self.identity_cache.invalidate(telegram_id)
+    
+    async def authenticate_user(self, login: str) -> Optional[Dict[str, Any]]:
         """
         Аутентификация пользователя путем входа
         в систему и возврат информации о пользователе
         """
-        with self.db.get_session() as session:
-            teacher = session.query(Teacher).filter(Teacher.login == login).first()
+        async with self.db.get_session() as session:
+            teacher = await session.scalar(select(Teacher).where(Teacher.login == login))
             if teacher:
                 return {
                     'id': teacher.id,
@@ -130,7 +753,7 @@ class User:
                     'user_type': 'teacher'
                 }
 
-            student = session.query(Student).filter(Student.login == login).first()
+            student = await session.scalar(select(Student).where(Student.login == login))
             if student:
                 return {
                     'id': student.id,
@@ -143,23 +766,21 @@ class User:
             
             return None
     
-    def bind_telegram_id(self, login: str, telegram_id: int, user_type: str) -> bool:
+    async def bind_telegram_id(self, login: str, telegram_id: int, user_type: str) -> bool:
         """
         Привязка идентификатор Telegram к
         учетной записи пользователя
         """
-        with self.db.get_session() as session:
-            if user_type == 'teacher':
-                user = session.query(Teacher).filter(Teacher.login == login).first()
-            else:
-                user = session.query(Student).filter(Student.login == login).first()
+        async with self.db.get_session() as session:
+            model = Teacher if user_type == 'teacher' else Student
+            user = await session.scalar(select(model).where(model.login == login))
             
             if user:
                 user.telegram_id = telegram_id
 
-                user_session = session.query(UserSession).filter(
-                    UserSession.telegram_id == telegram_id
-                ).first()
+                user_session = await session.scalar(
+                    select(UserSession).where(UserSession.telegram_id == telegram_id)
+                )
                 
                 if user_session:
                     user_session.user_type = user_type
@@ -175,27 +796,37 @@ class User:
                     )
                     session.add(user_session)
                 
-                return True
-            return False
+                bound = True
+            else:
+                bound = False
+        
+        if bound:
+            self.invalidate_identity(telegram_id)
+        return bound
     
-    def get_user_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+    async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """Получение информации о пользователе по идентификатору Telegram"""
-        with self.db.get_session() as session:
-            user_session = session.query(UserSession).filter(
-                UserSession.telegram_id == telegram_id,
-                UserSession.is_authenticated
-            ).first()
+        if self.identity_cache is not None:
+            cached = self.identity_cache.get(telegram_id)
+            if cached is not None:
+                return dict(cached)
+        
+        async with self.db.get_session() as session:
+            user_session = await session.scalar(
+                select(UserSession).where(
+                    UserSession.telegram_id == telegram_id,
+                    UserSession.is_authenticated
+                )
+            )
             
             if not user_session:
                 return None
             
-            if user_session.user_type == 'teacher':
-                user = session.query(Teacher).filter(Teacher.id == user_session.user_id).first()
-            else:
-                user = session.query(Student).filter(Student.id == user_session.user_id).first()
+            model = Teacher if user_session.user_type == 'teacher' else Student
+            user = await session.get(model, user_session.user_id)
             
             if user:
-                return {
+                user_info = {
                     'id': user.id,
                     'first_name': user.first_name,
                     'last_name': user.last_name,
@@ -204,106 +835,281 @@ class User:
                     'reminder_enabled': user.reminder_enabled,
                     'user_type': user_session.user_type
                 }
+                if self.identity_cache is not None:
+                    self.identity_cache.set(telegram_id, dict(user_info))
+                return user_info
             
             return None
     
-    def update_reminder_setting(self, telegram_id: int, enabled: bool) -> bool:
-        user_info = self.get_user_by_telegram_id(telegram_id)
+    async def update_reminder_setting(self, telegram_id: int, enabled: bool) -> bool:
+        user_info = await self.get_user_by_telegram_id(telegram_id)
         if not user_info:
             return False
         
-        with self.db.get_session() as session:
-            if user_info['user_type'] == 'teacher':
-                user = session.query(Teacher).filter(Teacher.telegram_id == telegram_id).first()
-            else:
-                user = session.query(Student).filter(Student.telegram_id == telegram_id).first()
+        async with self.db.get_session() as session:
+            model = Teacher if user_info['user_type'] == 'teacher' else Student
+            user = await session.scalar(select(model).where(model.telegram_id == telegram_id))
             
-            if user:
-                user.reminder_enabled = enabled
-                return True
-            return False
+            if not user:
+                return False
+            user.reminder_enabled = enabled
+        
+        self.invalidate_identity(telegram_id)
+        return True
 
-class ScheduleManager:
-    def __init__(self, db_manager: DatabaseManager):
+class AsyncScheduleManager:
+    def __init__(self, db_manager: AsyncDatabaseManager):
         self.db = db_manager
     
-    def get_user_schedule(self, user_id: int, user_type: str, date_filter: Optional[date] = None) -> List[Dict[str, Any]]:
-        with self.db.get_session() as session:
-            query = session.query(Schedule)
-            
-            if user_type == 'teacher':
-                query = query.filter(Schedule.teacher_id == user_id)
-                query = query.join(Student, Schedule.student_id == Student.id)
-            else:
-                query = query.filter(Schedule.student_id == user_id)
-                query = query.join(Teacher, Schedule.teacher_id == Teacher.id)
-            
-            if date_filter:
-                query = query.filter(Schedule.lesson_date == date_filter)
-            
-            query = query.order_by(Schedule.lesson_date, Schedule.lesson_time)
-            
-            results = []
-            for schedule in query.all():
-                result = {
-                    'id': schedule.id,
-                    'lesson_date': schedule.lesson_date.isoformat(),
-                    'lesson_time': schedule.lesson_time.isoformat(),
-                    'subject': schedule.subject,
-                    'duration_minutes': schedule.duration_minutes,
-                    'status': schedule.status
-                }
-                
-                if user_type == 'teacher':
-                    result.update({
-                        'student_first_name': schedule.student.first_name,
-                        'student_last_name': schedule.student.last_name
-                    })
+    async def get_user_schedule(self, user_id: int, user_type: str,
+                                date_filter: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Уроки пользователя вместе с уроками по правилам.
+        Без даты открытые правила разворачиваются на RECURRING_HORIZON_DAYS дней вперед
+        """
+        last = date_filter or date.today() + timedelta(days=Config.RECURRING_HORIZON_DAYS)
+        async with self.db.get_session() as session:
+            result = await session.execute(schedule_view_query(user_id, user_type, date_filter, last))
+            rows, rules, exclusions = [], [], set()
+            for row in result:
+                if row.kind == 'lesson':
+                    rows.append(row)
+                    if row.recurring_lesson_id is not None:
+                        exclusions.add((row.recurring_lesson_id, row.lesson_date))
+                elif row.kind == 'rule':
+                    rules.append(row)
                 else:
-                    result.update({
-                        'teacher_first_name': schedule.teacher.first_name,
-                        'teacher_last_name': schedule.teacher.last_name
-                    })
-                
-                results.append(result)
-            
-            return results
+                    exclusions.add((row.id, row.lesson_date))
+        
+        if not rules:
+            return [schedule_lesson(row) for row in rows]
+        
+        since = date_filter or min(rule.start_date for rule in rules)
+        return list(merge_lessons(rows, expand_recurring(rules, exclusions, since, last)))
     
-    def get_upcoming_lessons(self, reminder_minutes: int = 15) -> List[Dict[str, Any]]:
-        with self.db.get_session() as session:
-
-            query = session.query(Schedule).join(Teacher).join(Student).filter(
-                and_(
-                    Schedule.lesson_date == func.date('now'),
-                    Schedule.status == 'scheduled',
-                    text(f"TIME(schedule.lesson_time, '-{reminder_minutes} minutes') <= TIME('now')"),
-                    text("TIME(schedule.lesson_time) > TIME('now')")
-                )
+    async def get_user_schedule_page(self, user_id: int, user_type: str, cursor: Optional[tuple] = None,
+                                     direction: str = 'next', limit: int = 10) -> Dict[str, Any]:
+        """
+        Страница расписания фиксированного размера одним запросом.
+        Без курсора страница начинается с уроков на сегодня
+        """
+        start = cursor or (date.today(), time.min, FIRST_KEY_ID)
+        reverse = direction == 'prev'
+        probe_prev = cursor is None and not reverse
+        async with self.db.get_session() as session:
+            result = await session.execute(
+                schedule_page_view_query(user_id, user_type, start, direction, limit + 1, probe_prev)
             )
-            
-            results = []
-            for schedule in query.all():
-                results.append({
-                    'id': schedule.id,
-                    'lesson_date': schedule.lesson_date.isoformat(),
-                    'lesson_time': schedule.lesson_time.isoformat(),
-                    'subject': schedule.subject,
-                    'teacher_first_name': schedule.teacher.first_name,
-                    'teacher_last_name': schedule.teacher.last_name,
-                    'teacher_telegram_id': schedule.teacher.telegram_id,
-                    'teacher_reminder_enabled': schedule.teacher.reminder_enabled,
-                    'student_first_name': schedule.student.first_name,
-                    'student_last_name': schedule.student.last_name,
-                    'student_telegram_id': schedule.student.telegram_id,
-                    'student_reminder_enabled': schedule.student.reminder_enabled
+            rows, earlier, rules, exclusions = [], [], [], set()
+            for row in result:
+                if row.kind == 'lesson':
+                    rows.append(row)
+                elif row.kind == 'prev':
+                    earlier.append(row)
+                elif row.kind == 'rule':
+                    rules.append(row)
+                else:
+                    exclusions.add((row.id, row.lesson_date))
+        
+        occurrences = expand_recurring(rules, exclusions, start[0], after=start, reverse=reverse)
+        lessons = list(islice(merge_lessons(rows, occurrences, reverse), limit + 1))
+        has_more = len(lessons) > limit
+        lessons = lessons[:limit]
+        
+        if reverse:
+            lessons.reverse()
+            has_prev, has_next = has_more, True
+        elif probe_prev:
+            earlier_occurrence = next(
+                expand_recurring(rules, exclusions, start[0], after=start, reverse=True), None
+            )
+            has_prev = bool(earlier) or earlier_occurrence is not None
+            has_next = has_more
+        else:
+            has_prev, has_next = True, has_more
+        
+        return {
+            'lessons': lessons,
+            'has_prev': has_prev,
+            'has_next': has_next
+        }
+    
+    async def materialize_recurring(self, session: AsyncSession, window_start: datetime, window_end: datetime,
+                                    rule_id: Optional[int] = None) -> List[ScheduleChange]:
+        """
+        Создание строк schedule для уроков по правилам, начинающихся в окне.
+        Напоминаниям нужны настоящие строки (статус, учет доставки), поэтому в базу
+        попадают только уроки ближайшего окна, а повторный вызов ничего не дублирует.
+        Возвращает изменения по действительно созданным строкам; сообщать о них
+        вызывающий должен после фиксации транзакции
+        """
+        tz = pytz.timezone(Config.TIMEZONE)
+        first = window_start.astimezone(tz).date()
+        last = window_end.astimezone(tz).date()
+        days = min((last - first).days + 1, 7)
+        mask = weekdays_mask((first + timedelta(days=offset)).weekday() for offset in range(days))
+        
+        query = select(RecurringLesson).where(
+            RecurringLesson.start_date <= last,
+            or_(RecurringLesson.end_date.is_(None), RecurringLesson.end_date >= first),
+            RecurringLesson.weekdays.op('&')(mask) != 0
+        )
+        if rule_id is not None:
+            query = query.where(RecurringLesson.id == rule_id)
+        rules = (await session.scalars(query)).all()
+        if not rules:
+            return []
+        
+        cancelled = set((await session.execute(
+            select(RecurringLessonException.recurring_lesson_id, RecurringLessonException.lesson_date)
+            .where(RecurringLessonException.lesson_date.between(first, last))
+        )).all())
+        start_utc, end_utc = utc_naive(window_start), utc_naive(window_end)
+        rows = []
+        for rule in rules:
+            for lesson_date in recurring_dates(rule, first, last):
+                lesson_start = lesson_start_utc(lesson_date, rule.lesson_time)
+                if (rule.id, lesson_date) in cancelled or not start_utc <= lesson_start <= end_utc:
+                    continue
+                rows.append({
+                    'teacher_id': rule.teacher_id,
+                    'student_id': rule.student_id,
+                    'lesson_date': lesson_date,
+                    'lesson_time': rule.lesson_time,
+                    'lesson_start_utc': lesson_start,
+                    'subject': rule.subject,
+                    'duration_minutes': rule.duration_minutes,
+                    'status': 'scheduled',
+                    'recurring_lesson_id': rule.id
                 })
+        if not rows:
+            return []
+        
+        dialect = session.bind.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            dialect_module = sqlite if dialect == 'sqlite' else postgresql
+            statement = dialect_module.insert(Schedule).on_conflict_do_nothing(
+                index_elements=['recurring_lesson_id', 'lesson_date']
+            ).returning(Schedule.id, Schedule.teacher_id, Schedule.student_id, Schedule.lesson_date)
+            result = await session.execute(statement, rows)
+            return [ScheduleChange(*row) for row in result]
+        
+        changes = []
+        for row in rows:
+            lesson = Schedule(**row)
+            try:
+                async with session.begin_nested():
+                    session.add(lesson)
+            except IntegrityError:
+                continue
+            changes.append(ScheduleChange(lesson.id, lesson.teacher_id, lesson.student_id, lesson.lesson_date))
+        return changes
+    
+    async def materialize_window(self, window_start: datetime, window_end: datetime) -> int:
+        """Создание строк schedule по правилам перед загрузкой окна напоминаний"""
+        async with self.db.get_session() as session:
+            changes = await self.materialize_recurring(session, window_start, window_end)
+        
+        for change in changes:
+            notify_schedule_change(change)
+        return len(changes)
+    
+    async def get_upcoming_lessons(self, reminder_minutes: int = 15) -> List[Dict[str, Any]]:
+        """Уроки, по которым еще не отправлены все напоминания"""
+        now = datetime.now(timezone.utc)
+        await self.materialize_window(now, now + timedelta(minutes=reminder_minutes))
+        async with self.db.get_session() as session:
+            query = upcoming_query(reminder_minutes, now)
+            return [reminder_lesson(row) for row in await session.execute(query)]
+    
+    async def get_reminder_window(self, window_start: datetime, window_end: datetime,
+                                  reminder_minutes: int = 15) -> List[Dict[str, Any]]:
+        """
+        Уроки, начинающиеся в интервале (window_start, window_end], с неотправленными напоминаниями.
+        Уроки по правилам должны быть заранее созданы через materialize_window
+        """
+        async with self.db.get_session() as session:
+            query = reminder_query(reminder_minutes).where(
+                Schedule.lesson_start_utc > utc_naive(window_start),
+                Schedule.lesson_start_utc <= utc_naive(window_end)
+            )
+            return [reminder_lesson(row) for row in await session.execute(query)]
+    
+    async def get_reminder_lesson(self, lesson_id: int, reminder_minutes: int = 15) -> Optional[Dict[str, Any]]:
+        """Урок для напоминания или None, если напоминать по нему больше не нужно"""
+        async with self.db.get_session() as session:
+            query = reminder_query(reminder_minutes).where(Schedule.id == lesson_id)
+            row = (await session.execute(query)).first()
+            return reminder_lesson(row) if row else None
+    
+    async def claim_reminder_delivery(self, lesson_id: int, recipient: str, offset_minutes: int,
+                                      stale_after: float = 300) -> bool:
+        """
+        Запись о доставке напоминания до его отправки (claimed_at без sent_at).
+        Незавершенную запись старше stale_after секунд, оставшуюся после падения
+        процесса между записью и отправкой, можно занять заново.
+        Возвращает False, если напоминание уже отправлено или его сейчас отправляют
+        """
+        now = utc_naive(datetime.now(timezone.utc))
+        stale = and_(ReminderDelivery.sent_at.is_(None), ReminderDelivery.claimed_at < now - timedelta(seconds=stale_after))
+        values = {'lesson_id': lesson_id, 'recipient': recipient, 'offset_minutes': offset_minutes}
+        
+        async with self.db.get_session() as session:
+            dialect = session.bind.dialect.name
+            if dialect in ('sqlite', 'postgresql'):
+                dialect_module = sqlite if dialect == 'sqlite' else postgresql
+                statement = (
+                    dialect_module.insert(ReminderDelivery)
+                    .values(claimed_at=now, **values)
+                    .on_conflict_do_update(
+                        index_elements=['lesson_id', 'recipient', 'offset_minutes'],
+                        set_={'claimed_at': now},
+                        where=stale
+                    )
+                )
+                result = await session.execute(statement)
+                return result.rowcount == 1
             
-            return results
+            try:
+                async with session.begin_nested():
+                    session.add(ReminderDelivery(claimed_at=now, **values))
+                return True
+            except IntegrityError:
+                result = await session.execute(
+                    update(ReminderDelivery).where(delivery_key(**values), stale).values(claimed_at=now)
+                )
+                return result.rowcount == 1
     
-    def add_lesson(self, teacher_id: int, student_id: int, lesson_date: date, 
-                   lesson_time: time, subject: str, duration: int = 60) -> bool:
+    async def complete_reminder_delivery(self, lesson_id: int, recipient: str, offset_minutes: int):
+        """Отметка об успешной отправке занятого напоминания"""
+        async with self.db.get_session() as session:
+            await session.execute(
+                update(ReminderDelivery)
+                .where(delivery_key(lesson_id, recipient, offset_minutes))
+                .values(sent_at=utc_naive(datetime.now(timezone.utc)))
+            )
+    
+    async def is_reminder_sent(self, lesson_id: int, recipient: str, offset_minutes: int) -> bool:
+        async with self.db.get_session() as session:
+            sent_at = await session.scalar(
+                select(ReminderDelivery.sent_at).where(delivery_key(lesson_id, recipient, offset_minutes))
+            )
+            return sent_at is not None
+    
+    async def release_reminder_delivery(self, lesson_id: int, recipient: str, offset_minutes: int):
+        """Отмена записи о доставке, если отправка не удалась"""
+        async with self.db.get_session() as session:
+            await session.execute(
+                delete(ReminderDelivery).where(
+                    delivery_key(lesson_id, recipient, offset_minutes),
+                    ReminderDelivery.sent_at.is_(None)
+                )
+            )
+    
+    async def add_lesson(self, teacher_id: int, student_id: int, lesson_date: date,
+                         lesson_time: time, subject: str, duration: int = 60) -> bool:
         """Добаление нового урока в расписание"""
-        with self.db.get_session() as session:
+        async with self.db.get_session() as session:
             lesson = Schedule(
                 teacher_id=teacher_id,
                 student_id=student_id,
@@ -313,4 +1119,187 @@ class ScheduleManager:
                 duration_minutes=duration
             )
             session.add(lesson)
-            return True
\ No newline at end of file
+            await session.flush()
+            change = ScheduleChange(lesson.id, teacher_id, student_id, lesson_date)
+        
+        notify_schedule_change(change)
+        return True
+    
+    async def update_lesson_status(self, lesson_id: int, status: str) -> bool:
+        """Изменение статуса урока (например, отмена)"""
+        async with self.db.get_session() as session:
+            lesson = await session.get(Schedule, lesson_id)
+            if not lesson:
+                return False
+            lesson.status = status
+            change = ScheduleChange(lesson.id, lesson.teacher_id, lesson.student_id, lesson.lesson_date)
+        
+        notify_schedule_change(change)
+        return True
+    
+    async def add_recurring_lesson(self, teacher_id: int, student_id: int, weekdays: Iterable[int],
+                                   lesson_time: time, subject: str, start_date: date,
+                                   end_date: Optional[date] = None, duration: int = 60,
+                                   interval_weeks: int = 1) -> int:
+        """
+        Добавление повторяющегося урока: weekdays - дни недели (0 - понедельник),
+        interval_weeks - каждую какую неделю. Возвращает id правила
+        """
+        mask = weekdays_mask(weekdays)
+        if not mask or interval_weeks < 1:
+            raise ValueError("Recurring lesson needs at least one weekday and a positive interval")
+        
+        async with self.db.get_session() as session:
+            rule = RecurringLesson(
+                teacher_id=teacher_id,
+                student_id=student_id,
+                weekdays=mask,
+                interval_weeks=interval_weeks,
+                lesson_time=lesson_time,
+                subject=subject,
+                duration_minutes=duration,
+                start_date=start_date,
+                end_date=end_date
+            )
+            session.add(rule)
+            await session.flush()
+            rule_id = rule.id
+            
+            now = datetime.now(timezone.utc)
+            changes = await self.materialize_recurring(
+                session, now, now + timedelta(hours=Config.REMINDER_WINDOW_HOURS), rule_id
+            )
+        
+        for change in changes or [ScheduleChange(-rule_id, teacher_id, student_id, start_date)]:
+            notify_schedule_change(change)
+        return rule_id
+    
+    async def cancel_recurring_occurrence(self, rule_id: int, lesson_date: date) -> bool:
+        """Отмена одного урока по правилу, в том числе уже созданного в окне напоминаний"""
+        async with self.db.get_session() as session:
+            rule = await session.get(RecurringLesson, rule_id)
+            if not rule:
+                return False
+            
+            exception = await session.scalar(
+                select(RecurringLessonException).where(
+                    RecurringLessonException.recurring_lesson_id == rule_id,
+                    RecurringLessonException.lesson_date == lesson_date
+                )
+            )
+            if exception is None:
+                session.add(RecurringLessonException(recurring_lesson_id=rule_id, lesson_date=lesson_date))
+            
+            lesson = await session.scalar(
+                select(Schedule).where(Schedule.recurring_lesson_id == rule_id, Schedule.lesson_date == lesson_date)
+            )
+            if lesson:
+                lesson.status = 'cancelled'
+            change = ScheduleChange(lesson.id if lesson else -rule_id, rule.teacher_id, rule.student_id, lesson_date)
+        
+        notify_schedule_change(change)
+        return True
+
+class AsyncStateStore:
+    """Хранение состояния диалогов (user_data, chat_data, conversations) в JSON"""
+    
+    def __init__(self, db_manager: AsyncDatabaseManager):
+        self.db = db_manager
+    
+    async def load(self, scope: str, key: str) -> Optional[str]:
+        async with self.db.get_session() as session:
+            result = await session.execute(
+                select(ConversationState.data).where(
+                    ConversationState.scope == scope,
+                    ConversationState.key == key
+                )
+            )
+            return result.scalar_one_or_none()
+    
+    async def load_scope(self, scope: str) -> Dict[str, str]:
+        async with self.db.get_session() as session:
+            result = await session.execute(
+                select(ConversationState.key, ConversationState.data).where(ConversationState.scope == scope)
+            )
+            return {key: data for key, data in result.all()}
+    
+    async def save_many(self, changes: Dict[tuple, Optional[str]]):
+        """Запись пачки изменений одной транзакцией: None в значении удаляет запись"""
+        rows = [
+            {'scope': scope, 'key': key, 'data': data}
+            for (scope, key), data in changes.items() if data is not None
+        ]
+        removed = [(scope, key) for (scope, key), data in changes.items() if data is None]
+        
+        async with self.db.get_session() as session:
+            if rows:
+                dialect = session.bind.dialect.name
+                if dialect in ('sqlite', 'postgresql'):
+                    dialect_module = sqlite if dialect == 'sqlite' else postgresql
+                    statement = dialect_module.insert(ConversationState)
+                    statement = statement.on_conflict_do_update(
+                        index_elements=['scope', 'key'],
+                        set_={'data': statement.excluded.data, 'updated_at': func.now()}
+                    )
+                    await session.execute(statement, rows)
+                else:
+                    for row in rows:
+                        await session.merge(ConversationState(**row))
+            
+            if removed:
+                await session.execute(
+                    delete(ConversationState).where(
+                        tuple_(ConversationState.scope, ConversationState.key).in_(removed)
+                    )
+                )
+
+class AsyncLeaseStore:
+    """Аренда с истечением срока для выбора одной реплики-лидера"""
+    
+    def __init__(self, db_manager: AsyncDatabaseManager):
+        self.db = db_manager
+    
+    async def try_acquire(self, name: str, holder: str, ttl: float) -> bool:
+        """
+        Захват или продление аренды. Условное обновление атомарно,
+        поэтому из нескольких реплик истекшую аренду получит только одна
+        """
+        now = utc_naive(datetime.now(timezone.utc))
+        expires_at = now + timedelta(seconds=ttl)
+        
+        async with self.db.get_session() as session:
+            result = await session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == name,
+                    or_(SchedulerLease.holder == holder, SchedulerLease.expires_at <= now)
+                )
+                .values(holder=holder, expires_at=expires_at, renewed_at=now)
+            )
+            if result.rowcount == 1:
+                return True
+            
+            values = {'name': name, 'holder': holder, 'expires_at': expires_at, 'renewed_at': now}
+            dialect = session.bind.dialect.name
+            if dialect in ('sqlite', 'postgresql'):
+                dialect_module = sqlite if dialect == 'sqlite' else postgresql
+                result = await session.execute(
+                    dialect_module.insert(SchedulerLease).values(**values).on_conflict_do_nothing(index_elements=['name'])
+                )
+                return result.rowcount == 1
+            
+            try:
+                async with session.begin_nested():
+                    session.add(SchedulerLease(**values))
+                return True
+            except IntegrityError:
+                return False
+    
+    async def release(self, name: str, holder: str):
+        """Досрочное освобождение аренды, чтобы другая реплика не ждала ее истечения"""
+        async with self.db.get_session() as session:
+            await session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+                .values(expires_at=utc_naive(datetime.now(timezone.utc)))
+            )
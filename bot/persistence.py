@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Set, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+from models import AsyncDatabaseManager, AsyncStateStore
+
+logger = logging.getLogger(__name__)
+
+StateKey = Tuple[str, str]
+
+class DatabasePersistence(BasePersistence):
+    """
+    Хранение user_data, chat_data и состояний ConversationHandler в базе бота.
+
+    Данные пользователя и чата читаются при первом обращении через refresh_*_data,
+    а не все сразу при запуске. Записи копятся в памяти: Application передает
+    изменившиеся данные раз в update_interval секунд, и они сохраняются одной
+    транзакцией, причем неизмененные данные повторно не пишутся
+    """
+
+    def __init__(self, db_manager: AsyncDatabaseManager, update_interval: float = 10):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.store = AsyncStateStore(db_manager)
+        self.loaded: Dict[str, Set[int]] = {'user': set(), 'chat': set()}
+        self.saved: Dict[StateKey, str] = {}
+        self.dirty: Dict[StateKey, Optional[str]] = {}
+        self.conversations: Dict[str, Dict[tuple, object]] = {}
+        self.write_lock = asyncio.Lock()
+        self.flush_task: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.skipped = 0
+
+    @staticmethod
+    def encode(data: Any) -> str:
+        """
+        Данные хранятся в JSON. Значение, которое из JSON не восстановить (дата,
+        множество, объект), вызывает TypeError, а не сохраняется молча строкой
+        """
+        return json.dumps(data, ensure_ascii=False, sort_keys=True)
+
+    def mark(self, key: StateKey, payload: Optional[str], force: bool = False):
+        if not force and self.saved.get(key) == payload:
+            self.dirty.pop(key, None)
+            self.skipped += 1
+            return
+        self.dirty[key] = payload
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.write_dirty())
+
+    async def write_dirty(self):
+        """Запись накопленных изменений; пачка за интервал уходит одной транзакцией"""
+        await asyncio.sleep(0)
+        async with self.write_lock:
+            batch, self.dirty = self.dirty, {}
+            if not batch:
+                return
+            try:
+                await self.store.save_many(batch)
+            except Exception as e:
+                logger.error(f"Error saving conversation state: {e}")
+                for key, payload in batch.items():
+                    self.dirty.setdefault(key, payload)
+                return
+            for key, payload in batch.items():
+                if payload is None:
+                    self.saved.pop(key, None)
+                else:
+                    self.saved[key] = payload
+            self.writes += 1
+
+    async def load_into(self, scope: str, key: int, data: Dict):
+        if key in self.loaded[scope]:
+            return
+        payload = await self.store.load(scope, str(key))
+        if payload is not None:
+            stored = json.loads(payload)
+            for name, value in stored.items():
+                data.setdefault(name, value)
+            self.saved[(scope, str(key))] = payload
+        self.loaded[scope].add(key)
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        payload = await self.store.load('bot', '0')
+        if payload is None:
+            return {}
+        self.saved[('bot', '0')] = payload
+        return json.loads(payload)
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        stored = await self.store.load_scope(f"conversation:{name}")
+        conversations = {}
+        for key, payload in stored.items():
+            conversations[tuple(json.loads(key))] = json.loads(payload)
+            self.saved[(f"conversation:{name}", key)] = payload
+        self.conversations[name] = conversations
+        return conversations
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]):
+        await self.load_into('user', user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]):
+        await self.load_into('chat', chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]):
+        pass
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]):
+        self.mark(('user', str(user_id)), self.encode(data) if data else None)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]):
+        self.mark(('chat', str(chat_id)), self.encode(data) if data else None)
+
+    async def update_bot_data(self, data: Dict[Any, Any]):
+        self.mark(('bot', '0'), self.encode(data) if data else None)
+
+    async def update_callback_data(self, data: Any):
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]):
+        self.conversations.setdefault(name, {})
+        if new_state is None:
+            self.conversations[name].pop(key, None)
+        else:
+            self.conversations[name][key] = new_state
+        self.mark(
+            (f"conversation:{name}", json.dumps(list(key))),
+            self.encode(new_state) if new_state is not None else None
+        )
+
+    async def drop_user_data(self, user_id: int):
+        self.loaded['user'].discard(user_id)
+        self.mark(('user', str(user_id)), None, force=True)
+
+    async def drop_chat_data(self, chat_id: int):
+        self.loaded['chat'].discard(chat_id)
+        self.mark(('chat', str(chat_id)), None, force=True)
+
+    async def flush(self):
+        if self.flush_task is not None:
+            await self.flush_task
+        await self.write_dirty()
+        logger.info(f"Conversation state flushed: {self.writes} batches written, {self.skipped} unchanged skipped")
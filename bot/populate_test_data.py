@@ -1,6 +1,15 @@
-from datetime import date, time, timedelta
+import argparse
+import itertools
+import random
+import sys
+from datetime import date, datetime, time, timedelta
 import logging
-from models import DatabaseManager, Teacher, Student, Schedule, UserSession
+from typing import Dict, List
+from sqlalchemy import delete, insert, select
+from models import (
+    DatabaseManager, Teacher, Student, Schedule, UserSession, ReminderDelivery,
+    RecurringLesson, RecurringLessonException, lesson_start_utc
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,7 +22,10 @@ class TestDataPopulator:
         try:
             with self.db_manager.get_session() as session:
                 logger.info("Clearing existing test data...")
+                session.query(ReminderDelivery).delete()
                 session.query(Schedule).delete()
+                session.query(RecurringLessonException).delete()
+                session.query(RecurringLesson).delete()
                 session.query(UserSession).delete()
                 session.query(Teacher).delete()
                 session.query(Student).delete()
@@ -156,6 +168,156 @@ class TestDataPopulator:
             logger.error(f"Error populating test data: {e}")
             raise
 
+FIRST_NAMES = ["Анна", "Михаил", "Елена", "Дмитрий", "Ольга", "Иван", "Мария", "Петр", "София", "Максим"]
+LAST_NAMES = ["Петрова", "Сидоров", "Козлова", "Волков", "Морозова", "Иванов", "Смирнова", "Кузнецов"]
+SUBJECTS = ["Математика", "Русский язык", "Английский язык", "Физика", "Химия", "История", "География", "Биология"]
+SUBJECT_WEIGHTS = [30, 15, 25, 10, 7, 5, 4, 4]
+LESSON_SLOTS = [time(hour, minute) for hour in range(8, 21) for minute in (0, 30)]
+DURATIONS = [45, 60, 90]
+DURATION_WEIGHTS = [25, 60, 15]
+WEEKDAY_WEIGHTS = [16, 17, 17, 17, 15, 12, 6]
+
+class SyntheticDataGenerator:
+    """
+    Массовое заполнение базы правдоподобными синтетическими данными для замеров.
+
+    Нагрузка на преподавателей и учеников распределена неравномерно (по Парето),
+    уроки чаще стоят в будни и во второй половине дня, прошедшие уроки в основном
+    проведены, часть отменена. Строки вставляются пачками через executemany
+    """
+
+    def __init__(self, db_manager: DatabaseManager, seed: int = 42, chunk_size: int = 10000):
+        self.db_manager = db_manager
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def clear(self):
+        with self.db_manager.engine.begin() as connection:
+            for model in (ReminderDelivery, Schedule, RecurringLessonException, RecurringLesson,
+                          UserSession, Teacher, Student):
+                connection.execute(delete(model))
+
+    @staticmethod
+    def cumulative(weights: List[float]) -> List[float]:
+        return list(itertools.accumulate(weights))
+
+    def insert_chunks(self, model, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                with self.db_manager.engine.begin() as connection:
+                    connection.execute(insert(model), chunk)
+                chunk = []
+        if chunk:
+            with self.db_manager.engine.begin() as connection:
+                connection.execute(insert(model), chunk)
+
+    def user_rows(self, rng: random.Random, prefix: str, count: int, bound_ratio: float, telegram_base: int):
+        for i in range(1, count + 1):
+            yield {
+                'first_name': rng.choice(FIRST_NAMES),
+                'last_name': rng.choice(LAST_NAMES),
+                'login': f"{prefix}_{i}",
+                'telegram_id': telegram_base + i if rng.random() < bound_ratio else None,
+                'reminder_enabled': rng.random() < 0.85
+            }
+
+    def insert_users(self, rng: random.Random, model, user_type: str, count: int, bound_ratio: float,
+                     telegram_base: int) -> List[int]:
+        """Вставка пользователей и сеансов для привязанных к Telegram; возвращает идентификаторы"""
+        self.insert_chunks(model, self.user_rows(rng, user_type, count, bound_ratio, telegram_base))
+        with self.db_manager.engine.connect() as connection:
+            rows = connection.execute(select(model.id, model.telegram_id).order_by(model.id)).all()
+        self.insert_chunks(UserSession, (
+            {'telegram_id': telegram_id, 'user_type': user_type, 'user_id': user_id, 'is_authenticated': True}
+            for user_id, telegram_id in rows if telegram_id is not None
+        ))
+        return [user_id for user_id, _ in rows]
+
+    def lesson_rows(self, rng: random.Random, teacher_ids: List[int], student_ids: List[int],
+                    lessons: int, days: int):
+        today = date.today()
+        now = datetime.now()
+        teacher_weights = self.cumulative([rng.paretovariate(1.5) for _ in teacher_ids])
+        student_weights = self.cumulative([rng.paretovariate(2.5) for _ in student_ids])
+        offsets = range(-days, days + 1)
+        offset_weights = self.cumulative([
+            WEEKDAY_WEIGHTS[(today + timedelta(days=offset)).weekday()] for offset in offsets
+        ])
+        slot_weights = self.cumulative([
+            1 + 3 * (slot.hour >= 14) + 2 * (16 <= slot.hour < 19) for slot in LESSON_SLOTS
+        ])
+        subject_weights = self.cumulative(SUBJECT_WEIGHTS)
+        duration_weights = self.cumulative(DURATION_WEIGHTS)
+
+        for start in range(0, lessons, self.chunk_size):
+            size = min(self.chunk_size, lessons - start)
+            columns = zip(
+                rng.choices(teacher_ids, cum_weights=teacher_weights, k=size),
+                rng.choices(student_ids, cum_weights=student_weights, k=size),
+                rng.choices(offsets, cum_weights=offset_weights, k=size),
+                rng.choices(LESSON_SLOTS, cum_weights=slot_weights, k=size),
+                rng.choices(SUBJECTS, cum_weights=subject_weights, k=size),
+                rng.choices(DURATIONS, cum_weights=duration_weights, k=size)
+            )
+            for teacher_id, student_id, offset, lesson_time, subject, duration in columns:
+                lesson_date = today + timedelta(days=offset)
+                chance = rng.random()
+                if datetime.combine(lesson_date, lesson_time) < now:
+                    status = 'completed' if chance < 0.85 else 'cancelled'
+                else:
+                    status = 'scheduled' if chance < 0.95 else 'cancelled'
+                yield {
+                    'teacher_id': teacher_id,
+                    'student_id': student_id,
+                    'lesson_date': lesson_date,
+                    'lesson_time': lesson_time,
+                    'lesson_start_utc': lesson_start_utc(lesson_date, lesson_time),
+                    'subject': subject,
+                    'duration_minutes': duration,
+                    'status': status
+                }
+
+    def generate(self, teachers: int, students: int, lessons: int, days: int = 180,
+                 bound_ratio: float = 0.6) -> Dict[str, int]:
+        """
+        Замена данных на teachers преподавателей, students учеников и lessons уроков
+        в пределах ±days дней; bound_ratio пользователей привязаны к Telegram
+        """
+        rng = random.Random(self.seed)
+        started = datetime.now()
+        self.clear()
+
+        teacher_ids = self.insert_users(rng, Teacher, 'teacher', teachers, bound_ratio, 100_000_000)
+        student_ids = self.insert_users(rng, Student, 'student', students, bound_ratio, 200_000_000)
+        self.insert_chunks(Schedule, self.lesson_rows(rng, teacher_ids, student_ids, lessons, days))
+
+        elapsed = (datetime.now() - started).total_seconds()
+        logger.info(f"Generated {teachers} teachers, {students} students and {lessons} lessons in {elapsed:.1f}s")
+        return {'teachers': teachers, 'students': students, 'lessons': lessons}
+
+def generate_main():
+    parser = argparse.ArgumentParser(description="Telegram Bot - synthetic data generator")
+    parser.add_argument('--teachers', type=int, default=500)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--lessons', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=180,
+                        help="lessons are spread over this many days before and after today")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--yes', action='store_true', help="do not ask before clearing existing data")
+    args = parser.parse_args()
+
+    if not args.yes:
+        confirm = input("\nDo you want to proceed? This will clear existing data. (y/N): ")
+        if confirm.lower() != 'y':
+            print("Operation cancelled.")
+            return
+
+    generator = SyntheticDataGenerator(DatabaseManager(args.database_url), seed=args.seed)
+    generator.generate(args.teachers, args.students, args.lessons, days=args.days)
+
 def main():
     print("Telegram Bot - Test Data Population (SQLAlchemy)")
     print("This script will create test data for the bot database.")
@@ -172,4 +334,7 @@ def main():
     print("You can now test the bot with the provided login credentials.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        generate_main()
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Any, Optional
+from telegram import Bot, Message
+from telegram.error import RetryAfter, TelegramError
+from metrics import TELEGRAM_ERRORS, TELEGRAM_RETRY_AFTER
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Ведро токенов: не более rate операций в секунду с запасом capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def is_idle(self) -> bool:
+        elapsed = time.monotonic() - self.updated
+        return not self.lock.locked() and self.tokens + elapsed * self.rate >= self.capacity
+
+class TelegramRateLimiter:
+    """
+    Ограничение исходящих сообщений с учетом лимитов Telegram:
+    общий лимит бота, лимит на один чат и ответы RetryAfter
+    """
+
+    def __init__(self, global_rate: float = 30, per_chat_rate: float = 1,
+                 max_concurrency: int = 20, max_retries: int = 3, max_chat_buckets: int = 10000):
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self.max_chat_buckets = max_chat_buckets
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.paused_until = 0.0
+
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.retry_after_count = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, capacity=1)
+            self.chat_buckets[chat_id] = bucket
+            if len(self.chat_buckets) > self.max_chat_buckets:
+                oldest_id, oldest = next(iter(self.chat_buckets.items()))
+                if oldest.is_idle():
+                    del self.chat_buckets[oldest_id]
+        self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def wait_for_pause(self):
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def send_message(self, bot: Bot, chat_id: int, text: str, **kwargs) -> Message:
+        """Отправка сообщения с соблюдением лимитов и повтором после RetryAfter"""
+        started = time.monotonic()
+        self.queue_depth += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self.chat_bucket(chat_id).acquire()
+                async with self.semaphore:
+                    await self.wait_for_pause()
+                    await self.global_bucket.acquire()
+                    self.queue_depth -= 1
+                    self.in_flight += 1
+                    try:
+                        message = await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                        break
+                    except RetryAfter as e:
+                        self.retry_after_count += 1
+                        TELEGRAM_RETRY_AFTER.inc()
+                        retry_after = e.retry_after
+                        if isinstance(retry_after, timedelta):
+                            retry_after = retry_after.total_seconds()
+                        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                        logger.warning(f"Flood control for chat {chat_id}, retry in {retry_after}s")
+                        if attempt == self.max_retries:
+                            raise
+                    finally:
+                        self.in_flight -= 1
+                        self.queue_depth += 1
+        except Exception as e:
+            self.failed += 1
+            if isinstance(e, TelegramError):
+                TELEGRAM_ERRORS.inc(type(e).__name__)
+            raise
+        finally:
+            self.queue_depth -= 1
+
+        latency = time.monotonic() - started
+        self.sent += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        return message
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self.queue_depth,
+            'in_flight': self.in_flight,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retry_after': self.retry_after_count,
+            'avg_latency': self.total_latency / self.sent if self.sent else 0.0,
+            'max_latency': self.max_latency
+        }
@@ -1,61 +1,364 @@
+import asyncio
+import heapq
 import logging
-from datetime import datetime
-from typing import List, Dict, Any
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Set
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_STOPPED
 from apscheduler.triggers.date import DateTrigger
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
 import pytz
 from telegram.ext import Application
-from models import ScheduleManager, DatabaseManager
+from models import (
+    AsyncScheduleManager, AsyncDatabaseManager, ScheduleChange,
+    add_schedule_listener, remove_schedule_listener, to_sync_url, EngineProfile
+)
 from config import Config
+from rate_limiter import TelegramRateLimiter
+from metrics import REMINDER_LATENESS
 
 logger = logging.getLogger(__name__)
 
+CUSTOM_REMINDER_TABLE = 'apscheduler_jobs'
+
+active_scheduler: Optional["ReminderScheduler"] = None
+
+def create_job_store(database_url: Optional[str] = None) -> SQLAlchemyJobStore:
+    """
+    Хранилище APScheduler работает через синхронный драйвер (psycopg2 для PostgreSQL)
+    из потоков планировщика, поэтому базе SQLite в памяти нужно одно общее соединение
+    """
+    url = to_sync_url(database_url or Config.DATABASE_URL)
+    options = {}
+    if make_url(url).get_backend_name() == 'sqlite' and make_url(url).database in (None, '', ':memory:'):
+        options = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    return SQLAlchemyJobStore(
+        engine=EngineProfile().create_engine(url, **options),
+        tablename=CUSTOM_REMINDER_TABLE
+    )
+
+class JobStoreScheduler(BackgroundScheduler):
+    """
+    BackgroundScheduler после shutdown будит свой поток, и тот еще раз обходит
+    хранилище уже в остановленном состоянии. Здесь этот обход пропускается, чтобы
+    реплика на паузе не запускала и не удаляла чужие задачи при остановке
+    """
+
+    def _process_jobs(self):
+        if self.state == STATE_STOPPED:
+            return None
+        return super()._process_jobs()
+
+def create_job_scheduler(jobstore: SQLAlchemyJobStore) -> JobStoreScheduler:
+    """
+    Планировщик индивидуальных напоминаний с хранилищем задач в базе бота.
+    Работает в отдельном потоке, чтобы запросы к хранилищу не блокировали цикл событий.
+    Задачи, пропущенные во время простоя, выполняются при запуске, если опоздание
+    не больше misfire_grace_time, а несколько пропущенных запусков сливаются в один
+    """
+    return JobStoreScheduler(
+        jobstores={'default': jobstore},
+        job_defaults={
+            'misfire_grace_time': Config.CUSTOM_REMINDER_MISFIRE_GRACE_SECONDS,
+            'coalesce': True
+        },
+        timezone=pytz.timezone(Config.TIMEZONE)
+    )
+
+def send_custom_reminder_job(telegram_id: int, message: str):
+    """
+    Задача хранилища APScheduler. В базе сохраняется ссылка на функцию модуля,
+    поэтому метод экземпляра вызывается через активный планировщик. Задача выполняется
+    в потоке APScheduler, а отправка - в цикле событий бота
+    """
+    scheduler = active_scheduler
+    if scheduler is None or scheduler.loop is None:
+        logger.warning(f"Custom reminder for {telegram_id} fired without an active reminder scheduler")
+        return
+    asyncio.run_coroutine_threadsafe(
+        scheduler.send_custom_reminder(telegram_id, message), scheduler.loop
+    ).result()
+
+class ReminderEngine:
+    """
+    Очередь напоминаний с приоритетом по времени отправки.
+    Загружает уроки на несколько часов вперед и спит до ближайшего напоминания.
+    Если send_callback вернул False или упал, урок возвращается в очередь
+    с удваивающейся задержкой, пока не кончатся попытки или не начнется урок
+    """
+    
+    def __init__(self, schedule_manager: AsyncScheduleManager,
+                 send_callback: Callable[[Dict[str, Any]], Awaitable[Optional[bool]]],
+                 reminder_minutes: int = 15, window_hours: float = 6,
+                 retry_seconds: float = 30, max_retries: int = 5):
+        self.schedule_manager = schedule_manager
+        self.send_callback = send_callback
+        self.reminder_offset = timedelta(minutes=reminder_minutes)
+        self.window = timedelta(hours=window_hours)
+        self.retry_delay = timedelta(seconds=retry_seconds)
+        self.max_retries = max_retries
+        self.attempts: Dict[int, int] = {}
+        self.retry_at: Dict[int, datetime] = {}
+        self.heap: List[tuple] = []
+        self.lessons: Dict[int, tuple] = {}
+        self.window_end: Optional[datetime] = None
+        self.next_refresh: Optional[datetime] = None
+        self.pending_changes: Dict[int, ScheduleChange] = {}
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.in_flight: Set[asyncio.Task] = set()
+        self.version = 0
+    
+    def start(self):
+        if self.task is None:
+            self.next_refresh = None
+            add_schedule_listener(self.on_schedule_change)
+            self.task = asyncio.create_task(self.run())
+            logger.info("Reminder engine started")
+    
+    async def stop(self):
+        if self.task is not None:
+            remove_schedule_listener(self.on_schedule_change)
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+            if self.in_flight:
+                await asyncio.gather(*self.in_flight, return_exceptions=True)
+            logger.info("Reminder engine stopped")
+    
+    def on_schedule_change(self, change: ScheduleChange):
+        """Обработка изменения урока, попадающего в загруженное окно"""
+        if self.window_end is None:
+            return
+        tz = pytz.timezone(Config.TIMEZONE)
+        if change.lesson_date > self.window_end.astimezone(tz).date():
+            return
+        self.pending_changes[change.lesson_id] = change
+        self.wakeup.set()
+    
+    def push(self, lesson: Dict[str, Any], now: datetime, fire_at: Optional[datetime] = None):
+        """Постановка урока в очередь; ожидающий повтор не сдвигается раньше своего времени"""
+        self.version += 1
+        fire_at = max(
+            fire_at or lesson['lesson_start'] - self.reminder_offset,
+            self.retry_at.get(lesson['id'], now),
+            now
+        )
+        self.lessons[lesson['id']] = (self.version, lesson)
+        heapq.heappush(self.heap, (fire_at, lesson['id'], self.version))
+    
+    def discard(self, lesson_id: int):
+        self.lessons.pop(lesson_id, None)
+    
+    async def refresh(self, now: datetime):
+        """Полная загрузка окна напоминаний"""
+        window_end = now + self.window
+        await self.schedule_manager.materialize_window(now, window_end)
+        lessons = await self.schedule_manager.get_reminder_window(
+            now, window_end, Config.REMINDER_MINUTES_BEFORE
+        )
+        
+        self.heap = []
+        self.lessons = {}
+        self.pending_changes.clear()
+        for lesson in lessons:
+            self.push(lesson, now)
+        self.attempts = {lesson_id: count for lesson_id, count in self.attempts.items() if lesson_id in self.lessons}
+        self.retry_at = {lesson_id: moment for lesson_id, moment in self.retry_at.items() if lesson_id in self.lessons}
+        
+        self.window_end = window_end
+        self.next_refresh = now + self.window / 2
+        logger.info(f"Reminder window loaded: {len(lessons)} lessons until {window_end.isoformat()}")
+    
+    async def apply_changes(self, now: datetime):
+        """Точечное обновление очереди по изменившимся урокам"""
+        changes, self.pending_changes = self.pending_changes, {}
+        for lesson_id in changes:
+            lesson = await self.schedule_manager.get_reminder_lesson(
+                lesson_id, Config.REMINDER_MINUTES_BEFORE
+            )
+            if lesson and now < lesson['lesson_start'] <= self.window_end:
+                self.push(lesson, now)
+            else:
+                self.discard(lesson_id)
+    
+    def pop_due(self, now: datetime) -> List[Dict[str, Any]]:
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, lesson_id, version = heapq.heappop(self.heap)
+            current = self.lessons.get(lesson_id)
+            if current and current[0] == version:
+                del self.lessons[lesson_id]
+                due.append(current[1])
+        return due
+    
+    def seconds_until_next(self, now: datetime) -> float:
+        deadline = self.next_refresh
+        while self.heap and self.lessons.get(self.heap[0][1], (None,))[0] != self.heap[0][2]:
+            heapq.heappop(self.heap)
+        if self.heap:
+            deadline = min(deadline, self.heap[0][0])
+        return max((deadline - now).total_seconds(), 0)
+    
+    def dispatch(self, lessons: List[Dict[str, Any]]):
+        """Запуск отправки без ожидания, чтобы очередь не задерживалась"""
+        for lesson in lessons:
+            task = asyncio.create_task(self.deliver(lesson))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+    
+    async def deliver(self, lesson: Dict[str, Any]):
+        try:
+            delivered = await self.send_callback(lesson)
+        except Exception as e:
+            logger.error(f"Error sending reminders for lesson {lesson['id']}: {e}")
+            delivered = False
+        
+        if delivered is False:
+            self.schedule_retry(lesson, datetime.now(timezone.utc))
+        else:
+            self.attempts.pop(lesson['id'], None)
+            self.retry_at.pop(lesson['id'], None)
+    
+    def schedule_retry(self, lesson: Dict[str, Any], now: datetime) -> bool:
+        """Повтор неудавшейся отправки; успешные получатели пропускаются по журналу доставок"""
+        if lesson['id'] in self.lessons:
+            return False
+        
+        attempt = self.attempts.get(lesson['id'], 0) + 1
+        retry_at = now + self.retry_delay * 2 ** (attempt - 1)
+        if attempt > self.max_retries or retry_at >= lesson['lesson_start']:
+            self.attempts.pop(lesson['id'], None)
+            self.retry_at.pop(lesson['id'], None)
+            logger.warning(f"Giving up reminders for lesson {lesson['id']} after {attempt - 1} retries")
+            return False
+        
+        self.attempts[lesson['id']] = attempt
+        self.retry_at[lesson['id']] = retry_at
+        self.push(lesson, now, retry_at)
+        self.wakeup.set()
+        logger.info(f"Retrying reminders for lesson {lesson['id']} at {retry_at.isoformat()} (attempt {attempt})")
+        return True
+    
+    async def run(self):
+        while True:
+            try:
+                now = datetime.now(timezone.utc)
+                if self.next_refresh is None or now >= self.next_refresh:
+                    await self.refresh(now)
+                elif self.pending_changes:
+                    await self.apply_changes(now)
+                
+                self.dispatch(self.pop_due(now))
+                
+                self.wakeup.clear()
+                timeout = self.seconds_until_next(datetime.now(timezone.utc))
+                if timeout > 0 and not self.pending_changes:
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in reminder engine: {e}")
+                await asyncio.sleep(5)
+
 class ReminderScheduler:
-    def __init__(self, bot_application: Application, db_manager: DatabaseManager):
+    def __init__(self, bot_application: Application, db_manager: AsyncDatabaseManager,
+                 rate_limiter: Optional[TelegramRateLimiter] = None, database_url: Optional[str] = None):
         self.bot_application = bot_application
-        self.schedule_manager = ScheduleManager(db_manager)
-        self.scheduler = AsyncIOScheduler(timezone=pytz.timezone(Config.TIMEZONE))
+        self.rate_limiter = rate_limiter or TelegramRateLimiter(
+            global_rate=Config.TELEGRAM_GLOBAL_RATE,
+            per_chat_rate=Config.TELEGRAM_PER_CHAT_RATE,
+            max_concurrency=Config.REMINDER_SEND_CONCURRENCY
+        )
+        self.schedule_manager = AsyncScheduleManager(db_manager)
+        self.jobstore = create_job_store(database_url)
+        self.scheduler = create_job_scheduler(self.jobstore)
+        self.engine = ReminderEngine(
+            self.schedule_manager,
+            self.send_reminder,
+            reminder_minutes=Config.REMINDER_MINUTES_BEFORE,
+            window_hours=Config.REMINDER_WINDOW_HOURS,
+            retry_seconds=Config.REMINDER_RETRY_SECONDS,
+            max_retries=Config.REMINDER_MAX_RETRIES
+        )
+        self.poll_task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         self.is_running = False
     
-    def start(self):
+    def open_job_store(self):
+        if not self.scheduler.running:
+            self.scheduler.start(paused=True)
+    
+    async def open(self):
+        """
+        Подключение к хранилищу задач без их выполнения. Реплика, не ставшая лидером,
+        держит планировщик на паузе и только записывает новые задачи в базу
+        """
+        await asyncio.to_thread(self.open_job_store)
+    
+    async def poll_job_store(self):
+        """
+        APScheduler считает время следующего запуска по своим задачам и не видит
+        задачи, записанные в общую базу другими репликами. Поэтому лидер
+        перечитывает хранилище раз в CUSTOM_REMINDER_POLL_SECONDS секунд
+        """
+        while True:
+            await asyncio.sleep(Config.CUSTOM_REMINDER_POLL_SECONDS)
+            self.scheduler.wakeup()
+    
+    async def start(self):
         """Запуск планировщика напоминаний"""
+        global active_scheduler
         if not self.is_running:
-            self.scheduler.add_job(
-                self.check_reminders,
-                CronTrigger(second=0),
-                id='reminder_check',
-                replace_existing=True
-            )
-            
-            self.scheduler.start()
+            await self.open()
+            self.loop = asyncio.get_running_loop()
+            active_scheduler = self
+            self.scheduler.resume()
+            self.poll_task = asyncio.create_task(self.poll_job_store())
+            self.engine.start()
             self.is_running = True
             logger.info("Reminder scheduler started")
     
-    def stop(self):
-        """Остановка планировщика напоминаний"""
+    async def stop(self):
+        """Остановка рассылки напоминаний; хранилище задач остается подключенным"""
+        global active_scheduler
         if self.is_running:
-            self.scheduler.shutdown()
+            await self.engine.stop()
+            self.poll_task.cancel()
+            self.poll_task = None
+            self.scheduler.pause()
+            if active_scheduler is self:
+                active_scheduler = None
             self.is_running = False
+            logger.info(f"Reminder sender stats: {self.rate_limiter.stats()}")
             logger.info("Reminder scheduler stopped")
     
-    async def check_reminders(self):
-        try:
-            upcoming_lessons = self.schedule_manager.get_upcoming_lessons(Config.REMINDER_MINUTES_BEFORE)
-            
-            for lesson in upcoming_lessons:
-                await self.send_reminder(lesson)
-        
-        except Exception as e:
-            logger.error(f"Error checking reminders: {e}")
+    async def close(self):
+        """Полная остановка с отключением от хранилища задач"""
+        await self.stop()
+        if self.scheduler.running:
+            await asyncio.to_thread(self.scheduler.shutdown)
     
-    async def send_reminder(self, lesson: Dict[str, Any]):
-        """Проверка наличие уроков, требующих напоминаний"""
+    async def send_reminder(self, lesson: Dict[str, Any]) -> bool:
+        """Отправка напоминаний учителю и ученику по уроку; False, если хотя бы одна не удалась"""
         try:
             lesson_time = lesson['lesson_time']
             subject = lesson['subject'] or 'Урок'
+            due = lesson['lesson_start'] - timedelta(minutes=Config.REMINDER_MINUTES_BEFORE)
+            deliveries = []
 
-            if lesson['teacher_reminder_enabled'] and lesson['teacher_telegram_id']:
+            if (lesson['teacher_reminder_enabled'] and lesson['teacher_telegram_id']
+                    and not lesson.get('teacher_delivered')):
                 teacher_message = (
                     f"🔔 **Напоминание об уроке**\n\n"
                     f"📚 Предмет: {subject}\n"
@@ -64,13 +367,12 @@ class ReminderScheduler:
                     f"Урок начнется через {Config.REMINDER_MINUTES_BEFORE} минут!"
                 )
                 
-                await self.bot_application.bot.send_message(
-                    chat_id=lesson['teacher_telegram_id'],
-                    text=teacher_message
-                )
-                logger.info(f"Reminder sent to teacher {lesson['teacher_telegram_id']} for lesson {lesson['id']}")
+                deliveries.append(self.deliver_once(
+                    lesson['id'], 'teacher', lesson['teacher_telegram_id'], teacher_message, due
+                ))
             
-            if lesson['student_reminder_enabled'] and lesson['student_telegram_id']:
+            if (lesson['student_reminder_enabled'] and lesson['student_telegram_id']
+                    and not lesson.get('student_delivered')):
                 student_message = (
                     f"🔔 **Напоминание об уроке**\n\n"
                     f"📚 Предмет: {subject}\n"
@@ -79,22 +381,63 @@ class ReminderScheduler:
                     f"Урок начнется через {Config.REMINDER_MINUTES_BEFORE} минут!"
                 )
                 
-                await self.bot_application.bot.send_message(
-                    chat_id=lesson['student_telegram_id'],
-                    text=student_message
-                )
-                logger.info(f"Reminder sent to student {lesson['student_telegram_id']} for lesson {lesson['id']}")
+                deliveries.append(self.deliver_once(
+                    lesson['id'], 'student', lesson['student_telegram_id'], student_message, due
+                ))
+            
+            delivered = True
+            for result in await asyncio.gather(*deliveries, return_exceptions=True):
+                if isinstance(result, Exception):
+                    logger.error(f"Error sending reminder for lesson {lesson['id']}: {result}")
+                    delivered = False
+            return delivered
         
         except Exception as e:
             logger.error(f"Error sending reminder for lesson {lesson['id']}: {e}")
+            return False
     
-    def schedule_custom_reminder(self, telegram_id: int, message: str, reminder_time: datetime):
-        """Настройка индивидуального напоминания"""
+    async def deliver_once(self, lesson_id: int, recipient: str, chat_id: int, text: str,
+                           due: Optional[datetime] = None):
+        """
+        Отправка напоминания по журналу доставок: запись занимается до отправки
+        и отмечается отправленной после нее. Если процесс упал между отправкой и
+        отметкой, через REMINDER_CLAIM_TIMEOUT_SECONDS запись займут заново и
+        напоминание придет повторно - редкий дубль лучше потерянного напоминания.
+        due - плановое время напоминания, от него считается опоздание отправки
+        """
+        offset = Config.REMINDER_MINUTES_BEFORE
+        claimed = await self.schedule_manager.claim_reminder_delivery(
+            lesson_id, recipient, offset, Config.REMINDER_CLAIM_TIMEOUT_SECONDS
+        )
+        if not claimed:
+            if await self.schedule_manager.is_reminder_sent(lesson_id, recipient, offset):
+                logger.debug(f"Reminder for lesson {lesson_id} already delivered to {recipient}")
+                return
+            raise RuntimeError(f"Reminder for lesson {lesson_id} to {recipient} is claimed by another sender")
+        
         try:
+            await self.rate_limiter.send_message(self.bot_application.bot, chat_id, text)
+        except Exception:
+            await self.schedule_manager.release_reminder_delivery(lesson_id, recipient, offset)
+            raise
+        await self.schedule_manager.complete_reminder_delivery(lesson_id, recipient, offset)
+        
+        if due is not None:
+            REMINDER_LATENESS.observe((datetime.now(timezone.utc) - due).total_seconds(), recipient)
+        logger.info(f"Reminder sent to {recipient} {chat_id} for lesson {lesson_id}")
+    
+    async def schedule_custom_reminder(self, telegram_id: int, message: str, reminder_time: datetime):
+        """
+        Настройка индивидуального напоминания. На любой реплике задача только
+        записывается в базу, а выполняет ее лидер после очередного чтения хранилища
+        """
+        try:
+            await self.open()
             job_id = f"custom_reminder_{telegram_id}_{reminder_time.timestamp()}"
             
-            self.scheduler.add_job(
-                self.send_custom_reminder,
+            await asyncio.to_thread(
+                self.scheduler.add_job,
+                send_custom_reminder_job,
                 DateTrigger(run_date=reminder_time),
                 args=[telegram_id, message],
                 id=job_id,
@@ -111,23 +454,34 @@ class ReminderScheduler:
     async def send_custom_reminder(self, telegram_id: int, message: str):
         """Отправка напоминаний"""
         try:
-            await self.bot_application.bot.send_message(
-                chat_id=telegram_id,
-                text=f"🔔 **Напоминание**\n\n{message}"
+            await self.rate_limiter.send_message(
+                self.bot_application.bot,
+                telegram_id,
+                f"🔔 **Напоминание**\n\n{message}"
             )
             logger.info(f"Custom reminder sent to {telegram_id}")
         
         except Exception as e:
             logger.error(f"Error sending custom reminder to {telegram_id}: {e}")
     
-    def cancel_reminder(self, job_id: str) -> bool:
+    async def cancel_reminder(self, job_id: str) -> bool:
         try:
-            self.scheduler.remove_job(job_id)
+            await self.open()
+            await asyncio.to_thread(self.scheduler.remove_job, job_id)
             logger.info(f"Reminder {job_id} cancelled")
             return True
         except Exception as e:
             logger.error(f"Error cancelling reminder {job_id}: {e}")
             return False
     
-    def get_scheduled_jobs(self) -> List[str]:
-        return [job.id for job in self.scheduler.get_jobs()]
\ No newline at end of file
+    async def get_scheduled_jobs(self) -> List[str]:
+        """Идентификаторы задач из хранилища без загрузки и распаковки самих задач"""
+        await self.open()
+        return await asyncio.to_thread(self.load_job_ids)
+    
+    def load_job_ids(self) -> List[str]:
+        jobs = self.jobstore.jobs_t
+        with self.jobstore.engine.connect() as connection:
+            return list(connection.execute(
+                select(jobs.c.id).order_by(jobs.c.next_run_time)
+            ).scalars())
@@ -0,0 +1,395 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_CACHE_SIZE = 2048
+FINGERPRINT_MAX_LENGTH = 500
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<!\$)\b\d+(?:\.\d+)?\b")
+PARAMETER_LIST = re.compile(r"\(\s*(?:\?|\$\d+|%\(\w+\)s|%s)(?:\s*,\s*(?:\?|\$\d+|%\(\w+\)s|%s))+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+_fingerprints: Dict[str, str] = {}
+
+def sql_fingerprint(statement: str) -> str:
+    """Нормализованный текст запроса: литералы и списки параметров заменены на ?"""
+    fingerprint = _fingerprints.get(statement)
+    if fingerprint is None:
+        fingerprint = STRING_LITERAL.sub('?', statement)
+        fingerprint = NUMBER_LITERAL.sub('?', fingerprint)
+        fingerprint = PARAMETER_LIST.sub('(?+)', fingerprint)
+        fingerprint = WHITESPACE.sub(' ', fingerprint).strip()[:FINGERPRINT_MAX_LENGTH]
+        if len(_fingerprints) >= FINGERPRINT_CACHE_SIZE:
+            _fingerprints.clear()
+        _fingerprints[statement] = fingerprint
+    return fingerprint
+
+class Trace:
+    def __init__(self, name: str):
+        self.trace_id = secrets.token_hex(16)
+        self.name = name
+        self.spans: List["Span"] = []
+        self.finished = False
+
+class Span:
+    """Отрезок работы внутри трассы. Родитель берется из контекста задачи asyncio"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attributes', 'start_ns', 'end_ns', 'error', '_token')
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error = None
+        self._token = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = current_span_id.set(self.span_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        current_span_id.reset(self._token)
+        if exc is not None:
+            self.error = f"{type(exc).__name__}: {exc}"
+        self.trace.spans.append(self)
+        return False
+
+class NullSpan:
+    """Заглушка, когда трасса не ведется: вход и выход ничего не стоят"""
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_SPAN = NullSpan()
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+current_span_id: ContextVar[Optional[str]] = ContextVar('current_span_id', default=None)
+
+class JsonlSink:
+    """Запись трасс в файл JSONL: одна строка на трассу со всеми отрезками"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def span_record(self, span: Span, trace_start: int) -> Dict[str, Any]:
+        return {
+            'span_id': span.span_id,
+            'parent_id': span.parent_id,
+            'name': span.name,
+            'start_offset_ms': round((span.start_ns - trace_start) / 1e6, 3),
+            'duration_ms': round((span.end_ns - span.start_ns) / 1e6, 3),
+            'attributes': span.attributes,
+            'error': span.error
+        }
+
+    def record(self, trace: Trace) -> Dict[str, Any]:
+        root = trace.spans[-1]
+        return {
+            'trace_id': trace.trace_id,
+            'name': trace.name,
+            'start': datetime.fromtimestamp(root.start_ns / 1e9, timezone.utc).isoformat(),
+            'duration_ms': round((root.end_ns - root.start_ns) / 1e6, 3),
+            'attributes': root.attributes,
+            'error': root.error,
+            'spans': [self.span_record(span, root.start_ns) for span in trace.spans[:-1]]
+        }
+
+    def write(self, trace: Trace):
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(json.dumps(self.record(trace), ensure_ascii=False, default=str) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+class OtlpFileSink(JsonlSink):
+    """
+    Запись трасс в формате OTLP/JSON (как у file exporter OpenTelemetry Collector):
+    одна строка ExportTraceServiceRequest на трассу
+    """
+
+    def __init__(self, path: str, service_name: str = 'telegram-bot'):
+        super().__init__(path)
+        self.service_name = service_name
+
+    def otlp_span(self, span: Span) -> Dict[str, Any]:
+        otlp = {
+            'traceId': span.trace.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': [{'key': key, 'value': otlp_value(value)} for key, value in span.attributes.items()],
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+        }
+        if span.parent_id:
+            otlp['parentSpanId'] = span.parent_id
+        return otlp
+
+    def record(self, trace: Trace) -> Dict[str, Any]:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'bot.tracing'},
+                'spans': [self.otlp_span(span) for span in trace.spans]
+            }]
+        }]}
+
+SINKS = {
+    'jsonl': JsonlSink,
+    'otlp': OtlpFileSink,
+}
+
+class Tracer:
+    """
+    Трассировка обработки обновлений. Текущая трасса и отрезок хранятся в contextvars,
+    поэтому дочерние задачи asyncio и запросы SQLAlchemy видят родителя без явной передачи
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.sink: Optional[JsonlSink] = None
+
+    def configure(self, enabled: bool, sink: Optional[JsonlSink] = None, sample_rate: float = 1.0):
+        self.close()
+        self.enabled = enabled and sink is not None
+        self.sink = sink
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def trace(self, name: str, **attributes):
+        """
+        Корневой отрезок трассы. Внутри активной трассы становится обычным отрезком,
+        а если родительская трасса уже записана (обработчик с block=False), начинается новая
+        """
+        parent = current_trace.get()
+        if parent is not None and not parent.finished:
+            with self.span(name, **attributes) as span:
+                yield span
+            return
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield NULL_SPAN
+            return
+
+        trace = Trace(name)
+        if parent is not None:
+            attributes['parent_trace_id'] = parent.trace_id
+        trace_token = current_trace.set(trace)
+        span_token = current_span_id.set(None)
+        try:
+            with Span(trace, name, None, attributes) as root:
+                yield root
+        finally:
+            trace.finished = True
+            current_span_id.reset(span_token)
+            current_trace.reset(trace_token)
+            self.export(trace)
+
+    def span(self, name: str, **attributes):
+        trace = current_trace.get()
+        if trace is None or trace.finished:
+            return NULL_SPAN
+        return Span(trace, name, current_span_id.get(), attributes)
+
+    def record(self, name: str, duration_ns: int, **attributes) -> Optional[Span]:
+        """Добавление уже завершившегося отрезка, когда начало и конец видны в разных обратных вызовах"""
+        trace = current_trace.get()
+        if trace is None or trace.finished:
+            return None
+        span = Span(trace, name, current_span_id.get(), attributes)
+        span.end_ns = time.time_ns()
+        span.start_ns = span.end_ns - duration_ns
+        trace.spans.append(span)
+        return span
+
+    def current_trace_id(self) -> Optional[str]:
+        trace = current_trace.get()
+        return trace.trace_id if trace is not None else None
+
+    def export(self, trace: Trace):
+        try:
+            self.sink.write(trace)
+        except Exception as e:
+            logger.error(f"Error writing trace {trace.trace_id}: {e}")
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+class UpdateProfiler:
+    """
+    Выборочное профилирование обработки обновлений через cProfile. Профилировщик
+    один на процесс, поэтому в замер попадают и задачи, выполнявшиеся во время ожиданий
+    """
+
+    def __init__(self, output_dir: str = 'profiles'):
+        self.output_dir = output_dir
+        self.sample_rate = 0.0
+        self.active = False
+        self.samples = 0
+        self.stats: Optional[pstats.Stats] = None
+        self.started_at: Optional[datetime] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def start(self, sample_rate: float):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.samples = 0
+        self.stats = None
+        self.started_at = datetime.now()
+        logger.info(f"Update profiling enabled with sample rate {self.sample_rate}")
+
+    def stop(self, top: int = 15) -> Tuple[Optional[str], str]:
+        """Выключение профилирования, сохранение .pstats и краткая сводка по cumulative"""
+        self.sample_rate = 0.0
+        if self.stats is None:
+            return None, "No updates were profiled"
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{self.started_at:%Y%m%d-%H%M%S}.pstats")
+        self.stats.dump_stats(path)
+
+        output = io.StringIO()
+        self.stats.stream = output
+        self.stats.sort_stats('cumulative').print_stats(top)
+        self.stats = None
+        logger.info(f"Update profile with {self.samples} samples saved to {path}")
+        return path, output.getvalue()
+
+    def status(self) -> Dict[str, Any]:
+        return {'enabled': self.enabled, 'sample_rate': self.sample_rate, 'samples': self.samples}
+
+    @contextmanager
+    def profile(self):
+        if not self.sample_rate or self.active or random.random() >= self.sample_rate:
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        self.active = True
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.active = False
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+            self.samples += 1
+
+TRACER = Tracer()
+PROFILER = UpdateProfiler()
+
+def traced_update(name: str):
+    """Декоратор обработчика обновления: корневая трасса и выборочный профиль"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(self, update, context):
+            attributes = {'update_id': update.update_id}
+            if update.effective_chat:
+                attributes['chat_id'] = update.effective_chat.id
+            if update.callback_query:
+                attributes['callback_data'] = update.callback_query.data
+            with TRACER.trace(name, **attributes), PROFILER.profile():
+                return await handler(self, update, context)
+        return wrapper
+    return decorator
+
+class QueryTracer:
+    """Отрезки трассы по SQL запросам и журнал медленных запросов через события движка"""
+
+    def __init__(self, slow_query_ms: float = 0):
+        self.slow_query_ns = int(slow_query_ms * 1e6)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._trace_started = time.perf_counter_ns()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_trace_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter_ns() - started
+        slow = bool(self.slow_query_ns) and duration >= self.slow_query_ns
+        if not slow and current_trace.get() is None:
+            return
+
+        fingerprint = sql_fingerprint(statement)
+        span = TRACER.record('db.statement', duration, statement=fingerprint, rowcount=cursor.rowcount)
+        if slow:
+            trace_id = TRACER.current_trace_id()
+            logger.warning(
+                f"Slow query {duration / 1e6:.1f}ms{f' (trace {trace_id})' if trace_id else ''}: {fingerprint}"
+            )
+            if span is not None:
+                span.set('slow', True)
+
+    def instrument(self, engine):
+        sync_engine = getattr(engine, 'sync_engine', engine)
+        event.listen(sync_engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(sync_engine, 'after_cursor_execute', self.after_cursor_execute)
+
+class TracedRequest(HTTPXRequest):
+    """HTTP клиент Bot API, записывающий каждый вызов метода как отрезок трассы"""
+
+    async def do_request(self, url: str, method: str, request_data=None, *args, **kwargs):
+        with TRACER.span(f"telegram.{url.rsplit('/', 1)[-1]}") as span:
+            status, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+            span.set('http.status', status)
+            return status, payload
+
+def configure_tracing(enabled: bool, sink_format: str = 'jsonl', path: str = 'traces.jsonl',
+                      sample_rate: float = 1.0, profile_dir: str = 'profiles'):
+    if sink_format not in SINKS:
+        raise ValueError(f"Unknown trace sink: {sink_format}")
+    TRACER.configure(enabled, SINKS[sink_format](path) if enabled else None, sample_rate)
+    PROFILER.output_dir = profile_dir
@@ -0,0 +1,170 @@
+import abc
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Optional, Tuple, Union
+import openai
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+AudioSource = Union[str, Tuple[str, BytesIO]]
+
+def read_audio(audio: AudioSource) -> bytes:
+    if isinstance(audio, str):
+        with open(audio, 'rb') as audio_file:
+            return audio_file.read()
+    return audio[1].getvalue()
+
+def audio_size(audio: AudioSource) -> int:
+    if isinstance(audio, str):
+        return os.path.getsize(audio)
+    return audio[1].getbuffer().nbytes
+
+class TranscriptionBackend(abc.ABC):
+    """
+    Движок распознавания речи. name входит в ключ кэша расшифровок,
+    поэтому должен меняться вместе с моделью
+    """
+
+    name = 'base'
+
+    @abc.abstractmethod
+    async def transcribe(self, audio: AudioSource, language: str) -> Optional[str]:
+        ...
+
+    def close(self):
+        pass
+
+class OpenAIBackend(TranscriptionBackend):
+    """Распознавание через OpenAI Whisper API"""
+
+    def __init__(self, api_key: str, model: str = 'whisper-1'):
+        self.client = openai.AsyncOpenAI(api_key=api_key)
+        self.model = model
+        self.name = f"openai:{model}"
+
+    async def transcribe(self, audio: AudioSource, language: str) -> Optional[str]:
+        if isinstance(audio, str):
+            with open(audio, 'rb') as audio_file:
+                response = await self.client.audio.transcriptions.create(
+                    model=self.model,
+                    file=audio_file,
+                    language=language
+                )
+        else:
+            response = await self.client.audio.transcriptions.create(
+                model=self.model,
+                file=audio,
+                language=language
+            )
+        return response.text.strip()
+
+_local_model = None
+
+def _init_local_worker(model_size: str, compute_type: str, cpu_threads: int):
+    global _local_model
+    from faster_whisper import WhisperModel
+    _local_model = WhisperModel(model_size, device='cpu', compute_type=compute_type, cpu_threads=cpu_threads)
+
+def _local_transcribe(audio: Union[str, bytes], language: str) -> str:
+    source = audio if isinstance(audio, str) else BytesIO(audio)
+    segments, _ = _local_model.transcribe(source, language=language, beam_size=1, vad_filter=True)
+    return " ".join(segment.text.strip() for segment in segments).strip()
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    Локальное распознавание faster-whisper на CPU.
+    Модель загружается один раз в каждом процессе пула
+    """
+
+    def __init__(self, model_size: str = 'small', workers: int = 2,
+                 compute_type: str = 'int8', cpu_threads: int = 2):
+        self.model_size = model_size
+        self.name = f"local:{model_size}"
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_local_worker,
+            initargs=(model_size, compute_type, cpu_threads)
+        )
+
+    @staticmethod
+    def is_installed() -> bool:
+        return importlib.util.find_spec('faster_whisper') is not None
+
+    async def transcribe(self, audio: AudioSource, language: str) -> Optional[str]:
+        payload = audio if isinstance(audio, str) else audio[1].getvalue()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, _local_transcribe, payload, language)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class StubBackend(TranscriptionBackend):
+    """Детерминированная заглушка для тестов и замеров без сети и моделей"""
+
+    name = 'stub'
+
+    def __init__(self, delay: float = 0.0, delay_per_mb: float = 0.0):
+        self.delay = delay
+        self.delay_per_mb = delay_per_mb
+
+    async def transcribe(self, audio: AudioSource, language: str) -> Optional[str]:
+        if isinstance(audio, str):
+            data = await asyncio.to_thread(read_audio, audio)
+        else:
+            data = read_audio(audio)
+        delay = self.delay + self.delay_per_mb * len(data) / (1024 * 1024)
+        if delay:
+            await asyncio.sleep(delay)
+        digest = hashlib.sha1(data).hexdigest()[:8]
+        return f"[{language}] stub transcription {digest} ({len(data)} bytes)"
+
+def create_backend(name: Optional[str] = None) -> Optional[TranscriptionBackend]:
+    """
+    Выбор движка по Config.TRANSCRIPTION_BACKEND: openai, local, stub или auto
+    (OpenAI при наличии ключа, иначе локальная модель, если она установлена)
+    """
+    name = name or Config.TRANSCRIPTION_BACKEND
+    has_openai_key = Config.OPENAI_API_KEY != 'YOUR_OPENAI_API_KEY_HERE'
+
+    if name == 'auto':
+        if has_openai_key:
+            name = 'openai'
+        elif LocalWhisperBackend.is_installed():
+            name = 'local'
+        else:
+            logger.warning("No transcription backend available: set OPENAI_API_KEY or install faster-whisper")
+            return None
+
+    if name == 'openai':
+        if not has_openai_key:
+            logger.warning("OpenAI transcription backend selected but OPENAI_API_KEY is not set")
+            return None
+        backend = OpenAIBackend(Config.OPENAI_API_KEY, Config.TRANSCRIPTION_MODEL)
+    elif name == 'local':
+        if not LocalWhisperBackend.is_installed():
+            logger.warning("Local transcription backend selected but faster-whisper is not installed")
+            return None
+        backend = LocalWhisperBackend(
+            model_size=Config.LOCAL_WHISPER_MODEL,
+            workers=Config.LOCAL_WHISPER_WORKERS,
+            compute_type=Config.LOCAL_WHISPER_COMPUTE_TYPE,
+            cpu_threads=Config.LOCAL_WHISPER_CPU_THREADS
+        )
+    elif name == 'stub':
+        backend = StubBackend(
+            delay=Config.STUB_TRANSCRIPTION_DELAY_MS / 1000,
+            delay_per_mb=Config.STUB_TRANSCRIPTION_DELAY_PER_MB_MS / 1000
+        )
+    else:
+        raise ValueError(f"Unknown transcription backend: {name}")
+
+    logger.info(f"Using transcription backend {backend.name}")
+    return backend
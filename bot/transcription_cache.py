@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class TranscriptionCache:
+    """
+    Кэш расшифровок по file_unique_id Telegram, модели и языку.
+    Первый уровень - LRU в памяти, второй - файл SQLite с вытеснением по размеру
+    """
+
+    def __init__(self, path: str, memory_size: int = 1000, max_disk_bytes: int = 50 * 1024 * 1024):
+        self.memory = TTLCache(maxsize=memory_size, ttl=None)
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_hits = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS transcriptions ("
+            "cache_key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_transcriptions_last_access ON transcriptions (last_access)"
+        )
+        self.connection.commit()
+        self.disk_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM transcriptions"
+        ).fetchone()[0]
+
+    @staticmethod
+    def make_key(file_unique_id: str, model: str, language: str) -> str:
+        return f"{model}:{language}:{file_unique_id}"
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT text FROM transcriptions WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE transcriptions SET last_access = ? WHERE cache_key = ?", (time.time(), key)
+            )
+            self.connection.commit()
+            return row[0]
+
+    def _disk_set(self, key: str, text: str):
+        size = len(text.encode('utf-8')) + len(key)
+        with self.lock:
+            previous = self.connection.execute(
+                "SELECT size FROM transcriptions WHERE cache_key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO transcriptions (cache_key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time())
+            )
+            self.disk_bytes += size - (previous[0] if previous else 0)
+
+            while self.disk_bytes > self.max_disk_bytes:
+                oldest = self.connection.execute(
+                    "SELECT cache_key, size FROM transcriptions ORDER BY last_access LIMIT 100"
+                ).fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    if self.disk_bytes <= self.max_disk_bytes:
+                        break
+                    self.connection.execute("DELETE FROM transcriptions WHERE cache_key = ?", (old_key,))
+                    self.disk_bytes -= old_size
+            self.connection.commit()
+
+    async def get(self, file_unique_id: str, model: str, language: str) -> Optional[str]:
+        key = self.make_key(file_unique_id, model, language)
+        text = self.memory.get(key)
+        if text is not None:
+            return text
+
+        try:
+            text = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading transcription cache: {e}")
+            return None
+
+        if text is not None:
+            self.disk_hits += 1
+            self.memory.set(key, text)
+        return text
+
+    async def set(self, file_unique_id: str, model: str, language: str, text: str):
+        key = self.make_key(file_unique_id, model, language)
+        self.memory.set(key, text)
+        try:
+            await asyncio.to_thread(self._disk_set, key, text)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing transcription cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats.update({'disk_hits': self.disk_hits, 'disk_bytes': self.disk_bytes})
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
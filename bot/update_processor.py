@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Hashable, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка обновлений разных чатов с сохранением порядка внутри чата.
+
+    Ограничение базового класса берется до очереди чата, поэтому оно задает только
+    допустимый объем ожидающих обновлений (max_pending), а число одновременно
+    выполняемых обработчиков ограничивается отдельно (max_concurrent) уже после
+    очереди чата. Иначе один чат с потоком обновлений занял бы все слоты
+    """
+
+    def __init__(self, max_concurrent: int = 64, max_pending: int = 1024):
+        super().__init__(max_concurrent_updates=max(max_pending, max_concurrent))
+        self.max_concurrent = max_concurrent
+        self.workers: Optional[asyncio.Semaphore] = None
+        self.chat_locks: Dict[Hashable, asyncio.Lock] = {}
+        self.chat_waiting: Dict[Hashable, int] = {}
+        self.processed = 0
+
+    @staticmethod
+    def chat_key(update: object) -> Optional[Hashable]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return ('user', update.effective_user.id)
+        return None
+
+    async def initialize(self):
+        self.workers = asyncio.Semaphore(self.max_concurrent)
+
+    async def shutdown(self):
+        if self.chat_locks:
+            logger.info(f"Update processor stopped with {len(self.chat_locks)} chats still busy")
+
+    async def run(self, coroutine: Awaitable[Any]):
+        async with self.workers:
+            await coroutine
+            self.processed += 1
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        if self.workers is None:
+            await self.initialize()
+
+        key = self.chat_key(update)
+        if key is None:
+            await self.run(coroutine)
+            return
+
+        lock = self.chat_locks.get(key)
+        if lock is None:
+            lock = self.chat_locks[key] = asyncio.Lock()
+        self.chat_waiting[key] = self.chat_waiting.get(key, 0) + 1
+        try:
+            async with lock:
+                await self.run(coroutine)
+        finally:
+            self.chat_waiting[key] -= 1
+            if not self.chat_waiting[key]:
+                del self.chat_waiting[key]
+                del self.chat_locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_progress': self.current_concurrent_updates,
+            'busy_chats': len(self.chat_locks),
+            'processed': self.processed
+        }
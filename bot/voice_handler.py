@@ -1,28 +1,210 @@
 import os
+import asyncio
 import logging
 import tempfile
-from typing import Optional
-import openai
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from io import BytesIO
+from typing import Optional, Callable, Awaitable, TypeVar, AsyncIterator, List
 from telegram import Update, File
 from telegram.ext import ContextTypes
 from config import Config
+from audio_processing import AudioPreprocessor, AudioPreprocessingError, AudioChunk
+from transcription import AudioSource, TranscriptionBackend, audio_size, create_backend
+from metrics import TRANSCRIPTION_DURATION, TRANSCRIPTION_BYTES
+from tracing import TRACER, traced_update
+from transcription_cache import TranscriptionCache
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
+class TranscriptionQueueFull(Exception):
+    pass
+
+class TranscriptionQueue:
+    """
+    Очередь распознавания: не более max_concurrent задач одновременно
+    и не более max_waiting ожидающих, с уведомлением о позиции в очереди
+    """
+    
+    def __init__(self, max_concurrent: int = 2, max_waiting: int = 20):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiters = deque()
+    
+    @property
+    def depth(self) -> int:
+        return len(self.waiters)
+    
+    async def run(self, job: Callable[[], Awaitable[T]],
+                  on_position: Optional[Callable[[int], Awaitable]] = None) -> T:
+        if self.active < self.max_concurrent and not self.waiters:
+            self.active += 1
+        else:
+            if len(self.waiters) >= self.max_waiting:
+                raise TranscriptionQueueFull()
+            
+            entry = (asyncio.get_running_loop().create_future(), on_position)
+            self.waiters.append(entry)
+            self.notify(entry, len(self.waiters))
+            try:
+                await entry[0]
+            except asyncio.CancelledError:
+                if entry in self.waiters:
+                    self.waiters.remove(entry)
+                    self.notify_all()
+                elif entry[0].done() and not entry[0].cancelled():
+                    self.release()
+                raise
+        
+        try:
+            return await job()
+        finally:
+            self.release()
+    
+    def release(self):
+        """Передача освободившегося слота первому в очереди"""
+        if self.waiters:
+            future, _ = self.waiters.popleft()
+            future.set_result(None)
+            self.notify_all()
+        else:
+            self.active -= 1
+    
+    def notify_all(self):
+        for position, entry in enumerate(self.waiters, start=1):
+            self.notify(entry, position)
+    
+    @staticmethod
+    def notify(entry, position: int):
+        on_position = entry[1]
+        if on_position is not None:
+            task = asyncio.ensure_future(on_position(position))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+class BufferPool:
+    """Пул переиспользуемых буферов BytesIO для загрузки аудио в память"""
+    
+    def __init__(self, max_idle: int = 2):
+        self.max_idle = max_idle
+        self.idle = deque()
+    
+    def acquire(self) -> BytesIO:
+        return self.idle.pop() if self.idle else BytesIO()
+    
+    def release(self, buffer: BytesIO):
+        buffer.seek(0)
+        buffer.truncate()
+        if len(self.idle) < self.max_idle:
+            self.idle.append(buffer)
+
 class VoiceHandler:
-    def __init__(self):
-        self.openai_client = None
-        if Config.OPENAI_API_KEY != 'YOUR_OPENAI_API_KEY_HERE':
-            openai.api_key = Config.OPENAI_API_KEY
-            self.openai_client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
+    def __init__(self, backend: Optional[TranscriptionBackend] = None):
+        self.backend = backend or create_backend()
+        
+        self.transcription_queue = TranscriptionQueue(
+            max_concurrent=Config.TRANSCRIPTION_CONCURRENCY,
+            max_waiting=Config.TRANSCRIPTION_QUEUE_SIZE
+        )
+        self.transcription_cache = TranscriptionCache(
+            Config.TRANSCRIPTION_CACHE_PATH,
+            memory_size=Config.TRANSCRIPTION_CACHE_MEMORY_SIZE,
+            max_disk_bytes=Config.TRANSCRIPTION_CACHE_MAX_MB * 1024 * 1024
+        )
+        self.buffers = BufferPool(max_idle=Config.TRANSCRIPTION_CONCURRENCY)
+        
+        self.preprocessor = None
+        ffmpeg = AudioPreprocessor.find_ffmpeg()
+        if Config.AUDIO_PREPROCESSING and ffmpeg:
+            self.preprocessor = AudioPreprocessor(
+                ffmpeg=ffmpeg,
+                max_chunk_seconds=Config.AUDIO_CHUNK_SECONDS,
+                concurrency=Config.AUDIO_PREPROCESS_CONCURRENCY
+            )
+        elif Config.AUDIO_PREPROCESSING:
+            logger.warning("ffmpeg not found, audio preprocessing disabled")
+        self.chunk_semaphore = asyncio.Semaphore(Config.TRANSCRIPTION_CHUNK_CONCURRENCY)
 
         os.makedirs(Config.AUDIO_TEMP_DIR, exist_ok=True)
     
+    async def cached_transcription(self, file_unique_id: str) -> Optional[str]:
+        return await self.transcription_cache.get(
+            file_unique_id, self.backend.name, Config.TRANSCRIPTION_LANGUAGE
+        )
+    
+    async def remember_transcription(self, file_unique_id: str, transcription: str):
+        await self.transcription_cache.set(
+            file_unique_id, self.backend.name, Config.TRANSCRIPTION_LANGUAGE, transcription
+        )
+    
+    def close(self):
+        if self.backend:
+            self.backend.close()
+        self.transcription_cache.close()
+    
+    @asynccontextmanager
+    async def download_audio(self, context: ContextTypes.DEFAULT_TYPE, file_id: str,
+                             suffix: str) -> AsyncIterator[AudioSource]:
+        """
+        Загрузка файла из Telegram в буфер в памяти.
+        Файлы больше AUDIO_MEMORY_THRESHOLD_MB сохраняются во временный файл
+        """
+        file: File = await context.bot.get_file(file_id)
+        
+        if file.file_size is not None and file.file_size <= Config.AUDIO_MEMORY_THRESHOLD_MB * 1024 * 1024:
+            buffer = self.buffers.acquire()
+            try:
+                await file.download_to_memory(buffer)
+                buffer.seek(0)
+                yield (f"audio{suffix}", buffer)
+            finally:
+                self.buffers.release(buffer)
+            return
+        
+        with tempfile.NamedTemporaryFile(
+            suffix=suffix,
+            dir=Config.AUDIO_TEMP_DIR,
+            delete=False
+        ) as temp_file:
+            temp_path = temp_file.name
+        try:
+            await file.download_to_drive(temp_path)
+            yield temp_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    async def transcribe_queued(self, processing_msg, context: ContextTypes.DEFAULT_TYPE,
+                                file_id: str, suffix: str) -> Optional[str]:
+        """
+        Распознавание через очередь с показом позиции в сообщении о статусе.
+        Файл загружается только после получения слота, поэтому при полной очереди
+        он не скачивается, а в памяти одновременно не больше max_concurrent записей
+        """
+        queued = False
+        
+        async def show_position(position: int):
+            nonlocal queued
+            queued = True
+            await processing_msg.edit_text(f"⏳ В очереди на распознавание, позиция {position}")
+        
+        async def transcribe():
+            if queued:
+                await processing_msg.edit_text("🎤 Распознаю речь...")
+            async with self.download_audio(context, file_id, suffix) as audio:
+                return await self.transcribe_audio(audio)
+        
+        return await self.transcription_queue.run(transcribe, show_position)
+    
+    @traced_update('message.voice')
     async def handle_voice_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка входящих голосовых сообщений"""
-        if not self.openai_client:
+        if not self.backend:
             await update.message.reply_text(
-                "❌ Распознавание голоса недоступно. OpenAI API ключ не настроен."
+                "❌ Распознавание голоса недоступно. Движок распознавания не настроен."
             )
             return
         
@@ -40,20 +222,18 @@ class VoiceHandler:
                 )
                 return
 
-            file: File = await context.bot.get_file(voice.file_id)
+            transcription = await self.cached_transcription(voice.file_unique_id)
+            if transcription:
+                await processing_msg.edit_text(
+                    f"📝 **Расшифровка голосового сообщения:**\n\n{transcription}"
+                )
+                return
 
-            with tempfile.NamedTemporaryFile(
-                suffix='.ogg', 
-                dir=Config.AUDIO_TEMP_DIR, 
-                delete=False
-            ) as temp_file:
-                temp_path = temp_file.name
-                await file.download_to_drive(temp_path)
-            
             try:
-                transcription = await self.transcribe_audio(temp_path)
+                transcription = await self.transcribe_queued(processing_msg, context, voice.file_id, '.ogg')
                 
                 if transcription:
+                    await self.remember_transcription(voice.file_unique_id, transcription)
                     await processing_msg.edit_text(
                         f"📝 **Расшифровка голосового сообщения:**\n\n{transcription}"
                     )
@@ -62,9 +242,10 @@ class VoiceHandler:
                         "❌ Не удалось распознать речь. Попробуйте говорить четче или отправить текстовое сообщение."
                     )
             
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+            except TranscriptionQueueFull:
+                await processing_msg.edit_text(
+                    "⏳ Сейчас распознается слишком много сообщений. Попробуйте отправить позже."
+                )
         
         except Exception as e:
             logger.error(f"Error processing voice message: {e}")
@@ -72,26 +253,59 @@ class VoiceHandler:
                 "❌ Произошла ошибка при обработке голосового сообщения. Попробуйте еще раз."
             )
     
-    async def transcribe_audio(self, audio_path: str) -> Optional[str]:
-        """Обрабатывает аудиофайл с помощью OpenAI Whisper"""
-        try:
-            with open(audio_path, 'rb') as audio_file:
-                response = self.openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ru"
+    def should_preprocess(self, audio: AudioSource) -> bool:
+        if self.preprocessor is None:
+            return False
+        return audio_size(audio) >= Config.AUDIO_PREPROCESS_MIN_KB * 1024
+    
+    async def transcribe_chunks(self, chunks: List[AudioChunk]) -> Optional[str]:
+        """Параллельное распознавание кусков записи и склейка текста по порядку"""
+        async def transcribe_chunk(chunk: AudioChunk) -> Optional[str]:
+            async with self.chunk_semaphore:
+                return await self.backend.transcribe(
+                    (f"chunk{chunk.index}.ogg", BytesIO(chunk.data)), Config.TRANSCRIPTION_LANGUAGE
                 )
-                
-                return response.text.strip()
+        
+        started = time.perf_counter()
+        texts = await asyncio.gather(*(transcribe_chunk(chunk) for chunk in chunks))
+        logger.info(
+            f"Transcribed {len(chunks)} chunks with {self.backend.name} "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return " ".join(text for text in texts if text) or None
+    
+    async def transcribe_audio(self, audio: AudioSource) -> Optional[str]:
+        """Распознает аудио выбранным движком: путь к файлу или пара (имя, буфер)"""
+        size = audio_size(audio)
+        TRANSCRIPTION_BYTES.observe(size, self.backend.name)
+        started = time.perf_counter()
+        try:
+            with TRACER.span('transcription', backend=self.backend.name, bytes=size):
+                return await self.run_transcription(audio)
+        finally:
+            TRANSCRIPTION_DURATION.observe(time.perf_counter() - started, self.backend.name)
+    
+    async def run_transcription(self, audio: AudioSource) -> Optional[str]:
+        try:
+            if self.should_preprocess(audio):
+                try:
+                    chunks = await self.preprocessor.prepare(audio)
+                except AudioPreprocessingError as e:
+                    logger.warning(f"Audio preprocessing failed, transcribing original file: {e}")
+                else:
+                    return await self.transcribe_chunks(chunks)
+            
+            return await self.backend.transcribe(audio, Config.TRANSCRIPTION_LANGUAGE)
         
         except Exception as e:
-            logger.error(f"Error transcribing audio: {e}")
+            logger.error(f"Error transcribing audio with {self.backend.name}: {e}")
             return None
     
+    @traced_update('message.audio')
     async def handle_audio_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        if not self.openai_client:
+        if not self.backend:
             await update.message.reply_text(
-                "❌ Распознавание аудио недоступно. OpenAI API ключ не настроен."
+                "❌ Распознавание аудио недоступно. Движок распознавания не настроен."
             )
             return
         
@@ -109,7 +323,12 @@ class VoiceHandler:
                 )
                 return
 
-            file: File = await context.bot.get_file(audio.file_id)
+            transcription = await self.cached_transcription(audio.file_unique_id)
+            if transcription:
+                await processing_msg.edit_text(
+                    f"📝 **Расшифровка аудио сообщения:**\n\n{transcription}"
+                )
+                return
 
             file_extension = '.mp3'
             if audio.mime_type:
@@ -120,18 +339,13 @@ class VoiceHandler:
                 elif 'm4a' in audio.mime_type:
                     file_extension = '.m4a'
             
-            with tempfile.NamedTemporaryFile(
-                suffix=file_extension,
-                dir=Config.AUDIO_TEMP_DIR,
-                delete=False
-            ) as temp_file:
-                temp_path = temp_file.name
-                await file.download_to_drive(temp_path)
-            
             try:
-                transcription = await self.transcribe_audio(temp_path)
+                transcription = await self.transcribe_queued(
+                    processing_msg, context, audio.file_id, file_extension
+                )
                 
                 if transcription:
+                    await self.remember_transcription(audio.file_unique_id, transcription)
                     await processing_msg.edit_text(
                         f"📝 **Расшифровка аудио сообщения:**\n\n{transcription}"
                     )
@@ -140,12 +354,13 @@ class VoiceHandler:
                         "❌ Не удалось распознать речь в аудио файле."
                     )
             
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+            except TranscriptionQueueFull:
+                await processing_msg.edit_text(
+                    "⏳ Сейчас распознается слишком много сообщений. Попробуйте отправить позже."
+                )
         
         except Exception as e:
             logger.error(f"Error processing audio message: {e}")
             await update.message.reply_text(
                 "❌ Произошла ошибка при обработке аудио сообщения."
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,22 @@
+import pytest
+from models import AsyncDatabaseManager, Teacher, Student
+
+
+@pytest.fixture
+async def async_db():
+    """Пустая база SQLite в памяти со всеми таблицами"""
+    db_manager = AsyncDatabaseManager('sqlite+aiosqlite://')
+    await db_manager.init_database()
+    yield db_manager
+    await db_manager.dispose()
+
+
+@pytest.fixture
+async def people(async_db):
+    """Учитель и ученик с привязанным Telegram и включенными напоминаниями"""
+    async with async_db.get_session() as session:
+        teacher = Teacher(first_name="Анна", last_name="Иванова", login="teacher1", telegram_id=1001)
+        student = Student(first_name="Петр", last_name="Смирнов", login="student1", telegram_id=2001)
+        session.add_all([teacher, student])
+        await session.flush()
+        return {'teacher': teacher, 'student': student}
@@ -0,0 +1,75 @@
+import pytest
+from audio_processing import AudioPreprocessor, SAMPLE_RATE
+
+
+def silence_log(*events) -> str:
+    """Вывод ffmpeg silencedetect из пар ('start' | 'end', секунды) вперемешку с другими строками"""
+    lines = ["Input #0, ogg, from 'pipe:0':", "  Duration: N/A, start: 0.000000, bitrate: N/A"]
+    for kind, moment in events:
+        if kind == 'start':
+            lines.append(f"[silencedetect @ 0x55d0c8] silence_start: {moment}")
+        else:
+            lines.append(f"[silencedetect @ 0x55d0c8] silence_end: {moment} | silence_duration: 1.0")
+    lines.append("size=N/A time=00:00:10.00 bitrate=N/A speed= 412x")
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize('log, duration, expected', [
+    (silence_log(), 10.0, []),
+    (silence_log(('start', 1.5), ('end', 2.5)), 10.0, [(1.5, 2.5)]),
+    (silence_log(('start', 1.5), ('end', 2.5), ('start', 6), ('end', 7.25)), 10.0, [(1.5, 2.5), (6.0, 7.25)]),
+    (silence_log(('start', -0.01), ('end', 0.8)), 10.0, [(0.0, 0.8)]),
+    (silence_log(('start', 8)), 10.0, [(8.0, 10.0)]),
+    (silence_log(('start', 9), ('end', 10.3)), 10.0, [(9.0, 10.0)]),
+    (silence_log(('end', 2.0), ('start', 4), ('end', 5)), 10.0, [(4.0, 5.0)]),
+], ids=['no silence', 'one pause', 'two pauses', 'negative start', 'trailing silence',
+        'end past duration', 'end without start'])
+def test_parse_silences(log, duration, expected):
+    assert AudioPreprocessor.parse_silences(log, duration) == expected
+
+
+@pytest.mark.parametrize('silences, duration, expected', [
+    ([], 10.0, [(0.0, 10.0)]),
+    ([(2.0, 3.0)], 10.0, [(0.0, 2.25), (2.75, 10.0)]),
+    ([(8.0, 10.0)], 10.0, [(0.0, 8.25)]),
+    ([(0.0, 1.5)], 5.0, [(1.25, 5.0)]),
+    ([(2.0, 2.4)], 5.0, [(0.0, 5.0)]),
+    ([(0.0, 5.0)], 5.0, []),
+    ([(1.0, 2.0), (4.0, 5.0)], 6.0, [(0.0, 1.25), (1.75, 4.25), (4.75, 6.0)]),
+], ids=['no silence', 'pause in the middle', 'trailing silence', 'leading silence',
+        'pause shorter than padding', 'only silence', 'two pauses'])
+def test_speech_segments(silences, duration, expected):
+    assert AudioPreprocessor(padding=0.25).speech_segments(silences, duration) == expected
+
+
+@pytest.mark.parametrize('segments, expected', [
+    ([], []),
+    ([(0.0, 4.0), (5.0, 9.0)], [[(0.0, 4.0), (5.0, 9.0)]]),
+    ([(0.0, 6.0), (7.0, 11.0)], [[(0.0, 6.0), (7.0, 11.0)]]),
+    ([(0.0, 6.0), (7.0, 12.0)], [[(0.0, 6.0)], [(7.0, 12.0)]]),
+    ([(0.0, 10.0)], [[(0.0, 10.0)]]),
+    ([(0.0, 25.0)], [[(0.0, 10.0)], [(10.0, 20.0)], [(20.0, 25.0)]]),
+    ([(0.0, 3.0), (4.0, 16.0)], [[(0.0, 3.0)], [(4.0, 14.0)], [(14.0, 16.0)]]),
+], ids=['nothing to plan', 'fits one chunk', 'exactly at the limit', 'over the limit',
+        'one segment at the limit', 'long segment is cut', 'long segment after short one'])
+def test_plan_chunks(segments, expected):
+    assert AudioPreprocessor(max_chunk_seconds=10).plan_chunks(segments) == expected
+
+
+def test_planned_chunks_cover_speech_and_respect_limit():
+    preprocessor = AudioPreprocessor(padding=0.25, max_chunk_seconds=30)
+    silences = [(start, start + 1.0) for start in range(7, 600, 7)]
+    segments = preprocessor.speech_segments(silences, 600.0)
+
+    chunks = preprocessor.plan_chunks(segments)
+
+    assert all(sum(end - start for start, end in chunk) <= 30 for chunk in chunks)
+    assert [segment for chunk in chunks for segment in chunk] == segments
+
+
+def test_slice_pcm_joins_segments():
+    pcm = bytes(range(256)) * (SAMPLE_RATE * 4 // 256)
+
+    sliced = AudioPreprocessor.slice_pcm(pcm, [(0.0, 0.5), (1.0, 1.25)])
+
+    assert sliced == pcm[:SAMPLE_RATE] + pcm[SAMPLE_RATE * 2:int(SAMPLE_RATE * 2.5)]
@@ -0,0 +1,138 @@
+"""
+Замеры основных запросов на синтетической базе SyntheticDataGenerator.
+В обычном прогоне pytest каждый замер выполняется один раз как тест, а сохранение
+базовой линии на своей машине и сравнение с ней описаны в README
+"""
+import asyncio
+import random
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from sqlalchemy import func, select
+from models import (
+    DatabaseManager, AsyncDatabaseManager, AsyncScheduleManager, AsyncUser,
+    Teacher, Student, Schedule, UserSession
+)
+from populate_test_data import SyntheticDataGenerator
+
+TEACHERS = 50
+STUDENTS = 500
+LESSONS = 20_000
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    """Синтетическая база с фиксированным seed и выборки пользователей для запросов"""
+    database_url = f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}"
+    db_manager = DatabaseManager(database_url)
+    generated = SyntheticDataGenerator(db_manager, chunk_size=5000).generate(TEACHERS, STUDENTS, LESSONS)
+    with db_manager.engine.connect() as connection:
+        busiest_teacher = connection.execute(
+            select(Schedule.teacher_id).group_by(Schedule.teacher_id).order_by(func.count().desc()).limit(1)
+        ).scalar_one()
+        student_logins = list(connection.scalars(select(Student.login)))
+        telegram_ids = list(connection.scalars(select(UserSession.telegram_id)))
+    db_manager.engine.dispose()
+
+    runner = asyncio.Runner()
+    async_db = AsyncDatabaseManager(database_url)
+    yield {
+        'url': database_url,
+        'generated': generated,
+        'run': runner.run,
+        'schedule': AsyncScheduleManager(async_db),
+        'users': AsyncUser(async_db),
+        'busiest_teacher': busiest_teacher,
+        'student_logins': student_logins,
+        'telegram_ids': telegram_ids
+    }
+    runner.run(async_db.dispose())
+    runner.close()
+
+
+def count_rows(database_url: str, model, *conditions) -> int:
+    db_manager = DatabaseManager(database_url)
+    with db_manager.engine.connect() as connection:
+        count = connection.scalar(select(func.count()).select_from(model).where(*conditions))
+    db_manager.engine.dispose()
+    return count
+
+
+def test_dataset_shape(dataset):
+    url = dataset['url']
+    assert dataset['generated'] == {'teachers': TEACHERS, 'students': STUDENTS, 'lessons': LESSONS}
+    assert count_rows(url, Teacher) == TEACHERS
+    assert count_rows(url, Student) == STUDENTS
+    assert count_rows(url, Schedule) == LESSONS
+    assert count_rows(url, UserSession) == len(dataset['telegram_ids'])
+    assert 0.5 < len(dataset['telegram_ids']) / (TEACHERS + STUDENTS) < 0.7
+    cancelled = count_rows(url, Schedule, Schedule.status == 'cancelled')
+    assert 0.04 < cancelled / LESSONS < 0.2
+    busiest = count_rows(url, Schedule, Schedule.teacher_id == dataset['busiest_teacher'])
+    assert busiest > 3 * LESSONS / TEACHERS
+
+
+def test_generation_is_deterministic(tmp_path):
+    snapshots = []
+    for name in ('a', 'b'):
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / f'{name}.db'}")
+        SyntheticDataGenerator(db_manager, seed=7).generate(5, 20, 300, days=30)
+        with db_manager.engine.connect() as connection:
+            snapshots.append(connection.execute(
+                select(Schedule.teacher_id, Schedule.student_id, Schedule.lesson_date, Schedule.lesson_time,
+                       Schedule.subject, Schedule.status).order_by(Schedule.id)
+            ).all())
+        db_manager.engine.dispose()
+    assert snapshots[0] == snapshots[1]
+    assert all(abs((row.lesson_date - date.today()).days) <= 30 for row in snapshots[0])
+
+
+def test_schedule_view_busiest_teacher(benchmark, dataset):
+    lessons = benchmark(lambda: dataset['run'](
+        dataset['schedule'].get_user_schedule(dataset['busiest_teacher'], 'teacher')
+    ))
+    assert len(lessons) > LESSONS / TEACHERS
+
+
+def test_schedule_view_teacher_today(benchmark, dataset):
+    rng = random.Random(1)
+    lessons = benchmark(lambda: dataset['run'](
+        dataset['schedule'].get_user_schedule(rng.randint(1, TEACHERS), 'teacher', date.today())
+    ))
+    assert all(lesson['lesson_date'] == date.today().isoformat() for lesson in lessons)
+
+
+def test_schedule_page(benchmark, dataset):
+    page = benchmark(lambda: dataset['run'](
+        dataset['schedule'].get_user_schedule_page(dataset['busiest_teacher'], 'teacher', limit=10)
+    ))
+    assert len(page['lessons']) == 10
+
+
+def test_reminder_window(benchmark, dataset):
+    now = datetime.now(timezone.utc)
+    lessons = benchmark(lambda: dataset['run'](
+        dataset['schedule'].get_reminder_window(now, now + timedelta(hours=6))
+    ))
+    assert all(now < lesson['lesson_start'] <= now + timedelta(hours=6) for lesson in lessons)
+
+
+def test_upcoming_lessons(benchmark, dataset):
+    lessons = benchmark(lambda: dataset['run'](dataset['schedule'].get_upcoming_lessons(reminder_minutes=120)))
+    now = datetime.now(timezone.utc)
+    assert all(now - timedelta(minutes=1) < lesson['lesson_start'] <= now + timedelta(minutes=120) for lesson in lessons)
+
+
+def test_authenticate_user(benchmark, dataset):
+    rng = random.Random(2)
+    user = benchmark(lambda: dataset['run'](
+        dataset['users'].authenticate_user(rng.choice(dataset['student_logins']))
+    ))
+    assert user['user_type'] == 'student'
+
+
+def test_get_user_by_telegram_id(benchmark, dataset):
+    rng = random.Random(3)
+    user = benchmark(lambda: dataset['run'](
+        dataset['users'].get_user_by_telegram_id(rng.choice(dataset['telegram_ids']))
+    ))
+    assert user is not None
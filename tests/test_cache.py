@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+import pytest
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import cache
+from cache import TTLCache, RenderCache
+from models import ScheduleChange
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(monotonic=fake.monotonic))
+    return fake
+
+
+def test_entry_expires_after_ttl(clock):
+    evicted = []
+    ttl_cache = TTLCache(maxsize=10, ttl=30, on_evict=lambda key, value: evicted.append(key))
+    ttl_cache.set('a', 1)
+
+    clock.now += 29.9
+    assert ttl_cache.get('a') == 1
+
+    clock.now += 0.1
+    assert ttl_cache.get('a', 'missing') == 'missing'
+    assert 'a' not in ttl_cache
+    assert evicted == ['a']
+    assert ttl_cache.stats()['hits'] == 1
+    assert ttl_cache.stats()['misses'] == 1
+
+
+def test_set_restarts_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=30)
+    ttl_cache.set('a', 1)
+    clock.now += 20
+    ttl_cache.set('a', 2)
+    clock.now += 20
+    assert ttl_cache.get('a') == 2
+
+
+def test_no_ttl_never_expires(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=None)
+    ttl_cache.set('a', 1)
+    clock.now += 10 ** 9
+    assert ttl_cache.get('a') == 1
+
+
+def test_least_recently_used_is_evicted(clock):
+    evicted = []
+    ttl_cache = TTLCache(maxsize=3, ttl=None, on_evict=lambda key, value: evicted.append((key, value)))
+    for key in 'abc':
+        ttl_cache.set(key, key.upper())
+
+    ttl_cache.get('a')
+    ttl_cache.set('d', 'D')
+
+    assert evicted == [('b', 'B')]
+    assert len(ttl_cache) == 3
+    assert [key for key in 'abcd' if key in ttl_cache] == ['a', 'c', 'd']
+
+
+def test_replace_and_invalidate_report_eviction(clock):
+    evicted = []
+    ttl_cache = TTLCache(maxsize=3, ttl=None, on_evict=lambda key, value: evicted.append((key, value)))
+    ttl_cache.set('a', 1)
+    ttl_cache.set('a', 2)
+    ttl_cache.invalidate('a')
+    ttl_cache.invalidate('a')
+
+    assert evicted == [('a', 1), ('a', 2)]
+    assert len(ttl_cache) == 0
+
+
+def markup(text: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(text, callback_data='view_schedule')]])
+
+
+def test_invalidate_user_drops_only_that_users_views(clock):
+    render_cache = RenderCache(maxsize=10, ttl=None)
+    render_cache.set('teacher', 1, 'schedule', "Уроки", markup("Обновить"))
+    render_cache.set('teacher', 1, 'page:1', "Страница", None)
+    render_cache.set('student', 1, 'schedule', "Уроки ученика", None)
+    render_cache.set('teacher', 2, 'schedule', "Другой учитель", None)
+
+    render_cache.invalidate_user('teacher', 1)
+
+    assert render_cache.get('teacher', 1, 'schedule') is None
+    assert render_cache.get('teacher', 1, 'page:1') is None
+    assert render_cache.get('student', 1, 'schedule') == ("Уроки ученика", None)
+    assert render_cache.get('teacher', 2, 'schedule') == ("Другой учитель", None)
+    assert ('teacher', 1) not in render_cache.user_keys
+    assert render_cache.stats()['invalidations'] == 2
+    assert render_cache.size_bytes == len("Уроки ученика".encode()) + len("Другой учитель".encode())
+
+
+def test_schedule_change_invalidates_teacher_and_student(clock):
+    render_cache = RenderCache(maxsize=10, ttl=None)
+    render_cache.set('teacher', 1, 'schedule', "Учитель", None)
+    render_cache.set('student', 2, 'schedule', "Ученик", None)
+    render_cache.set('student', 3, 'schedule', "Другой ученик", None)
+
+    render_cache.on_schedule_change(ScheduleChange(10, 1, 2, None))
+
+    assert render_cache.get('teacher', 1, 'schedule') is None
+    assert render_cache.get('student', 2, 'schedule') is None
+    assert render_cache.get('student', 3, 'schedule') == ("Другой ученик", None)
+    assert render_cache.stats()['users'] == 1
+
+
+def test_index_follows_expiry_and_eviction(clock):
+    render_cache = RenderCache(maxsize=2, ttl=60)
+    render_cache.set('teacher', 1, 'schedule', "a", None)
+    render_cache.set('teacher', 1, 'page:1', "b", None)
+    render_cache.set('teacher', 2, 'schedule', "c", None)
+
+    assert render_cache.user_keys[('teacher', 1)] == {('teacher', 1, 'page:1')}
+
+    clock.now += 60
+    assert render_cache.get('teacher', 1, 'page:1') is None
+    assert ('teacher', 1) not in render_cache.user_keys
+    assert render_cache.size_bytes == 1
+
+    render_cache.set('teacher', 2, 'schedule', "cc", None)
+    assert render_cache.size_bytes == 2
+    assert render_cache.user_keys == {('teacher', 2): {('teacher', 2, 'schedule')}}
@@ -0,0 +1,36 @@
+from datetime import date, time
+import pytest
+from handlers import SCHEDULE_PAGE_PREFIX, encode_schedule_cursor, decode_schedule_cursor
+
+
+def lesson(lesson_id: int) -> dict:
+    return {'id': lesson_id, 'lesson_date': '2026-10-19', 'lesson_time': '09:30:00'}
+
+
+@pytest.mark.parametrize('direction', ['next', 'prev'])
+@pytest.mark.parametrize('lesson_id', [7, 2_147_483_647, -12])
+def test_cursor_round_trip(direction, lesson_id):
+    data = encode_schedule_cursor(direction, lesson(lesson_id))
+
+    assert data.startswith(f"{SCHEDULE_PAGE_PREFIX}:")
+    assert len(data.encode('utf-8')) <= 64
+    assert decode_schedule_cursor(data) == ((date(2026, 10, 19), time(9, 30), lesson_id), direction)
+
+
+def test_missing_cursor_starts_from_first_page():
+    assert decode_schedule_cursor(None) == (None, 'next')
+    assert decode_schedule_cursor('') == (None, 'next')
+
+
+@pytest.mark.parametrize('data', [
+    f"{SCHEDULE_PAGE_PREFIX}:n:20261019:093000",
+    f"{SCHEDULE_PAGE_PREFIX}:n:20261019:093000:7:1",
+    f"{SCHEDULE_PAGE_PREFIX}:x:20261019:093000:7",
+    f"{SCHEDULE_PAGE_PREFIX}:n:20261319:093000:7",
+    f"{SCHEDULE_PAGE_PREFIX}:n:20261019:256100:7",
+    f"{SCHEDULE_PAGE_PREFIX}:n:20261019:093000:7 OR 1=1",
+    "other:n:20261019:093000:7",
+    "view_schedule",
+])
+def test_tampered_cursor_is_rejected(data):
+    assert decode_schedule_cursor(data) == (None, 'next')
@@ -0,0 +1,146 @@
+from datetime import date, time
+import pytest
+from sqlalchemy import select
+from importer import ScheduleImporter, read_ics
+from models import Schedule, ImportCheckpoint
+
+
+CALENDAR = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+DTSTART:20260302T060000Z
+DURATION:PT1H30M
+SUMMARY:Алгебра\\, повторение
+X-TEACHER-LOGIN:teacher1
+ATTENDEE;CN=Петр:mailto:student1@example.com
+END:VEVENT
+BEGIN:VEVENT
+DTSTART;TZID=Europe/Berlin:20260303T100000
+DTEND;TZID=Europe/Berlin:20260303T104500
+SUMMARY:Геометрия очень дл
+ инное название
+ORGANIZER;CN=teacher1:mailto:teacher1@example.com
+X-STUDENT-LOGIN:student1
+STATUS:CANCELLED
+END:VEVENT
+BEGIN:VEVENT
+DTSTART;VALUE=DATE:20260304
+X-TEACHER-LOGIN:teacher1
+X-STUDENT-LOGIN:student1
+END:VEVENT
+BEGIN:VEVENT
+DTSTART:20260305T150000
+RRULE:FREQ=WEEKLY
+X-TEACHER-LOGIN:teacher1
+X-STUDENT-LOGIN:student1
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def write_csv(path, lines):
+    path.write_text("teacher_login,student_login,lesson_date,lesson_time,subject,duration_minutes\n"
+                    + "".join(f"{line}\n" for line in lines), encoding='utf-8')
+    return str(path)
+
+
+async def imported_lessons(async_db):
+    async with async_db.get_session() as session:
+        result = await session.execute(select(Schedule).order_by(Schedule.lesson_date, Schedule.lesson_time))
+        return result.scalars().all()
+
+
+async def test_csv_rows_are_imported_and_bad_rows_rejected(async_db, people, tmp_path):
+    path = write_csv(tmp_path / 'lessons.csv', [
+        "teacher1,student1,2026-03-02,16:00,Математика,45",
+        "teacher1,student1,2026-03-03,17:30:00,,",
+        "teacher1,student1,2026-02-30,16:00,Математика,45",
+        "teacher1,student1,2026-03-04,16:00,Математика,0",
+    ])
+
+    result = await ScheduleImporter(async_db).run(path)
+
+    assert result['imported'] == 2
+    assert result['rejected'] == 2
+    lessons = await imported_lessons(async_db)
+    assert [(lesson.lesson_date, lesson.lesson_time, lesson.subject, lesson.duration_minutes) for lesson in lessons] == [
+        (date(2026, 3, 2), time(16, 0), "Математика", 45),
+        (date(2026, 3, 3), time(17, 30), None, 60),
+    ]
+    assert all(lesson.teacher_id == people['teacher'].id for lesson in lessons)
+    assert all(lesson.lesson_start_utc is not None for lesson in lessons)
+
+
+async def test_unknown_logins_are_rejected(async_db, people, tmp_path):
+    path = write_csv(tmp_path / 'lessons.csv', [
+        "teacher1,student1,2026-03-02,16:00,Математика,45",
+        "nobody,student1,2026-03-02,17:00,Математика,45",
+        "teacher1,nobody,2026-03-02,18:00,Математика,45",
+        "student1,teacher1,2026-03-02,19:00,Математика,45",
+    ])
+
+    result = await ScheduleImporter(async_db).run(path)
+
+    assert (result['imported'], result['rejected']) == (1, 3)
+    assert [lesson.lesson_time for lesson in await imported_lessons(async_db)] == [time(16, 0)]
+
+
+def test_ics_events_are_converted_to_local_lessons(tmp_path):
+    path = tmp_path / 'lessons.ics'
+    path.write_text(CALENDAR, encoding='utf-8')
+
+    records = dict(read_ics(str(path)))
+
+    assert records[1] == {
+        'lesson_date': '2026-03-02', 'lesson_time': '09:00', 'duration_minutes': '90',
+        'subject': "Алгебра, повторение", 'teacher_login': 'teacher1', 'student_login': 'student1'
+    }
+    assert records[2] == {
+        'lesson_date': '2026-03-03', 'lesson_time': '12:00', 'duration_minutes': '45',
+        'subject': "Геометрия очень длинное название", 'teacher_login': 'teacher1',
+        'student_login': 'student1', 'status': 'cancelled'
+    }
+    assert 'error' in records[3]
+    assert 'error' in records[4]
+
+
+async def test_ics_file_is_imported(async_db, people, tmp_path):
+    path = tmp_path / 'lessons.ics'
+    path.write_text(CALENDAR, encoding='utf-8')
+
+    result = await ScheduleImporter(async_db).run(str(path))
+
+    assert (result['imported'], result['rejected']) == (2, 2)
+    assert [lesson.status for lesson in await imported_lessons(async_db)] == ['scheduled', 'cancelled']
+
+
+async def test_import_resumes_from_checkpoint_after_failure(async_db, people, tmp_path, monkeypatch):
+    path = write_csv(tmp_path / 'lessons.csv', [
+        f"teacher1,student1,2026-03-{day:02d},16:00,Математика,45" for day in range(1, 8)
+    ])
+    importer = ScheduleImporter(async_db, chunk_size=2)
+    write_chunk = importer.write_chunk
+    written = []
+
+    async def failing_write_chunk(source, rows, position, imported, rejected):
+        if len(written) == 2:
+            raise ConnectionError("database is gone")
+        written.append(position)
+        await write_chunk(source, rows, position, imported, rejected)
+
+    monkeypatch.setattr(importer, 'write_chunk', failing_write_chunk)
+    with pytest.raises(ConnectionError):
+        await importer.run(path)
+    assert len(await imported_lessons(async_db)) == 4
+
+    result = await ScheduleImporter(async_db, chunk_size=2).run(path)
+
+    assert (result['imported'], result['skipped']) == (3, 4)
+    lessons = await imported_lessons(async_db)
+    assert [lesson.lesson_date.day for lesson in lessons] == list(range(1, 8))
+    async with async_db.get_session() as session:
+        checkpoint = (await session.execute(select(ImportCheckpoint))).scalar_one()
+    assert (checkpoint.position, checkpoint.imported, checkpoint.finished) == (7, 7, True)
+
+    again = await ScheduleImporter(async_db, chunk_size=2).run(path)
+    assert again['imported'] == 0
+    assert len(await imported_lessons(async_db)) == 7
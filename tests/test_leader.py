@@ -0,0 +1,99 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from sqlalchemy import select
+from leader import LeaderElector
+from models import AsyncLeaseStore, SchedulerLease, utc_naive
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+class RoleLog:
+    """Обработчики смены роли, запоминающие момент каждого вызова"""
+
+    def __init__(self):
+        self.events = []
+
+    def elected(self):
+        self.events.append(('elected', time.monotonic()))
+
+    def demoted(self):
+        self.events.append(('demoted', time.monotonic()))
+
+
+def elector(async_db, holder: str, ttl: float, log: RoleLog) -> LeaderElector:
+    return LeaderElector(async_db, 'reminders', holder=holder, ttl=ttl,
+                         on_elected=log.elected, on_demoted=log.demoted)
+
+
+async def test_lease_is_taken_over_only_after_it_expires(async_db):
+    leases = AsyncLeaseStore(async_db)
+
+    assert await leases.try_acquire('reminders', 'a', ttl=0.3)
+    assert not await leases.try_acquire('reminders', 'b', ttl=0.3)
+    assert await leases.try_acquire('reminders', 'a', ttl=0.3)
+
+    await asyncio.sleep(0.35)
+    assert await leases.try_acquire('reminders', 'b', ttl=0.3)
+    assert not await leases.try_acquire('reminders', 'a', ttl=0.3)
+
+
+async def test_follower_takes_over_after_leader_crash(async_db):
+    first_log, second_log = RoleLog(), RoleLog()
+    first = elector(async_db, 'a', 0.6, first_log)
+    second = elector(async_db, 'b', 0.6, second_log)
+    first.start()
+    await wait_for(lambda: first.is_leader)
+    second.start()
+    await asyncio.sleep(0.3)
+    assert not second.is_leader
+
+    first.task.cancel()
+    crashed_at = time.monotonic()
+    try:
+        await wait_for(lambda: second.is_leader)
+    finally:
+        await second.stop()
+
+    assert second_log.events[0][0] == 'elected'
+    assert second_log.events[0][1] - crashed_at < 0.6 + second.renew_interval + 0.1
+
+
+async def test_leader_steps_down_on_database_error_before_lease_expires(async_db):
+    log = RoleLog()
+    leader = elector(async_db, 'a', 0.6, log)
+    leader.start()
+    await wait_for(lambda: leader.is_leader)
+
+    async def broken_acquire(name, holder, ttl):
+        raise ConnectionError("database is gone")
+
+    leader.leases.try_acquire = broken_acquire
+    try:
+        await wait_for(lambda: not leader.is_leader)
+    finally:
+        await leader.stop()
+
+    demoted_at = log.events[-1][1]
+    assert [event for event, _ in log.events] == ['elected', 'demoted']
+    assert demoted_at < leader.renewed_at + leader.ttl
+
+
+async def test_stop_releases_lease_for_next_replica(async_db):
+    log = RoleLog()
+    leader = elector(async_db, 'a', 30, log)
+    leader.start()
+    await wait_for(lambda: leader.is_leader)
+
+    await leader.stop()
+
+    assert [event for event, _ in log.events] == ['elected', 'demoted']
+    async with async_db.get_session() as session:
+        lease = (await session.execute(select(SchedulerLease))).scalar_one()
+    assert lease.expires_at <= utc_naive(datetime.now(timezone.utc))
+    assert await AsyncLeaseStore(async_db).try_acquire('reminders', 'b', ttl=30)
@@ -0,0 +1,321 @@
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone
+import pytest
+import pytz
+from sqlalchemy import event, select
+from cache import RenderCache
+from config import Config
+from models import (
+    AsyncScheduleManager, DatabaseManager, EngineProfile, RecurringLesson, Schedule, ScheduleManager,
+    Student, Teacher, User, add_schedule_listener, remove_schedule_listener,
+    lesson_start_utc, reminder_lesson, upcoming_query
+)
+
+
+@contextmanager
+def count_statements(db_manager):
+    """Список SQL-запросов, выполненных движком внутри блока"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_manager.engine.sync_engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+async def schedule(async_db, people):
+    """Расписание с разовыми уроками, правилом и отмененной датой правила"""
+    manager = AsyncScheduleManager(async_db)
+    teacher_id, student_id = people['teacher'].id, people['student'].id
+    today = date.today()
+    for offset in range(5):
+        await manager.add_lesson(teacher_id, student_id, today + timedelta(days=offset), time(12, 0), "Математика")
+    rule_id = await manager.add_recurring_lesson(
+        teacher_id, student_id, range(7), time(9, 0), "Английский", today - timedelta(days=7)
+    )
+    await manager.cancel_recurring_occurrence(rule_id, today + timedelta(days=2))
+    return manager
+
+
+@pytest.mark.parametrize('user_type', ['teacher', 'student'])
+async def test_schedule_view_is_one_statement(async_db, people, schedule, user_type):
+    user_id = people[user_type].id
+    today = date.today()
+
+    with count_statements(async_db) as statements:
+        day = await schedule.get_user_schedule(user_id, user_type, today + timedelta(days=1))
+    assert len(statements) == 1
+    assert [lesson['subject'] for lesson in day] == ["Английский", "Математика"]
+
+    with count_statements(async_db) as statements:
+        cancelled_day = await schedule.get_user_schedule(user_id, user_type, today + timedelta(days=2))
+    assert len(statements) == 1
+    assert [lesson['subject'] for lesson in cancelled_day] == ["Математика"]
+
+    with count_statements(async_db) as statements:
+        full = await schedule.get_user_schedule(user_id, user_type)
+    assert len(statements) == 1
+    assert len(full) == 5 + 7 + Config.RECURRING_HORIZON_DAYS
+    keys = [(lesson['lesson_date'], lesson['lesson_time'], lesson['id']) for lesson in full]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize('user_type', ['teacher', 'student'])
+async def test_schedule_page_is_one_statement(async_db, people, schedule, user_type):
+    user_id = people[user_type].id
+    full = await schedule.get_user_schedule(user_id, user_type)
+    today = date.today().isoformat()
+    upcoming = [lesson for lesson in full if lesson['lesson_date'] >= today]
+
+    with count_statements(async_db) as statements:
+        page = await schedule.get_user_schedule_page(user_id, user_type, limit=4)
+    assert len(statements) == 1
+    assert page['lessons'] == upcoming[:4]
+    assert page['has_prev'] and page['has_next']
+
+    last = page['lessons'][-1]
+    cursor = (date.fromisoformat(last['lesson_date']), time.fromisoformat(last['lesson_time']), last['id'])
+    with count_statements(async_db) as statements:
+        following = await schedule.get_user_schedule_page(user_id, user_type, cursor, 'next', 4)
+    assert len(statements) == 1
+    assert following['lessons'] == upcoming[4:8]
+
+    first = following['lessons'][0]
+    cursor = (date.fromisoformat(first['lesson_date']), time.fromisoformat(first['lesson_time']), first['id'])
+    with count_statements(async_db) as statements:
+        back = await schedule.get_user_schedule_page(user_id, user_type, cursor, 'prev', 4)
+    assert len(statements) == 1
+    assert back['lessons'] == page['lessons']
+
+
+async def test_schedule_view_without_rules_is_one_statement(async_db, people):
+    manager = AsyncScheduleManager(async_db)
+    await manager.add_lesson(people['teacher'].id, people['student'].id, date.today(), time(12, 0), "Математика")
+
+    with count_statements(async_db) as statements:
+        lessons = await manager.get_user_schedule(people['student'].id, 'student')
+    assert len(statements) == 1
+    assert lessons[0]['teacher_first_name'] == "Анна"
+
+
+async def test_reminder_window_is_one_statement(async_db, people):
+    manager = AsyncScheduleManager(async_db)
+    tz = pytz.timezone(Config.TIMEZONE)
+    now = datetime.now(timezone.utc)
+    for hours in range(1, 6):
+        start = (now + timedelta(hours=hours)).astimezone(tz)
+        await manager.add_lesson(people['teacher'].id, people['student'].id, start.date(), start.time(), "Математика")
+
+    with count_statements(async_db) as statements:
+        lessons = await manager.get_reminder_window(now, now + timedelta(hours=6))
+    assert len(statements) == 1
+    assert len(lessons) == 5
+
+
+async def test_materialization_invalidates_cached_pages(async_db, people):
+    manager = AsyncScheduleManager(async_db)
+    tz = pytz.timezone(Config.TIMEZONE)
+    now = datetime.now(timezone.utc)
+    start = (now + timedelta(hours=1)).astimezone(tz)
+    async with async_db.get_session() as session:
+        session.add(RecurringLesson(
+            teacher_id=people['teacher'].id, student_id=people['student'].id, weekdays=127, interval_weeks=1,
+            lesson_time=start.time().replace(microsecond=0), subject="Английский",
+            start_date=start.date() - timedelta(days=7)
+        ))
+
+    render_cache = RenderCache(maxsize=10, ttl=None)
+    add_schedule_listener(render_cache.on_schedule_change)
+    try:
+        for user_type in ('teacher', 'student'):
+            render_cache.set(user_type, people[user_type].id, 'page', "Расписание", None)
+        render_cache.set('student', 999, 'page', "Чужое расписание", None)
+
+        assert await manager.materialize_window(now, now + timedelta(hours=6)) == 1
+    finally:
+        remove_schedule_listener(render_cache.on_schedule_change)
+
+    assert render_cache.get('teacher', people['teacher'].id, 'page') is None
+    assert render_cache.get('student', people['student'].id, 'page') is None
+    assert render_cache.get('student', 999, 'page') == ("Чужое расписание", None)
+
+
+async def test_repeated_materialization_reports_nothing(async_db, people):
+    manager = AsyncScheduleManager(async_db)
+    now = datetime.now(timezone.utc)
+    await manager.add_recurring_lesson(
+        people['teacher'].id, people['student'].id, range(7),
+        (now + timedelta(hours=1)).astimezone(pytz.timezone(Config.TIMEZONE)).time().replace(microsecond=0),
+        "Английский", date.today() - timedelta(days=7)
+    )
+    changes = []
+    add_schedule_listener(changes.append)
+    try:
+        assert await manager.materialize_window(now, now + timedelta(hours=6)) == 0
+    finally:
+        remove_schedule_listener(changes.append)
+    assert changes == []
+
+
+@pytest.mark.parametrize('zone, lesson_date, lesson_time, expected', [
+    ('Europe/Moscow', date(2026, 3, 2), time(10, 0), datetime(2026, 3, 2, 7, 0)),
+    ('Asia/Vladivostok', date(2026, 3, 2), time(0, 30), datetime(2026, 3, 1, 14, 30)),
+    ('America/New_York', date(2026, 3, 7), time(23, 30), datetime(2026, 3, 8, 4, 30)),
+    ('America/New_York', date(2026, 3, 8), time(9, 0), datetime(2026, 3, 8, 13, 0)),
+    ('America/New_York', date(2026, 10, 31), time(9, 0), datetime(2026, 10, 31, 13, 0)),
+    ('America/New_York', date(2026, 11, 1), time(9, 0), datetime(2026, 11, 1, 14, 0)),
+], ids=['moscow', 'after local midnight', 'before spring dst', 'after spring dst',
+        'before autumn dst', 'after autumn dst'])
+async def test_lesson_start_utc_follows_schedule_timezone(async_db, people, monkeypatch,
+                                                          zone, lesson_date, lesson_time, expected):
+    monkeypatch.setattr(Config, 'TIMEZONE', zone)
+    assert lesson_start_utc(lesson_date, lesson_time) == expected
+
+    await AsyncScheduleManager(async_db).add_lesson(
+        people['teacher'].id, people['student'].id, lesson_date, lesson_time, "Математика"
+    )
+    async with async_db.get_session() as session:
+        stored = (await session.execute(select(Schedule.lesson_start_utc))).scalar_one()
+    assert stored == expected
+
+
+async def upcoming_subjects(async_db, now: datetime, reminder_minutes: int = 15):
+    async with async_db.get_session() as session:
+        rows = await session.execute(upcoming_query(reminder_minutes, now).order_by(Schedule.lesson_start_utc))
+        return [reminder_lesson(row)['subject'] for row in rows]
+
+
+@pytest.mark.parametrize('zone, now, lessons, expected', [
+    (
+        'Asia/Vladivostok', datetime(2026, 3, 1, 14, 20, tzinfo=timezone.utc),
+        [(date(2026, 3, 1), time(23, 50), 'started'), (date(2026, 3, 2), time(0, 30), 'soon'),
+         (date(2026, 3, 1), time(0, 30), 'day before'), (date(2026, 3, 2), time(0, 40), 'later')],
+        ['soon']
+    ),
+    (
+        'America/New_York', datetime(2026, 3, 8, 6, 50, tzinfo=timezone.utc),
+        [(date(2026, 3, 8), time(1, 55), 'before switch'), (date(2026, 3, 8), time(3, 0), 'after switch'),
+         (date(2026, 3, 8), time(3, 20), 'later')],
+        ['before switch', 'after switch']
+    ),
+    (
+        'America/New_York', datetime(2026, 11, 1, 5, 0, tzinfo=timezone.utc),
+        [(date(2026, 11, 1), time(1, 10), 'repeated hour')],
+        []
+    ),
+    (
+        'America/New_York', datetime(2026, 11, 1, 6, 0, tzinfo=timezone.utc),
+        [(date(2026, 11, 1), time(1, 10), 'repeated hour'), (date(2026, 11, 1), time(2, 0), 'after switch')],
+        ['repeated hour']
+    ),
+    (
+        'America/New_York', datetime(2026, 11, 1, 6, 55, tzinfo=timezone.utc),
+        [(date(2026, 11, 1), time(2, 0), 'after switch'), (date(2026, 11, 1), time(2, 15), 'later')],
+        ['after switch']
+    ),
+], ids=['local midnight', 'spring dst gap', 'first pass of repeated hour', 'repeated hour in standard time',
+         'after autumn dst'])
+async def test_upcoming_lessons_window_in_schedule_timezone(async_db, people, monkeypatch,
+                                                            zone, now, lessons, expected):
+    monkeypatch.setattr(Config, 'TIMEZONE', zone)
+    manager = AsyncScheduleManager(async_db)
+    for lesson_date, lesson_time, subject in lessons:
+        await manager.add_lesson(people['teacher'].id, people['student'].id, lesson_date, lesson_time, subject)
+
+    assert await upcoming_subjects(async_db, now) == expected
+
+
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size')
+
+
+@pytest.fixture
+def sqlite_settings(monkeypatch):
+    """Значения, отличные от настроек SQLite по умолчанию, чтобы было видно, откуда взялась PRAGMA"""
+    monkeypatch.setattr(Config, 'SQLITE_SYNCHRONOUS', 'OFF')
+    monkeypatch.setattr(Config, 'SQLITE_BUSY_TIMEOUT_MS', 1234)
+    monkeypatch.setattr(Config, 'SQLITE_CACHE_SIZE_KB', 2048)
+    monkeypatch.setattr(Config, 'SQLITE_MMAP_SIZE_MB', 16)
+
+
+def read_pragmas(connection, names=SQLITE_PRAGMAS):
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+@pytest.mark.parametrize('profile, expected', [
+    ('tuned', {'journal_mode': 'wal', 'synchronous': 0, 'busy_timeout': 1234,
+               'cache_size': -2048, 'mmap_size': 16 * 1024 * 1024}),
+    ('default', {'journal_mode': 'delete', 'synchronous': 2, 'busy_timeout': 5000,
+                 'cache_size': -2000, 'mmap_size': 0}),
+])
+def test_engine_profile_pragmas_on_sqlite_file(tmp_path, sqlite_settings, profile, expected):
+    engine = EngineProfile(profile).create_engine(f"sqlite:///{tmp_path / 'bot.db'}")
+    try:
+        for _ in range(2):
+            with engine.connect() as connection:
+                assert read_pragmas(connection) == expected
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.parametrize('profile, expected', [
+    ('tuned', {'journal_mode': 'memory', 'synchronous': 0, 'busy_timeout': 1234, 'cache_size': -2048}),
+    ('default', {'journal_mode': 'memory', 'synchronous': 2, 'busy_timeout': 5000, 'cache_size': -2000}),
+])
+async def test_engine_profile_pragmas_on_async_memory_database(sqlite_settings, profile, expected):
+    engine = EngineProfile(profile).create_async_engine('sqlite+aiosqlite://')
+    try:
+        async with engine.connect() as connection:
+            assert await connection.run_sync(read_pragmas, list(expected)) == expected
+    finally:
+        await engine.dispose()
+
+
+def test_engine_profile_pool_options_apply_to_postgresql_only():
+    url = 'postgresql+asyncpg://bot:secret@db/bot'
+
+    assert EngineProfile('tuned').engine_options(url) == {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        'pool_pre_ping': Config.DB_POOL_PRE_PING,
+        'pool_recycle': Config.DB_POOL_RECYCLE_SECONDS,
+        'pool_timeout': Config.DB_POOL_TIMEOUT_SECONDS
+    }
+    assert EngineProfile('default').engine_options(url) == {}
+    assert EngineProfile('tuned').engine_options('sqlite:///bot.db') == {}
+    with pytest.raises(ValueError):
+        EngineProfile('fast')
+
+
+def test_sync_wrappers_delegate_to_async_managers(tmp_path):
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}")
+    with db_manager.get_session() as session:
+        teacher = Teacher(first_name="Анна", last_name="Иванова", login="teacher1")
+        student = Student(first_name="Петр", last_name="Смирнов", login="student1")
+        session.add_all([teacher, student])
+        session.flush()
+        teacher_id, student_id = teacher.id, student.id
+    users = User(db_manager)
+    schedule = ScheduleManager(db_manager)
+    try:
+        assert users.authenticate_user("teacher1")['user_type'] == 'teacher'
+        assert users.authenticate_user("nobody") is None
+        assert users.bind_telegram_id("teacher1", 1001, 'teacher')
+        assert users.update_reminder_setting(1001, False)
+        assert users.get_user_by_telegram_id(1001)['reminder_enabled'] is False
+
+        lesson_date = date.today() + timedelta(days=1)
+        assert schedule.add_lesson(teacher_id, student_id, lesson_date, time(12, 0), "Математика")
+        [lesson] = schedule.get_user_schedule(student_id, 'student', lesson_date)
+        assert lesson['subject'] == "Математика"
+        assert schedule.update_lesson_status(lesson['id'], 'cancelled')
+        assert schedule.get_upcoming_lessons() == []
+    finally:
+        users.close()
+        schedule.close()
+        db_manager.engine.dispose()
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date
+import pytest
+from persistence import DatabasePersistence
+
+
+class RecordingStore:
+    """Обертка над AsyncStateStore, запоминающая каждую пачку записи"""
+
+    def __init__(self, store, failures: int = 0):
+        self.store = store
+        self.failures = failures
+        self.batches = []
+
+    async def save_many(self, changes):
+        self.batches.append(dict(changes))
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database is gone")
+        await self.store.save_many(changes)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def recording_persistence(async_db, failures: int = 0) -> DatabasePersistence:
+    persistence = DatabasePersistence(async_db)
+    persistence.store = RecordingStore(persistence.store, failures)
+    return persistence
+
+
+async def test_updates_in_one_interval_are_written_as_one_batch(async_db):
+    persistence = recording_persistence(async_db)
+
+    for user_id in range(20):
+        await persistence.update_user_data(user_id, {'step': user_id})
+    await persistence.update_chat_data(5, {'lang': 'ru'})
+    await persistence.update_conversation('add_lesson', (5, 5), 2)
+    await persistence.flush()
+
+    assert len(persistence.store.batches) == 1
+    assert len(persistence.store.batches[0]) == 22
+    assert persistence.writes == 1
+    assert await persistence.store.load('user', '7') == '{"step": 7}'
+    assert await persistence.store.load_scope('conversation:add_lesson') == {'[5, 5]': '2'}
+
+
+async def test_unchanged_data_is_not_written_again(async_db):
+    persistence = recording_persistence(async_db)
+    await persistence.update_user_data(1, {'step': 1, 'name': "Анна"})
+    await persistence.flush()
+
+    await persistence.update_user_data(1, {'name': "Анна", 'step': 1})
+    await persistence.flush()
+
+    assert len(persistence.store.batches) == 1
+    assert persistence.skipped == 1
+    assert persistence.dirty == {}
+
+
+async def test_data_loaded_from_database_is_not_written_back(async_db):
+    await DatabasePersistence(async_db).store.save_many({('user', '3'): '{"step": 2}'})
+    persistence = recording_persistence(async_db)
+
+    user_data = {}
+    await persistence.refresh_user_data(3, user_data)
+    assert user_data == {'step': 2}
+    await persistence.update_user_data(3, user_data)
+    await persistence.flush()
+
+    assert persistence.store.batches == []
+
+
+async def test_cleared_data_is_deleted(async_db):
+    persistence = recording_persistence(async_db)
+    await persistence.update_user_data(4, {'step': 1})
+    await persistence.flush()
+
+    await persistence.update_user_data(4, {})
+    await persistence.flush()
+
+    assert persistence.store.batches[-1] == {('user', '4'): None}
+    assert await persistence.store.load('user', '4') is None
+
+
+async def test_failed_batch_is_kept_for_the_next_write(async_db):
+    persistence = recording_persistence(async_db, failures=1)
+    await persistence.update_user_data(1, {'step': 1})
+    await asyncio.sleep(0)
+    await persistence.flush_task
+
+    assert persistence.dirty == {('user', '1'): '{"step": 1}'}
+    await persistence.update_user_data(2, {'step': 2})
+    await persistence.flush()
+
+    assert len(persistence.store.batches) == 2
+    assert set(persistence.store.batches[1]) == {('user', '1'), ('user', '2')}
+    assert persistence.dirty == {}
+
+
+async def test_value_without_json_form_is_rejected(async_db):
+    persistence = recording_persistence(async_db)
+
+    with pytest.raises(TypeError):
+        await persistence.update_user_data(5, {'lesson_date': date(2026, 3, 2)})
+    await persistence.flush()
+
+    assert persistence.store.batches == []
+    assert persistence.dirty == {}
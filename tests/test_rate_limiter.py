@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from telegram.error import RetryAfter
+import rate_limiter
+from rate_limiter import TokenBucket, TelegramRateLimiter
+
+
+class FakeClock:
+    """
+    Время для rate_limiter: sleep сдвигает часы мгновенно и запоминает задержку.
+    Как и настоящий sleep, он всегда занимает хотя бы немного времени
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += max(delay, 1e-6)
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=fake.monotonic))
+    monkeypatch.setattr(rate_limiter, 'asyncio', SimpleNamespace(
+        Lock=asyncio.Lock, Semaphore=asyncio.Semaphore, sleep=fake.sleep
+    ))
+    return fake
+
+
+async def test_burst_up_to_capacity_then_waits(clock):
+    bucket = TokenBucket(rate=1, capacity=5)
+
+    for _ in range(5):
+        await bucket.acquire()
+    assert clock.sleeps == []
+
+    await bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(1.0, abs=1e-4)
+
+
+async def test_refill_is_proportional_to_elapsed_time(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    for _ in range(4):
+        await bucket.acquire()
+
+    clock.now += 1.0
+    await bucket.acquire()
+    await bucket.acquire()
+    assert clock.sleeps == []
+
+    await bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(0.5, abs=1e-4)
+
+
+async def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=3)
+    for _ in range(3):
+        await bucket.acquire()
+    assert not bucket.is_idle()
+
+    clock.now += 60
+    assert bucket.is_idle()
+    for _ in range(3):
+        await bucket.acquire()
+    assert clock.sleeps == []
+    await bucket.acquire()
+    assert sum(clock.sleeps) == pytest.approx(0.1, abs=1e-4)
+
+
+async def test_steady_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    started = clock.now
+
+    for _ in range(11):
+        await bucket.acquire()
+
+    assert clock.now - started == pytest.approx(5.0, abs=1e-3)
+
+
+async def test_retry_after_pauses_and_resends(clock):
+    calls = []
+
+    class Bot:
+        async def send_message(self, chat_id, text, **kwargs):
+            calls.append(clock.now)
+            if len(calls) == 1:
+                raise RetryAfter(3)
+            return 'message'
+
+    limiter = TelegramRateLimiter(global_rate=30, per_chat_rate=100)
+
+    assert await limiter.send_message(Bot(), 42, "hi") == 'message'
+    assert limiter.retry_after_count == 1
+    assert limiter.sent == 1
+    assert calls[1] - calls[0] >= 3
+    assert limiter.stats()['queue_depth'] == 0
@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+import pytz
+from telegram.error import NetworkError
+from config import Config
+from models import AsyncScheduleManager
+from scheduler import ReminderEngine, ReminderScheduler
+
+
+class FlakyRateLimiter:
+    """Отправитель, у которого первые failures отправок падают с сетевой ошибкой"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = []
+        self.sent = []
+
+    async def send_message(self, bot, chat_id, text, **kwargs):
+        self.attempts.append((datetime.now(timezone.utc), chat_id))
+        if self.failures:
+            self.failures -= 1
+            raise NetworkError("connection reset")
+        self.sent.append(chat_id)
+
+    def stats(self):
+        return {}
+
+
+class WindowStub:
+    def __init__(self, lessons):
+        self.lessons = lessons
+
+    async def materialize_window(self, window_start, window_end):
+        return 0
+
+    async def get_reminder_window(self, window_start, window_end, reminder_minutes=15):
+        return list(self.lessons)
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+async def test_failed_send_is_retried_before_lesson_starts(async_db, people, monkeypatch):
+    monkeypatch.setattr(Config, 'REMINDER_RETRY_SECONDS', 0.05)
+    tz = pytz.timezone(Config.TIMEZONE)
+    lesson_start = (datetime.now(timezone.utc) + timedelta(minutes=5)).replace(microsecond=0)
+    local_start = lesson_start.astimezone(tz)
+    await AsyncScheduleManager(async_db).add_lesson(
+        people['teacher'].id, people['student'].id, local_start.date(), local_start.time(), "Математика"
+    )
+
+    limiter = FlakyRateLimiter(failures=1)
+    reminders = ReminderScheduler(SimpleNamespace(bot=None), async_db, rate_limiter=limiter, database_url='sqlite://')
+    await reminders.start()
+    try:
+        await wait_for(lambda: len(limiter.sent) == 2)
+    finally:
+        await reminders.close()
+
+    assert sorted(limiter.sent) == [1001, 2001]
+    assert len(limiter.attempts) == 3
+    failed_chat = limiter.attempts[0][1]
+    retried_at = next(moment for moment, chat_id in limiter.attempts[1:] if chat_id == failed_chat)
+    assert retried_at < lesson_start - timedelta(minutes=4)
+
+
+async def test_retries_are_bounded():
+    lesson = {'id': 1, 'lesson_start': datetime.now(timezone.utc) + timedelta(minutes=5)}
+    calls = []
+
+    async def always_fail(lesson):
+        calls.append(lesson['id'])
+        return False
+
+    engine = ReminderEngine(WindowStub([lesson]), always_fail, retry_seconds=0.01, max_retries=3)
+    engine.start()
+    try:
+        await wait_for(lambda: len(calls) == 4)
+        await asyncio.sleep(0.2)
+    finally:
+        await engine.stop()
+
+    assert len(calls) == 4
+    assert engine.attempts == {}
+
+
+def test_no_retry_after_lesson_start():
+    now = datetime.now(timezone.utc)
+    engine = ReminderEngine(WindowStub([]), None, retry_seconds=60)
+    lesson = {'id': 1, 'lesson_start': now + timedelta(seconds=30)}
+
+    assert engine.schedule_retry(lesson, now) is False
+    assert engine.heap == []
+
+
+async def test_job_added_by_follower_fires_on_leader(async_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CUSTOM_REMINDER_POLL_SECONDS', 0.1)
+    database_url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    leader_sender = FlakyRateLimiter(failures=0)
+    follower_sender = FlakyRateLimiter(failures=0)
+    leader = ReminderScheduler(SimpleNamespace(bot=None), async_db, leader_sender, database_url)
+    follower = ReminderScheduler(SimpleNamespace(bot=None), async_db, follower_sender, database_url)
+
+    await leader.start()
+    await follower.open()
+    try:
+        await asyncio.sleep(0.05)
+        job_id = await follower.schedule_custom_reminder(
+            3001, "Сдать домашнее задание", datetime.now(timezone.utc) + timedelta(seconds=0.3)
+        )
+        assert job_id is not None
+        await wait_for(lambda: leader_sender.sent == [3001])
+    finally:
+        await follower.close()
+        await leader.close()
+
+    assert follower_sender.attempts == []
+    assert await leader.get_scheduled_jobs() == []
+
+
+async def test_refresh_keeps_retry_backoff():
+    now = datetime.now(timezone.utc)
+    lesson = {'id': 1, 'lesson_start': now + timedelta(minutes=10)}
+    engine = ReminderEngine(WindowStub([lesson]), None, retry_seconds=60)
+    await engine.refresh(now)
+    assert engine.pop_due(now) == [lesson]
+
+    assert engine.schedule_retry(lesson, now)
+    await engine.refresh(now + timedelta(seconds=1))
+
+    assert engine.pop_due(now + timedelta(seconds=59)) == []
+    assert engine.heap[0][0] == now + timedelta(seconds=60)
+    assert engine.pop_due(now + timedelta(seconds=60)) == [lesson]
+
+
+async def add_soon_lesson(async_db, people) -> int:
+    tz = pytz.timezone(Config.TIMEZONE)
+    local_start = (datetime.now(timezone.utc) + timedelta(minutes=30)).astimezone(tz).replace(microsecond=0)
+    manager = AsyncScheduleManager(async_db)
+    await manager.add_lesson(
+        people['teacher'].id, people['student'].id, local_start.date(), local_start.time(), "Математика"
+    )
+    now = datetime.now(timezone.utc)
+    lessons = await manager.get_reminder_window(now, now + timedelta(hours=1))
+    return lessons[0]['id']
+
+
+async def test_claim_left_by_crash_is_reclaimed_after_timeout(async_db, people, monkeypatch):
+    lesson_id = await add_soon_lesson(async_db, people)
+    manager = AsyncScheduleManager(async_db)
+    assert await manager.claim_reminder_delivery(lesson_id, 'teacher', 15)
+
+    now = datetime.now(timezone.utc)
+    window = await manager.get_reminder_window(now, now + timedelta(hours=1))
+    assert window[0]['teacher_delivered'] is False
+
+    sender = FlakyRateLimiter(failures=0)
+    reminders = ReminderScheduler(SimpleNamespace(bot=None), async_db, sender, 'sqlite://')
+    try:
+        with pytest.raises(RuntimeError):
+            await reminders.deliver_once(lesson_id, 'teacher', 1001, "text")
+        assert sender.attempts == []
+
+        monkeypatch.setattr(Config, 'REMINDER_CLAIM_TIMEOUT_SECONDS', 0)
+        await asyncio.sleep(0.01)
+        await reminders.deliver_once(lesson_id, 'teacher', 1001, "text")
+        await reminders.deliver_once(lesson_id, 'teacher', 1001, "text")
+    finally:
+        await reminders.close()
+
+    assert sender.sent == [1001]
+    assert await manager.is_reminder_sent(lesson_id, 'teacher', 15)
+    window = await manager.get_reminder_window(now, now + timedelta(hours=1))
+    assert window[0]['teacher_delivered'] is True
@@ -0,0 +1,156 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine, text
+import tracing
+from tracing import JsonlSink, QueryTracer, Tracer, sql_fingerprint
+
+
+class MemorySink(JsonlSink):
+    """Приемник, который складывает записи трасс в список вместо файла"""
+
+    def __init__(self):
+        super().__init__(path='')
+        self.records = []
+
+    def write(self, trace):
+        self.records.append(self.record(trace))
+
+
+@pytest.fixture
+def sink():
+    return MemorySink()
+
+
+@pytest.fixture
+def tracer(sink):
+    tracer = Tracer()
+    tracer.configure(True, sink)
+    return tracer
+
+
+@pytest.mark.parametrize('statement, expected', [
+    ("SELECT * FROM teachers WHERE login = 'anna'", "SELECT * FROM teachers WHERE login = ?"),
+    ("SELECT * FROM t WHERE note = 'it''s' AND id = 42", "SELECT * FROM t WHERE note = ? AND id = ?"),
+    ("SELECT price * 1.5 FROM t1", "SELECT price * ? FROM t1"),
+    ("SELECT id FROM schedule WHERE id IN (?, ?, ?)", "SELECT id FROM schedule WHERE id IN (?+)"),
+    ("SELECT id FROM schedule WHERE id IN ($1, $2)", "SELECT id FROM schedule WHERE id IN (?+)"),
+    ("SELECT id FROM schedule WHERE id IN (%(id_1)s, %(id_2)s)", "SELECT id FROM schedule WHERE id IN (?+)"),
+    ("SELECT id\n  FROM schedule\n\tWHERE teacher_id = ?", "SELECT id FROM schedule WHERE teacher_id = ?"),
+    ("INSERT INTO t (a, b) VALUES (?, ?)", "INSERT INTO t (a, b) VALUES (?+)"),
+    ("SELECT id FROM t WHERE id = ?", "SELECT id FROM t WHERE id = ?"),
+    ("SELECT id FROM t WHERE id = $1 LIMIT 10", "SELECT id FROM t WHERE id = $1 LIMIT ?"),
+], ids=['string', 'escaped quote', 'decimal and identifier digits', 'qmark list', 'numeric list',
+        'pyformat list', 'whitespace', 'values list', 'single parameter', 'numeric parameter'])
+def test_sql_fingerprint(statement, expected):
+    assert sql_fingerprint(statement) == expected
+
+
+def test_sql_fingerprint_is_truncated():
+    statement = "SELECT " + ", ".join(f"column_{name}" for name in "abcdefghijklmnopqrstuvwxyz" * 4) + " FROM t"
+    assert len(sql_fingerprint(statement)) == tracing.FINGERPRINT_MAX_LENGTH
+
+
+def test_spans_nest_under_current_span(tracer, sink):
+    with tracer.trace('command.start', update_id=1) as root:
+        with tracer.span('auth') as auth:
+            with tracer.span('db.lookup'):
+                pass
+        with tracer.span('reply'):
+            pass
+
+    [record] = sink.records
+    assert record['name'] == 'command.start'
+    assert record['attributes'] == {'update_id': 1}
+    spans = {span['name']: span for span in record['spans']}
+    assert set(spans) == {'auth', 'db.lookup', 'reply'}
+    assert spans['auth']['parent_id'] == root.span_id
+    assert spans['db.lookup']['parent_id'] == auth.span_id
+    assert spans['reply']['parent_id'] == root.span_id
+
+
+async def test_child_tasks_inherit_parent_span(tracer, sink):
+    async def child(name):
+        await asyncio.sleep(0)
+        with tracer.span(name):
+            await asyncio.sleep(0)
+
+    with tracer.trace('voice') as root:
+        with tracer.span('transcribe') as transcribe:
+            await asyncio.gather(child('chunk.0'), child('chunk.1'))
+
+    spans = sink.records[0]['spans']
+    assert {span['name']: span['parent_id'] for span in spans} == {
+        'chunk.0': transcribe.span_id, 'chunk.1': transcribe.span_id, 'transcribe': root.span_id
+    }
+
+
+def test_nested_trace_becomes_span(tracer, sink):
+    with tracer.trace('callback') as root:
+        with tracer.trace('command.help'):
+            pass
+
+    [record] = sink.records
+    assert [(span['name'], span['parent_id']) for span in record['spans']] == [('command.help', root.span_id)]
+
+
+async def test_task_outliving_its_trace_starts_a_linked_trace(tracer, sink):
+    started = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def background():
+        started.set()
+        await finish.wait()
+        with tracer.trace('voice.background'):
+            with tracer.span('transcribe'):
+                pass
+
+    with tracer.trace('voice') as root:
+        task = asyncio.create_task(background())
+        await started.wait()
+    finish.set()
+    await task
+
+    first, second = sink.records
+    assert first['trace_id'] == root.trace.trace_id
+    assert second['name'] == 'voice.background'
+    assert second['attributes']['parent_trace_id'] == first['trace_id']
+    assert [span['name'] for span in second['spans']] == ['transcribe']
+
+
+def test_error_is_recorded_on_span(tracer, sink):
+    with pytest.raises(ValueError):
+        with tracer.trace('command.start'):
+            with tracer.span('auth'):
+                raise ValueError("bad login")
+
+    record = sink.records[0]
+    assert record['error'] == "ValueError: bad login"
+    assert record['spans'][0]['error'] == "ValueError: bad login"
+
+
+def test_unsampled_trace_records_nothing(sink):
+    tracer = Tracer()
+    tracer.configure(True, sink, sample_rate=0.0)
+    with tracer.trace('command.start') as root:
+        with tracer.span('auth') as span:
+            span.set('user', 1)
+    assert root is tracing.NULL_SPAN
+    assert tracer.span('outside') is tracing.NULL_SPAN
+    assert sink.records == []
+
+
+def test_query_spans_carry_fingerprints(sink, monkeypatch):
+    tracer = Tracer()
+    tracer.configure(True, sink)
+    monkeypatch.setattr(tracing, 'TRACER', tracer)
+    engine = create_engine('sqlite://')
+    QueryTracer().instrument(engine)
+
+    with tracer.trace('command.start') as root:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1 WHERE 'a' = :value"), {'value': 'a'})
+    engine.dispose()
+
+    [span] = [span for span in sink.records[0]['spans'] if span['name'] == 'db.statement']
+    assert span['parent_id'] == root.span_id
+    assert span['attributes']['statement'] == "SELECT ? WHERE ? = ?"
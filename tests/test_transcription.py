@@ -0,0 +1,107 @@
+from io import BytesIO
+import pytest
+from config import Config
+from transcription import (
+    LocalWhisperBackend, OpenAIBackend, StubBackend, TranscriptionBackend, create_backend
+)
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    """Настройка ключа OpenAI и наличия faster-whisper для выбора движка"""
+    def configure(openai_key: bool, local_installed: bool):
+        monkeypatch.setattr(Config, 'OPENAI_API_KEY', 'sk-test' if openai_key else 'YOUR_OPENAI_API_KEY_HERE')
+        monkeypatch.setattr(LocalWhisperBackend, 'is_installed', staticmethod(lambda: local_installed))
+    return configure
+
+
+@pytest.mark.parametrize('openai_key, local_installed, expected', [
+    (True, True, OpenAIBackend),
+    (True, False, OpenAIBackend),
+    (False, True, LocalWhisperBackend),
+    (False, False, None),
+])
+def test_auto_prefers_openai_then_local_model(environment, openai_key, local_installed, expected):
+    environment(openai_key, local_installed)
+
+    backend = create_backend('auto')
+
+    if expected is None:
+        assert backend is None
+    else:
+        assert type(backend) is expected
+        backend.close()
+
+
+@pytest.mark.parametrize('name, openai_key, local_installed', [
+    ('openai', False, True),
+    ('local', True, False),
+])
+def test_explicit_backend_without_its_requirements_is_disabled(environment, name, openai_key, local_installed):
+    environment(openai_key, local_installed)
+
+    assert create_backend(name) is None
+
+
+def test_backend_is_read_from_config(environment, monkeypatch):
+    environment(False, False)
+    monkeypatch.setattr(Config, 'TRANSCRIPTION_BACKEND', 'stub')
+
+    assert isinstance(create_backend(), StubBackend)
+
+
+def test_unknown_backend_is_an_error():
+    with pytest.raises(ValueError):
+        create_backend('whisper.cpp')
+
+
+def test_backend_names_include_model(environment):
+    environment(True, True)
+
+    openai_backend = OpenAIBackend('sk-test', 'whisper-1')
+    local_backend = LocalWhisperBackend(model_size='base', workers=1)
+    try:
+        assert openai_backend.name == 'openai:whisper-1'
+        assert local_backend.name == 'local:base'
+    finally:
+        local_backend.close()
+
+
+def test_backend_without_transcribe_cannot_be_created():
+    class Incomplete(TranscriptionBackend):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+async def test_stub_is_deterministic_for_memory_and_file_audio(tmp_path):
+    data = b'OggS' + bytes(range(256)) * 40
+    path = tmp_path / 'voice.ogg'
+    path.write_bytes(data)
+    backend = StubBackend()
+
+    from_memory = await backend.transcribe(('voice.ogg', BytesIO(data)), 'ru')
+    from_file = await backend.transcribe(str(path), 'ru')
+    other = await backend.transcribe(('voice.ogg', BytesIO(data + b'!')), 'ru')
+
+    assert from_memory == from_file
+    assert from_memory.startswith('[ru] stub transcription ')
+    assert f"({len(data)} bytes)" in from_memory
+    assert other != from_memory
+    assert (await backend.transcribe(str(path), 'en')).startswith('[en] ')
+
+
+async def test_stub_delay_grows_with_audio_size(monkeypatch):
+    delays = []
+
+    async def fake_sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr('transcription.asyncio.sleep', fake_sleep)
+    backend = StubBackend(delay=0.1, delay_per_mb=0.5)
+
+    await backend.transcribe(('voice.ogg', BytesIO(b'x' * 1024 * 1024)), 'ru')
+    await backend.transcribe(('voice.ogg', BytesIO(b'x' * 2 * 1024 * 1024)), 'ru')
+
+    assert delays == pytest.approx([0.6, 1.1])
@@ -0,0 +1,92 @@
+import itertools
+from types import SimpleNamespace
+import pytest
+import transcription_cache
+from transcription_cache import TranscriptionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Монотонные отметки last_access, чтобы порядок вытеснения не зависел от разрешения часов"""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(transcription_cache, 'time', SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def open_cache(tmp_path, **kwargs) -> TranscriptionCache:
+    return TranscriptionCache(str(tmp_path / 'transcriptions.db'), **kwargs)
+
+
+async def test_disk_serves_entries_missing_from_memory(tmp_path):
+    cache = open_cache(tmp_path)
+    await cache.set('file1', 'openai:whisper-1', 'ru', "Привет")
+    cache.close()
+
+    reopened = open_cache(tmp_path)
+    try:
+        assert await reopened.get('file1', 'openai:whisper-1', 'ru') == "Привет"
+        assert await reopened.get('file1', 'openai:whisper-1', 'ru') == "Привет"
+        assert reopened.disk_hits == 1
+        assert reopened.stats()['hits'] == 1
+    finally:
+        reopened.close()
+
+
+async def test_entry_evicted_from_memory_is_read_from_disk(tmp_path):
+    cache = open_cache(tmp_path, memory_size=1)
+    try:
+        await cache.set('file1', 'stub', 'ru', "первая")
+        await cache.set('file2', 'stub', 'ru', "вторая")
+
+        assert await cache.get('file1', 'stub', 'ru') == "первая"
+        assert cache.disk_hits == 1
+    finally:
+        cache.close()
+
+
+@pytest.mark.parametrize('model, language', [
+    ('openai:whisper-1', 'en'),
+    ('local:small', 'ru'),
+    ('local:small', 'en'),
+])
+async def test_key_includes_model_and_language(tmp_path, model, language):
+    cache = open_cache(tmp_path)
+    try:
+        await cache.set('file1', 'openai:whisper-1', 'ru', "Привет")
+
+        assert await cache.get('file1', model, language) is None
+        assert await cache.get('file1', 'openai:whisper-1', 'ru') == "Привет"
+    finally:
+        cache.close()
+
+
+async def test_least_recently_read_entries_are_evicted_by_size(tmp_path, clock):
+    entry_size = len("x" * 100) + len(TranscriptionCache.make_key('file1', 'stub', 'ru'))
+    cache = open_cache(tmp_path, memory_size=1, max_disk_bytes=2 * entry_size)
+    try:
+        await cache.set('file1', 'stub', 'ru', "x" * 100)
+        await cache.set('file2', 'stub', 'ru', "x" * 100)
+        assert await cache.get('file1', 'stub', 'ru') is not None
+        await cache.set('file3', 'stub', 'ru', "x" * 100)
+        assert cache.disk_bytes == 2 * entry_size
+    finally:
+        cache.close()
+
+    reopened = open_cache(tmp_path, max_disk_bytes=2 * entry_size)
+    try:
+        assert reopened.disk_bytes == 2 * entry_size
+        assert await reopened.get('file1', 'stub', 'ru') is not None
+        assert await reopened.get('file2', 'stub', 'ru') is None
+        assert await reopened.get('file3', 'stub', 'ru') is not None
+    finally:
+        reopened.close()
+
+
+async def test_replacing_entry_keeps_size_accounting(tmp_path):
+    cache = open_cache(tmp_path)
+    try:
+        await cache.set('file1', 'stub', 'ru', "x" * 100)
+        await cache.set('file1', 'stub', 'ru', "x" * 10)
+
+        assert cache.disk_bytes == 10 + len(TranscriptionCache.make_key('file1', 'stub', 'ru'))
+    finally:
+        cache.close()
@@ -0,0 +1,70 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+from telegram import Chat, Message, Update
+from update_processor import PerChatUpdateProcessor
+
+
+def chat_update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(chat_id, Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, datetime.now(timezone.utc), chat, text=str(update_id)))
+
+
+async def test_updates_of_one_chat_run_in_order_without_overlap():
+    processor = PerChatUpdateProcessor(max_concurrent=4, max_pending=100)
+    rng = random.Random(15)
+    started = {}
+    finished = {}
+    running = set()
+    peak = 0
+
+    async def handle(chat_id: int, seq: int):
+        nonlocal peak
+        assert chat_id not in running
+        running.add(chat_id)
+        peak = max(peak, len(running))
+        started.setdefault(chat_id, []).append(seq)
+        await asyncio.sleep(rng.uniform(0, 0.005))
+        running.discard(chat_id)
+        finished.setdefault(chat_id, []).append(seq)
+
+    await processor.initialize()
+    tasks = []
+    for seq in range(10):
+        for chat_id in (1, 2, 3, 4, 5, 6):
+            update = chat_update(seq * 10 + chat_id, chat_id)
+            tasks.append(asyncio.create_task(processor.process_update(update, handle(chat_id, seq))))
+    await asyncio.gather(*tasks)
+
+    for chat_id in (1, 2, 3, 4, 5, 6):
+        assert started[chat_id] == list(range(10))
+        assert finished[chat_id] == list(range(10))
+    assert 1 < peak <= 4
+    assert processor.stats() == {'in_progress': 0, 'busy_chats': 0, 'processed': 60}
+    assert processor.chat_waiting == {}
+
+
+async def test_busy_chat_does_not_block_other_chats():
+    processor = PerChatUpdateProcessor(max_concurrent=2, max_pending=10)
+    release = asyncio.Event()
+    done = []
+
+    async def slow():
+        await release.wait()
+        done.append('slow')
+
+    async def fast(name: str):
+        done.append(name)
+
+    await processor.initialize()
+    blocked = asyncio.create_task(processor.process_update(chat_update(1, 1), slow()))
+    queued = asyncio.create_task(processor.process_update(chat_update(2, 1), fast('same chat')))
+    await asyncio.wait_for(processor.process_update(chat_update(3, 2), fast('other chat')), 1)
+
+    assert done == ['other chat']
+    assert processor.stats()['busy_chats'] == 1
+
+    release.set()
+    await asyncio.gather(blocked, queued)
+    assert done == ['other chat', 'slow', 'same chat']
+    assert processor.chat_locks == {}
@@ -0,0 +1,150 @@
+import asyncio
+import os
+from types import SimpleNamespace
+import pytest
+from config import Config
+from voice_handler import VoiceHandler
+
+
+class BlockingBackend:
+    """Движок распознавания, который ждет сигнала перед ответом"""
+    name = 'blocking'
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = 0
+
+    async def transcribe(self, audio, language):
+        self.started += 1
+        await self.release.wait()
+        return "текст"
+
+    def close(self):
+        pass
+
+
+class FakeBot:
+    def __init__(self):
+        self.downloads = []
+
+    async def get_file(self, file_id):
+        async def download_to_memory(buffer):
+            self.downloads.append(file_id)
+            buffer.write(b'OggS' + b'\0' * 100)
+        return SimpleNamespace(file_size=104, download_to_memory=download_to_memory)
+
+
+class StatusMessage:
+    def __init__(self):
+        self.texts = []
+
+    async def edit_text(self, text, **kwargs):
+        self.texts.append(text)
+
+
+def voice_update(file_id: str, status: StatusMessage):
+    async def reply_text(text, **kwargs):
+        status.texts.append(text)
+        return status
+
+    message = SimpleNamespace(
+        voice=SimpleNamespace(file_id=file_id, file_unique_id=f"u-{file_id}", file_size=104),
+        reply_text=reply_text
+    )
+    return SimpleNamespace(update_id=1, effective_chat=None, callback_query=None, message=message)
+
+
+@pytest.fixture
+def voice_handler(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'TRANSCRIPTION_CACHE_PATH', str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(Config, 'AUDIO_TEMP_DIR', str(tmp_path / 'audio'))
+    monkeypatch.setattr(Config, 'AUDIO_PREPROCESSING', False)
+    monkeypatch.setattr(Config, 'TRANSCRIPTION_CONCURRENCY', 1)
+    monkeypatch.setattr(Config, 'TRANSCRIPTION_QUEUE_SIZE', 1)
+    handler = VoiceHandler(BlockingBackend())
+    yield handler
+    handler.close()
+
+
+async def test_rejected_message_is_not_downloaded(voice_handler):
+    bot = FakeBot()
+    context = SimpleNamespace(bot=bot)
+    backend = voice_handler.backend
+    statuses = [StatusMessage() for _ in range(3)]
+
+    running = asyncio.create_task(voice_handler.handle_voice_message(voice_update('a', statuses[0]), context))
+    while backend.started == 0:
+        await asyncio.sleep(0)
+    waiting = asyncio.create_task(voice_handler.handle_voice_message(voice_update('b', statuses[1]), context))
+    while voice_handler.transcription_queue.depth == 0:
+        await asyncio.sleep(0)
+
+    await voice_handler.handle_voice_message(voice_update('c', statuses[2]), context)
+    assert "слишком много" in statuses[2].texts[-1]
+    assert bot.downloads == ['a']
+
+    backend.release.set()
+    await asyncio.gather(running, waiting)
+    assert bot.downloads == ['a', 'b']
+    assert all("текст" in status.texts[-1] for status in statuses[:2])
+
+
+class SizedFile:
+    """Файл Telegram заданного размера с загрузкой в память и на диск"""
+
+    def __init__(self, file_size):
+        self.file_size = file_size
+        self.payload = b'OggS' + b'\1' * 60
+
+    async def download_to_memory(self, buffer):
+        buffer.write(self.payload)
+
+    async def download_to_drive(self, path):
+        with open(path, 'wb') as target:
+            target.write(self.payload)
+
+
+def sized_context(file: SizedFile):
+    async def get_file(file_id):
+        return file
+    return SimpleNamespace(bot=SimpleNamespace(get_file=get_file))
+
+
+@pytest.mark.parametrize('file_size, in_memory', [
+    (1024 * 1024, True),
+    (1024 * 1024 + 1, False),
+    (None, False),
+], ids=['at threshold', 'over threshold', 'unknown size'])
+async def test_download_goes_to_memory_up_to_threshold(voice_handler, monkeypatch, file_size, in_memory):
+    monkeypatch.setattr(Config, 'AUDIO_MEMORY_THRESHOLD_MB', 1)
+    file = SizedFile(file_size)
+
+    async with voice_handler.download_audio(sized_context(file), 'f', '.ogg') as audio:
+        if in_memory:
+            name, buffer = audio
+            assert name == 'audio.ogg'
+            assert buffer.getvalue() == file.payload
+        else:
+            assert os.path.dirname(audio) == Config.AUDIO_TEMP_DIR
+            assert audio.endswith('.ogg')
+            with open(audio, 'rb') as source:
+                assert source.read() == file.payload
+
+    assert os.listdir(Config.AUDIO_TEMP_DIR) == []
+    if in_memory:
+        assert len(voice_handler.buffers.idle) == 1
+        assert voice_handler.buffers.idle[0].getvalue() == b''
+
+
+async def test_temp_file_is_removed_when_transcription_fails(voice_handler, monkeypatch):
+    monkeypatch.setattr(Config, 'AUDIO_MEMORY_THRESHOLD_MB', 1)
+    paths = []
+
+    with pytest.raises(RuntimeError):
+        async with voice_handler.download_audio(sized_context(SizedFile(5 * 1024 * 1024)), 'f', '.ogg') as audio:
+            paths.append(audio)
+            assert os.path.exists(audio)
+            raise RuntimeError("transcription failed")
+
+    assert not os.path.exists(paths[0])
+    assert os.listdir(Config.AUDIO_TEMP_DIR) == []